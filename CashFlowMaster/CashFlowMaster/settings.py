@@ -10,24 +10,34 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Профиль настроек: development (по умолчанию) или production.
+# Выбирается переменной окружения CASHFLOW_SETTINGS_PROFILE.
+SETTINGS_PROFILE = os.environ.get('CASHFLOW_SETTINGS_PROFILE', 'development')
+PRODUCTION = SETTINGS_PROFILE == 'production'
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-xtxm^5a*zdk+)b38pvf)u67(sk0aq9(pk1_y(2=vdy^$5z1)ln'
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY',
+    'django-insecure-xtxm^5a*zdk+)b38pvf)u67(sk0aq9(pk1_y(2=vdy^$5z1)ln')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = False
+# В профиле development включается переменной окружения DJANGO_DEBUG=1
+DEBUG = not PRODUCTION and os.environ.get('DJANGO_DEBUG') == '1'
 
 ALLOWED_HOSTS = [
     '127.0.0.1',
-]
+] + [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+     if host]
 
 INTERNAL_IPS = [
     '127.0.0.1',
@@ -46,10 +56,10 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'smart_selects',
     'django_filters',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'cashflow.middleware.ViewMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,9 +67,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# django-debug-toolbar подключается только при отладке: 
+# его middleware обрабатывает каждый запрос, даже когда панель не показана
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'CashFlowMaster.urls'
 
 TEMPLATES = [
@@ -78,16 +93,83 @@ TEMPLATES = [
     },
 ]
 
+if PRODUCTION:
+    # Шаблоны компилируются один раз на процесс
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'CashFlowMaster.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+# СУБД выбирается переменной окружения CASHFLOW_DB_BACKEND: 
+# sqlite (по умолчанию) или postgresql. В PostgreSQL таблица транзакций 
+# секционирована по месяцам (см. cashflow.partitions).
+DB_BACKEND = os.environ.get('CASHFLOW_DB_BACKEND', 'sqlite')
+
+if DB_BACKEND == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('CASHFLOW_DB_NAME', 'cashflow'),
+            'USER': os.environ.get('CASHFLOW_DB_USER', 'cashflow'),
+            'PASSWORD': os.environ.get('CASHFLOW_DB_PASSWORD', ''),
+            'HOST': os.environ.get('CASHFLOW_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('CASHFLOW_DB_PORT', '5432'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Ожидание блокировки записи вместо ошибки 
+                # "database is locked"
+                'timeout': 20,
+            },
+            # Тестовая база - файл, а не база в памяти: к ней 
+            # обращаются процессы фоновых задач (cashflow.jobs)
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        }
+    }
+
+if PRODUCTION:
+    # Постоянные соединения с проверкой перед повторным использованием
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# PRAGMA, выполняемые при открытии каждого соединения SQLite
+# (см. cashflow.signals.configure_sqlite)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,
+    'mmap_size': 134217728,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Версии справочников и данных транзакций хранятся в кэше, поэтому 
+# кэш должен быть общим для всех процессов: сервера, распорядителя 
+# фоновых задач (run_worker) и команд управления. Кэш в памяти процесса 
+# (LocMemCache) отклоняется проверкой cashflow.E001 (cashflow.checks).
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CASHFLOW_CACHE_DIR', BASE_DIR / '.cache'),
     }
 }
 
@@ -138,4 +220,76 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # django-smart-selects
 
-USE_DJANGO_JQUERY = True
\ No newline at end of file
+USE_DJANGO_JQUERY = True
+
+
+# cashflow
+
+# Размер страницы списка транзакций и его верхняя граница 
+# для параметра page_size
+CASHFLOW_PAGE_SIZE = 50
+CASHFLOW_MAX_PAGE_SIZE = 500
+
+# Таблица ввода нескольких транзакций: количество пустых строк 
+# и наибольшее количество строк в одной отправке
+CASHFLOW_GRID_ROWS = 10
+CASHFLOW_GRID_MAX_ROWS = 100
+
+# Количество строк в одном пакете записи при загрузке транзакций из CSV
+CASHFLOW_IMPORT_BATCH_SIZE = 5000
+
+# Окно скользящего среднего в отчёте о движении денег, месяцев
+CASHFLOW_REPORT_WINDOW = 3
+
+# Начиная с этого количества строк (по статистике СУБД) списки админки 
+# показывают оценку количества вместо точного COUNT(*)
+CASHFLOW_ESTIMATED_COUNT_MIN = 100000
+
+# Количество транзакций в одном пакете массового изменения или удаления 
+# (не больше допустимого числа параметров запроса СУБД)
+CASHFLOW_BULK_CHUNK_SIZE = 5000
+
+# Фоновые задачи (manage.py run_worker): количество процессов пула, 
+# пауза между опросами пустой очереди и минимальный интервал записи 
+# хода выполнения задачи, с. Входные файлы и результаты задач 
+# хранятся в каталоге CASHFLOW_JOBS_DIR.
+CASHFLOW_WORKER_PROCESSES = 2
+CASHFLOW_WORKER_POLL = 1.0
+CASHFLOW_JOB_PROGRESS_INTERVAL = 1.0
+CASHFLOW_JOBS_DIR = os.environ.get('CASHFLOW_JOBS_DIR', BASE_DIR / 'jobs')
+
+# Распорядитель отмечает свои выполняемые задачи (Job.heartbeat_at) 
+# не реже раза в CASHFLOW_JOB_HEARTBEAT_INTERVAL секунд. Выполняемые 
+# задачи без отметки дольше CASHFLOW_JOB_STALE_TIMEOUT секунд считаются 
+# потерянными (распорядитель остановлен аварийно) и завершаются ошибкой. 
+# Распорядитель без пула (--processes 0) отмечает задачу только при записи 
+# хода выполнения, поэтому срок должен превышать и самую долгую задачу 
+# без отметок хода (пересчёт сводки).
+CASHFLOW_JOB_HEARTBEAT_INTERVAL = 30.0
+CASHFLOW_JOB_STALE_TIMEOUT = 600.0
+
+# Допустимое количество SQL-запросов на запрос по имени URL представления 
+# (с учётом загрузки справочников при пустом кэше). Превышение пишется 
+# в журнал, а при CASHFLOW_QUERY_BUDGETS_STRICT - ошибка QueryBudgetExceeded
+# (тесты включают её через override_settings).
+CASHFLOW_QUERY_BUDGETS = {
+    'cashflow:main': 8,
+    'cashflow:api_transactions': 5,
+    'cashflow:reference_manage': 4,
+    'cashflow:reference_tree': 4,
+    'cashflow:create_transact': 10,
+    'cashflow:detail_transact': 1,
+    'cashflow:update_transact': 14,
+    'cashflow:grid_transact': 14,
+    'cashflow:delete_transact': 3,
+    'cashflow:export_transact': 5,
+    'cashflow:report': 5,
+    'cashflow:jobs': 3,
+    'cashflow:detail_job': 1,
+    'cashflow:status_job': 1,
+    'cashflow:async_main': 8,
+    'cashflow:async_api_transactions': 5,
+    'cashflow:async_export_transact': 5,
+}
+CASHFLOW_QUERY_BUDGETS_STRICT = (
+    os.environ.get('CASHFLOW_QUERY_BUDGETS_STRICT') == '1')
@@ -1,10 +1,90 @@
 from django.contrib import admin
+from .forms import RecurringTemplateAdminForm, TransactAdminForm
 from .models import (StatusAction, TypeAction, CategoryAction, 
-					 SubcategoryAction, Transaction)
+					 SubcategoryAction, Transaction, RecurringTemplate)
+from .pagination import EstimatedCountPaginator
+from .recurring import materialize
 
 
-admin.site.register(StatusAction)
-admin.site.register(TypeAction)
-admin.site.register(CategoryAction)
-admin.site.register(SubcategoryAction)
-admin.site.register(Transaction)
\ No newline at end of file
+@admin.register(StatusAction)
+class StatusActionAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+    ordering = ['name']
+
+
+@admin.register(TypeAction)
+class TypeActionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'flow']
+    search_fields = ['name']
+    ordering = ['name']
+
+
+@admin.register(CategoryAction)
+class CategoryActionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'type_act']
+    list_select_related = ['type_act']
+    search_fields = ['name']
+    ordering = ['name']
+    autocomplete_fields = ['type_act']
+
+
+@admin.register(SubcategoryAction)
+class SubcategoryActionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'category_act']
+    list_select_related = ['category_act']
+    search_fields = ['name']
+    ordering = ['name']
+    autocomplete_fields = ['category_act']
+
+
+@admin.register(Transaction)
+class TransactionAdmin(admin.ModelAdmin):
+    """Транзакции в админке с расчётом на большую таблицу.
+
+    Справочники списка загружаются тем же запросом, что и страница 
+    (list_select_related), количество строк без фильтра берётся 
+    из статистики СУБД (EstimatedCountPaginator), а фильтры и иерархия 
+    дат используют индексы по статусу, типу и дате. Поля справочников 
+    в форме - с автодополнением, без загрузки справочников целиком.
+    """
+
+    form = TransactAdminForm
+    list_display = ['date_created', 'status_act', 'type_act', 
+                    'category_act', 'subcategory_act', 'amount']
+    list_select_related = ['status_act', 'type_act', 
+                           'category_act', 'subcategory_act']
+    list_filter = ['status_act', 'type_act']
+    date_hierarchy = 'date_created'
+    ordering = ['-date_created', '-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    autocomplete_fields = ['status_act', 'type_act', 
+                           'category_act', 'subcategory_act']
+
+
+@admin.register(RecurringTemplate)
+class RecurringTemplateAdmin(admin.ModelAdmin):
+    """Шаблоны повторяющихся транзакций.
+
+    Действие "Создать транзакции по сегодня" выполняет для выбранных 
+    шаблонов то же, что команда manage.py materialize_recurring.
+    """
+
+    form = RecurringTemplateAdminForm
+    list_display = ['name', 'period', 'interval', 'start_date', 'end_date',
+                    'type_act', 'category_act', 'amount', 'active', 
+                    'materialized_until']
+    list_select_related = ['type_act', 'category_act']
+    list_filter = ['active', 'period']
+    search_fields = ['name']
+    ordering = ['name']
+    autocomplete_fields = ['status_act', 'type_act', 
+                           'category_act', 'subcategory_act']
+    readonly_fields = ['materialized_until']
+    actions = ['materialize_selected']
+
+    @admin.action(description='Создать транзакции по сегодня')
+    def materialize_selected(self, request, queryset):
+        result = materialize(templates=queryset)
+        self.message_user(request, 
+                          f'Создано транзакций: {result.created}')
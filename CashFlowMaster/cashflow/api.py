@@ -0,0 +1,81 @@
+from .pagination import KeysetPaginator
+
+
+FIELDS_PARAM = 'fields'
+
+# Поля ответа API и соответствующие им пути values_list
+API_FIELDS = {
+    'id': 'id',
+    'date_created': 'date_created',
+    'status_id': 'status_act_id',
+    'status': 'status_act__name',
+    'type_id': 'type_act_id',
+    'type': 'type_act__name',
+    'category_id': 'category_act_id',
+    'category': 'category_act__name',
+    'subcategory_id': 'subcategory_act_id',
+    'subcategory': 'subcategory_act__name',
+    'amount': 'amount',
+    'comment': 'comment',
+}
+DEFAULT_FIELDS = ['id', 'date_created', 'status', 'type', 'category',
+                  'subcategory', 'amount', 'comment']
+
+# Поля позиции курсора всегда выбираются первыми
+_POSITION_PATHS = ('date_created', 'id')
+
+
+class InvalidFields(ValueError):
+    """Параметр fields содержит неизвестные поля."""
+
+
+def parse_fields(value):
+    """Разбирает параметр fields (имена через запятую) в список полей.
+
+    Raises:
+    -------
+    InvalidFields
+        Если указано поле, которого нет в API_FIELDS
+    """
+    if not value:
+        return DEFAULT_FIELDS
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',')
+                                if name.strip()))
+    unknown = [name for name in fields if name not in API_FIELDS]
+    if unknown:
+        raise InvalidFields('Неизвестные поля: ' + ', '.join(unknown))
+    return fields or DEFAULT_FIELDS
+
+
+def transaction_page(queryset, fields, per_page, after=None, before=None):
+    """Возвращает страницу транзакций в виде словарей полей fields.
+
+    Выбираются только нужные столбцы (values_list), без создания
+    экземпляров модели; связанные справочники присоединяются
+    только для запрошенных названий.
+
+    Raises:
+    -------
+    InvalidCursor
+        Если переданный курсор некорректен
+    """
+    paginator = _page_paginator(queryset, fields, per_page)
+    return _page_results(paginator.page(after, before), fields)
+
+
+async def atransaction_page(queryset, fields, per_page, after=None, 
+                            before=None):
+    """Асинхронный вариант transaction_page() для async-представлений."""
+    paginator = _page_paginator(queryset, fields, per_page)
+    return _page_results(await paginator.apage(after, before), fields)
+
+
+def _page_paginator(queryset, fields, per_page):
+    paths = list(_POSITION_PATHS) + [API_FIELDS[name] for name in fields]
+    return KeysetPaginator(queryset.values_list(*paths), per_page,
+                           position=lambda row: row[:2])
+
+
+def _page_results(page, fields):
+    offset = len(_POSITION_PATHS)
+    return page, [dict(zip(fields, row[offset:])) for row in page]
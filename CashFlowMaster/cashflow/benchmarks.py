@@ -0,0 +1,608 @@
+import asyncio
+import http.client
+import math
+import random
+import resource
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+from itertools import cycle, islice, product
+from pathlib import Path
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .imports import ReferenceLookup, TransactImporter
+from .models import (Transaction, StatusAction, TypeAction,
+                     CategoryAction, SubcategoryAction)
+from .references import registry
+
+
+# Справочники тестовых данных: тип → (направление, доля транзакций,
+# категория → подкатегории)
+REFERENCE_TREE = {
+    'Пополнение': (TypeAction.INCOME, 0.2, {
+        'Продажи': ['Интернет-магазин', 'Розница', 'Опт'],
+        'Услуги': ['Консультации', 'Разработка', 'Поддержка'],
+        'Инвестиции': ['Дивиденды', 'Проценты по вкладам'],
+    }),
+    'Списание': (TypeAction.EXPENSE, 0.8, {
+        'Инфраструктура': ['VPS', 'Proxy', 'Домены', 'Хранилище'],
+        'Маркетинг': ['Farpost', 'Avito', 'Контекстная реклама'],
+        'Персонал': ['Зарплата', 'Премии', 'Обучение'],
+        'Офис': ['Аренда', 'Коммунальные платежи', 'Канцелярия'],
+        'Налоги': ['НДФЛ', 'Страховые взносы'],
+    }),
+}
+STATUSES = ['Бизнес', 'Личное', 'Налог']
+
+PERCENTILES = (50, 95, 99)
+
+
+def generate_references(extra_categories=0):
+    """Создаёт справочники REFERENCE_TREE.
+
+    extra_categories добавляет каждому типу категории с пятью
+    подкатегориями, чтобы проверить работу с большими справочниками.
+    """
+    for name in STATUSES:
+        StatusAction.objects.create(name=name)
+    for type_name, (flow, _, categories) in REFERENCE_TREE.items():
+        type_act = TypeAction.objects.create(name=type_name, flow=flow)
+        categories = dict(categories)
+        for i in range(extra_categories):
+            categories[f'{type_name} {i + 1}'] = [
+                f'Подкатегория {i + 1}.{j + 1}' for j in range(5)]
+        for category_name, subcategories in categories.items():
+            category = CategoryAction.objects.create(name=category_name,
+                                                     type_act=type_act)
+            SubcategoryAction.objects.bulk_create(
+                [SubcategoryAction(name=name, category_act=category)
+                 for name in subcategories])
+
+
+def generate_transactions(count, years=3, seed=0, batch_size=None):
+    """Создаёт count транзакций за последние years лет.
+
+    Транзакции пишутся пакетами через TransactImporter, вместе со сводкой
+    DailyRollup. Даты смещены к последним месяцам, суммы распределены
+    логнормально, поступлений меньше, чем списаний.
+    """
+    rng = random.Random(seed)
+    references = registry.get()
+    status_ids = [item.pk for item in references.statuses] + [None]
+    weights = {item.name: REFERENCE_TREE.get(item.name, (None, 0.1))[1]
+               for item in references.types}
+    types = [item.pk for item in references.types]
+    type_weights = [weights[item.name] for item in references.types]
+    chains = {
+        type_id: [(category.pk, subcategory.pk)
+                  for category in references.categories_by_type[type_id]
+                  for subcategory in
+                  references.subcategories_by_category[category.pk]]
+        for type_id in types}
+
+    importer = TransactImporter(batch_size, ReferenceLookup(references))
+    days = years * 365
+    today = date.today()
+    batch = []
+    for _ in range(count):
+        type_id = rng.choices(types, type_weights)[0]
+        category_id, subcategory_id = rng.choice(chains[type_id])
+        age = min(int(rng.expovariate(3 / days)), days)
+        batch.append((today - timedelta(days=age),
+                      rng.choice(status_ids),
+                      type_id, category_id, subcategory_id,
+                      min(int(rng.lognormvariate(8, 1.5)), 10 ** 9),
+                      rng.choice(['', '', 'Оплата по счёту',
+                                  'Ежемесячный платёж'])))
+        if len(batch) >= importer.batch_size:
+            importer.flush(batch)
+            batch = []
+    if batch:
+        importer.flush(batch)
+
+
+@contextmanager
+def temporary_database():
+    """Временная файловая база и отдельный кэш на время замера.
+
+    Файловая база, а не база в памяти, нужна, чтобы учитывались открытие
+    соединений и PRAGMA и чтобы к ней мог обращаться поток WSGI-сервера.
+    Файловый кэш переносится во временный каталог, чтобы версии
+    справочников и транзакций временной базы не попали в рабочий кэш.
+    """
+    workdir = tempfile.TemporaryDirectory()
+    if connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = str(
+                                        Path(workdir.name) / 'bench.sqlite3')
+    caches = {alias: dict(config)
+              for alias, config in settings.CACHES.items()}
+    for config in caches.values():
+        if 'LOCATION' in config and 'filebased' in config['BACKEND']:
+            config['LOCATION'] = str(Path(workdir.name) / 'cache')
+    cache_override = override_settings(CACHES=caches)
+    cache_override.enable()
+    old_name = connection.creation.create_test_db(verbosity=0,
+                                                  autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        cache_override.disable()
+        workdir.cleanup()
+
+
+def filter_combinations():
+    """Перебирает все сочетания параметров TransactFilter.
+
+    Категория выбирается только вместе с типом, а подкатегория -
+    вместе с категорией, как в форме фильтра. Значения берутся из
+    существующих справочников, чтобы фильтр прошёл валидацию.
+
+    Raises:
+    -------
+    ValueError
+        Если нет ни одного статуса или подкатегории
+    """
+    subcategory = (SubcategoryAction.objects
+                                    .select_related('category_act')
+                                    .first())
+    status = StatusAction.objects.first()
+    if subcategory is None or status is None:
+        raise ValueError('Нужны хотя бы один статус и одна подкатегория')
+    chain_params = [
+        {},
+        {'type_act': subcategory.category_act.type_act_id},
+        {'type_act': subcategory.category_act.type_act_id,
+         'category_act': subcategory.category_act_id},
+        {'type_act': subcategory.category_act.type_act_id,
+         'category_act': subcategory.category_act_id,
+         'subcategory_act': subcategory.pk},
+    ]
+    date_params = [
+        {},
+        {'date_created_min': '2000-01-01',
+         'date_created_max': '2100-01-01'},
+    ]
+    status_params = [{}, {'status_act': status.pk}]
+
+    for chain, dates, statuses in product(chain_params, date_params,
+                                          status_params):
+        yield {**chain, **dates, **statuses}
+
+
+def latency_stats(timings):
+    """Среднее и перцентили PERCENTILES (ближайший ранг) в миллисекундах."""
+    ordered = sorted(timings)
+    stats = {'mean': round(statistics.mean(ordered), 3)}
+    for percentile in PERCENTILES:
+        index = max(math.ceil(len(ordered) * percentile / 100) - 1, 0)
+        stats[f'p{percentile}'] = round(ordered[index], 3)
+    return stats
+
+
+def peak_rss_kb():
+    """Пиковый размер резидентной памяти процесса в КБ."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS возвращает байты, Linux - килобайты
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class Scenario:
+    """Сценарий замера: запрос, который повторяется requests раз.
+
+    Attributes:
+    -----------
+    name: str
+        Название сценария в отчёте
+    build: callable
+        Функция номера повтора, возвращающая (метод, адрес, данные POST)
+    form_url: str
+        Страница формы, с которой берётся CSRF-токен для POST
+        через WSGI-сервер
+    """
+
+    def __init__(self, name, build, form_url=None):
+        self.name = name
+        self.build = build
+        self.form_url = form_url
+
+
+def _date_fields(day):
+    return {'date_created_year': day.year, 'date_created_month': day.month,
+            'date_created_day': day.day}
+
+
+def build_scenarios(requests, seed=0):
+    """Сценарии главной страницы, API, справочников и форм транзакций."""
+    rng = random.Random(seed)
+    scenarios = []
+    for params in filter_combinations():
+        label = ','.join(sorted(params)) or 'all'
+        url = '/?' + urlencode(params)
+        scenarios.append(Scenario(f'main[{label}]',
+                                  lambda i, url=url: ('GET', url, None)))
+    scenarios.append(Scenario('api', lambda i: ('GET', '/api/transactions/',
+                                                None)))
+    scenarios.append(Scenario('reference_manage',
+                              lambda i: ('GET', '/reference_manage/', None)))
+
+    subcategory = SubcategoryAction.objects.select_related(
+                                                'category_act').first()
+    form = {'status_act': StatusAction.objects.values_list('pk',
+                                                           flat=True)[0],
+            'type_act': subcategory.category_act.type_act_id,
+            'category_act': subcategory.category_act_id,
+            'subcategory_act': subcategory.pk,
+            'comment': 'benchmark', **_date_fields(date.today())}
+    # Обновляются и удаляются разные существующие транзакции
+    pks = list(Transaction.objects.order_by('-pk')
+                                  .values_list('pk', flat=True)
+                                  [:requests * 4 + 2])
+    rng.shuffle(pks)
+    update_pks, delete_pks = pks[::2], pks[1::2]
+
+    scenarios += [
+        Scenario('create_form', lambda i: ('GET', '/create_transact/', None)),
+        Scenario('create', lambda i: ('POST', '/create_transact/',
+                                      {**form, 'amount': 100 + i}),
+                 form_url='/create_transact/'),
+        Scenario('update', lambda i: (
+                        'POST', f'/update_transact/{update_pks[i]}',
+                        {**form, 'amount': 200 + i}),
+                 form_url='/create_transact/'),
+        Scenario('delete', lambda i: (
+                        'POST', f'/delete_transact/{delete_pks.pop()}', {}),
+                 form_url='/create_transact/'),
+    ]
+    return scenarios
+
+
+class ClientRunner:
+    """Выполняет запросы через тестовый клиент Django в этом же потоке."""
+
+    name = 'client'
+
+    def __init__(self):
+        self.client = Client(HTTP_HOST='127.0.0.1', REMOTE_ADDR='127.0.0.1')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def prepare(self, scenario):
+        pass
+
+    def request(self, method, url, data):
+        """Возвращает (код ответа, количество запросов к базе)."""
+        with CaptureQueriesContext(connection) as queries:
+            if method == 'POST':
+                response = self.client.post(url, data)
+            else:
+                response = self.client.get(url)
+        return response.status_code, len(queries)
+
+
+class _QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class WSGIRunner:
+    """Выполняет запросы по HTTP к WSGI-серверу в отдельном потоке.
+
+    Количество запросов к базе считается в потоке сервера,
+    время - на стороне клиента, включая разбор HTTP.
+    """
+
+    name = 'wsgi'
+
+    def __init__(self):
+        self.queries = 0
+        self.cookies = SimpleCookie()
+        application = get_wsgi_application()
+
+        def counted(environ, start_response):
+            with CaptureQueriesContext(connections['default']) as queries:
+                response = application(environ, start_response)
+                try:
+                    body = b''.join(response)
+                finally:
+                    # close() отправляет request_finished
+                    response.close()
+            self.queries = len(queries)
+            return [body]
+
+        self.server = make_server('127.0.0.1', 0, counted,
+                                  handler_class=_QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def prepare(self, scenario):
+        # Форма выдаёт cookie csrftoken, который отправляется с POST
+        if scenario.form_url and 'csrftoken' not in self.cookies:
+            self.request('GET', scenario.form_url, None)
+
+    def request(self, method, url, data):
+        """Возвращает (код ответа, количество запросов к базе)."""
+        conn = http.client.HTTPConnection('127.0.0.1',
+                                          self.server.server_port)
+        headers = {'Host': '127.0.0.1'}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                f'{key}={morsel.value}' for key, morsel in self.cookies.items())
+        body = None
+        if method == 'POST':
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies['csrftoken'].value
+        conn.request(method, url, body, headers)
+        response = conn.getresponse()
+        response.read()
+        for cookie in response.headers.get_all('Set-Cookie') or []:
+            self.cookies.load(cookie)
+        conn.close()
+        return response.status, self.queries
+
+
+def run_scenarios(runner, scenarios, requests):
+    """Замеряет сценарии и возвращает отчёт по каждому из них."""
+    results = {}
+    for scenario in scenarios:
+        runner.prepare(scenario)
+        timings = []
+        queries = []
+        statuses = set()
+        for i in range(requests):
+            method, url, data = scenario.build(i)
+            started = time.perf_counter()
+            status, count = runner.request(method, url, data)
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(count)
+            statuses.add(status)
+        results[scenario.name] = {
+            **latency_stats(timings),
+            'queries': round(statistics.mean(queries), 2),
+            'statuses': sorted(statuses),
+            'peak_rss_kb': peak_rss_kb(),
+        }
+    return results
+
+
+def compare_results(current, baseline, threshold):
+    """Сравнивает отчёт с эталоном.
+
+    Регрессией считается рост p95 больше чем в (1 + threshold) раз
+    или рост среднего числа запросов к базе.
+
+    Returns:
+    --------
+    list
+        Описания регрессий
+    """
+    regressions = []
+    for mode, scenarios in current['results'].items():
+        for name, stats in scenarios.items():
+            base = baseline['results'].get(mode, {}).get(name)
+            if base is None:
+                continue
+            if stats['p95'] > base['p95'] * (1 + threshold):
+                regressions.append(
+                    f'{mode}/{name}: p95 {base["p95"]} → {stats["p95"]} мс')
+            if stats['queries'] > base['queries']:
+                regressions.append(
+                    f'{mode}/{name}: запросов {base["queries"]} '
+                    f'→ {stats["queries"]}')
+    return regressions
+
+
+# Конкурентная нагрузка: WSGI-сервер с пулом потоков против uvicorn (ASGI)
+
+# Сценарии конкурентного замера: адреса синхронных представлений; 
+# асинхронные варианты доступны по тем же адресам с префиксом ASYNC_PREFIX
+CONCURRENCY_SCENARIOS = {
+    'main': '/',
+    'api': '/api/transactions/',
+    'export': '/export_transact/csv',
+}
+ASYNC_PREFIX = '/async'
+
+# Размер приёмного буфера и порции чтения медленного клиента
+SLOW_CLIENT_BUFFER = 16 * 1024
+
+
+class _PooledWSGIServer(WSGIServer):
+    """WSGI-сервер, обрабатывающий соединения фиксированным пулом потоков,
+    как gunicorn с рабочими потоками."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, handler_class, threads):
+        super().__init__(address, handler_class)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class PooledWSGIServer:
+    """Приложение WSGI проекта в потоке с пулом из threads рабочих потоков.
+
+    Каждый рабочий поток занят запросом, пока клиент не получит ответ 
+    целиком, поэтому медленные клиенты ограничивают пропускную 
+    способность числом потоков.
+    """
+
+    name = 'wsgi'
+    prefix = ''
+
+    def __init__(self, threads):
+        self.server = make_server(
+            '127.0.0.1', 0, get_wsgi_application(), handler_class=_QuietHandler,
+            server_class=lambda address, handler: _PooledWSGIServer(
+                                                address, handler, threads))
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+class UvicornServer:
+    """Приложение ASGI проекта под uvicorn в отдельном потоке.
+
+    С async_views=True сценарии идут к асинхронным представлениям 
+    (ASYNC_PREFIX), иначе - к синхронным, которые Django выполняет 
+    в потоках. Требует установленного uvicorn.
+    """
+
+    def __init__(self, async_views):
+        import uvicorn
+
+        self.name = 'asgi-async' if async_views else 'asgi-sync'
+        self.prefix = ASYNC_PREFIX if async_views else ''
+        self.socket = socket.socket()
+        self.socket.bind(('127.0.0.1', 0))
+        self.port = self.socket.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(
+                                get_asgi_application(), lifespan='off',
+                                log_level='warning', access_log=False,
+                                backlog=1024))
+        self.thread = threading.Thread(target=self.server.run,
+                                       kwargs={'sockets': [self.socket]},
+                                       daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError('uvicorn не запустился')
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
+        self.socket.close()
+
+
+async def _fetch(port, url, read_delay):
+    """Выполняет GET и читает ответ до конца; возвращает код ответа.
+
+    При read_delay клиент читает ответ порциями SLOW_CLIENT_BUFFER 
+    с паузой read_delay секунд и маленьким приёмным буфером сокета, 
+    как клиент на медленном канале.
+    """
+    sock = socket.socket()
+    sock.setblocking(False)
+    if read_delay:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                        SLOW_CLIENT_BUFFER)
+    await asyncio.get_running_loop().sock_connect(sock, ('127.0.0.1', port))
+    reader, writer = await asyncio.open_connection(sock=sock)
+    try:
+        writer.write(f'GET {url} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+                     f'Connection: close\r\n\r\n'.encode())
+        status = int((await reader.readline()).split()[1])
+        while await reader.read(SLOW_CLIENT_BUFFER):
+            if read_delay:
+                await asyncio.sleep(read_delay)
+        return status
+    finally:
+        writer.close()
+
+
+def run_load(server, urls, clients, read_delay=0):
+    """Выполняет запросы urls к серверу с clients одновременными клиентами.
+
+    Returns:
+    --------
+    dict
+        Пропускная способность (запросов в секунду), время запросов 
+        (мс, см. latency_stats), коды ответов и число ошибок соединения
+    """
+    async def load():
+        pending = iter(urls)
+        timings = []
+        statuses = set()
+        errors = 0
+
+        async def client():
+            nonlocal errors
+            for url in pending:
+                started = time.perf_counter()
+                try:
+                    statuses.add(await _fetch(server.port, server.prefix + url,
+                                              read_delay))
+                except (OSError, ValueError, IndexError):
+                    errors += 1
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        seconds = time.perf_counter() - started
+        return {
+            'throughput': round(len(timings) / seconds, 2),
+            **(latency_stats(timings) if timings else {}),
+            'seconds': round(seconds, 3),
+            'statuses': sorted(statuses),
+            'errors': errors,
+        }
+
+    return asyncio.run(load())
+
+
+def concurrency_urls(scenario, requests):
+    """requests адресов сценария с перебором сочетаний фильтра."""
+    path = CONCURRENCY_SCENARIOS[scenario]
+    combinations = [urlencode(params) for params in filter_combinations()]
+    return [f'{path}?{query}' if query else path
+            for query in islice(cycle(combinations), requests)]
@@ -0,0 +1,228 @@
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, Q, When
+
+from . import search
+from .models import (Transaction, StatusAction, TypeAction, 
+                     CategoryAction, SubcategoryAction)
+from .references import registry
+from .rollups import RollupDelta, TRANSACT_KEY_FIELDS, write_atomic
+from .versions import bump_ledger_version
+
+
+# Массовые изменения транзакций. Изменение выполняется пакетами
+# по идентификаторам: каждый пакет - один UPDATE или DELETE в отдельной
+# транзакции вместе с обновлением сводки DailyRollup и поискового
+# индекса. Сигналы модели не отправляются, поэтому сводка и индекс
+# обновляются здесь одним запросом на пакет, а не на запись.
+
+
+def chunk_size():
+    """Размер пакета с учётом ограничения СУБД на число параметров."""
+    size = settings.CASHFLOW_BULK_CHUNK_SIZE
+    max_params = connection.features.max_query_params
+    return min(size, max_params) if max_params else size
+
+
+def _chunks(queryset, size):
+    """Идентификаторы транзакций набора пакетами по возрастанию id.
+
+    Каждый следующий пакет выбирается после обработки предыдущего,
+    поэтому набор, фильтр которого зависит от изменяемых полей,
+    не пропускает и не повторяет записи.
+    """
+    last_pk = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk)
+                           .order_by('pk')
+                           .values_list('pk', flat=True)[:size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def bulk_update(queryset, values, size=None, progress=None):
+    """Устанавливает значения полей values всем транзакциям набора.
+
+    values - значения по attname поля (например, status_act_id).
+    Проверка значений (цепочки справочников) - на стороне вызывающего.
+    progress - необязательная функция, которой после фиксации каждого 
+    пакета передаётся количество его записей (см. jobs.JobProgress).
+    Возвращает количество изменённых транзакций.
+    """
+    updated = 0
+    for pks in _chunks(queryset, size or chunk_size()):
+        chunk = Transaction.objects.filter(pk__in=pks)
+        delta = RollupDelta()
+        with write_atomic():
+            delta.move_queryset(chunk, values)
+            updated += chunk.update(**values)
+            delta.apply()
+            bump_ledger_version()
+        if progress is not None:
+            progress(len(pks))
+    return updated
+
+
+def bulk_delete(queryset, size=None, progress=None):
+    """Удаляет все транзакции набора и возвращает их количество.
+
+    progress - как в bulk_update().
+    """
+    deleted = 0
+    for pks in _chunks(queryset, size or chunk_size()):
+        chunk = Transaction.objects.filter(pk__in=pks)
+        delta = RollupDelta()
+        with write_atomic():
+            delta.add_queryset(chunk, sign=-1)
+            deleted += _delete_transactions(pks)
+            search.unindex_transactions(pks)
+            delta.apply()
+            bump_ledger_version()
+        if progress is not None:
+            progress(len(pks))
+    return deleted
+
+
+def _delete_transactions(pks):
+    # QuerySet.delete() загрузил бы каждую запись ради сигналов
+    # post_delete, поэтому пакет удаляется одним DELETE
+    table = connection.ops.quote_name(Transaction._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE id IN ({placeholders})',
+                       pks)
+        return cursor.rowcount
+
+
+def create_transactions(objs):
+    """Создаёт транзакции objs одним bulk_create и возвращает их.
+
+    Все записи, сводка DailyRollup и поисковый индекс пишутся 
+    в одной транзакции. Проверка значений - на стороне вызывающего.
+    """
+    delta = RollupDelta()
+    for obj in objs:
+        delta.add_transaction({field: getattr(obj, field) 
+                               for field in (*TRANSACT_KEY_FIELDS, 'amount')})
+    with write_atomic():
+        objs = Transaction.objects.bulk_create(objs)
+        search.index_transactions([(obj.pk, obj.comment) 
+                                   for obj in objs if obj.comment])
+        delta.apply()
+        bump_ledger_version()
+    return objs
+
+
+# Удаление элементов справочников. Django сбрасывает ссылки транзакций
+# (SET_NULL) одним UPDATE на всю таблицу внутри транзакции удаления,
+# поэтому ссылки сбрасываются заранее, пакетами по
+# CASHFLOW_BULK_CHUNK_SIZE транзакций, каждый пакет - отдельным UPDATE.
+
+
+class DeletionImpact:
+    """Последствия удаления элемента справочника.
+
+    Attributes:
+    -----------
+    categories: int
+        Количество удаляемых вместе с типом категорий
+    subcategories: int
+        Количество удаляемых вместе с типом или категорией подкатегорий
+    transactions: int
+        Количество транзакций, которые потеряют ссылку на справочник
+    """
+
+    def __init__(self, categories, subcategories, transactions):
+        self.categories = categories
+        self.subcategories = subcategories
+        self.transactions = transactions
+
+
+# Поле транзакции, ссылающееся на справочник
+REFERENCE_FIELDS = {
+    StatusAction: 'status_act',
+    TypeAction: 'type_act',
+    CategoryAction: 'category_act',
+    SubcategoryAction: 'subcategory_act',
+}
+
+
+def _cascade(obj, references):
+    """id категорий и подкатегорий, удаляемых каскадно вместе с obj.
+
+    Дочерние элементы берутся из снимка справочников, без запросов.
+    """
+    if isinstance(obj, TypeAction):
+        categories = [item.pk for item in 
+                      references.categories_by_type.get(obj.pk, [])]
+        parents = categories
+    elif isinstance(obj, CategoryAction):
+        categories = []
+        parents = [obj.pk]
+    else:
+        return [], []
+    subcategories = [item.pk for pk in parents for item in 
+                     references.subcategories_by_category.get(pk, [])]
+    return categories, subcategories
+
+
+def _unlinked_fields(obj, categories, subcategories):
+    """Пары (поле транзакции, id элементов), ссылки на которые 
+    сбрасывает удаление obj."""
+    fields = [('subcategory_act', subcategories), 
+              ('category_act', categories), 
+              (REFERENCE_FIELDS[type(obj)], [obj.pk])]
+    return [(field, pks) for field, pks in fields if pks]
+
+
+def deletion_impact(obj):
+    """Возвращает DeletionImpact для элемента справочника obj.
+
+    Количество транзакций считается одним запросом COUNT.
+    """
+    categories, subcategories = _cascade(obj, registry.get())
+    fields = _unlinked_fields(obj, categories, subcategories)
+    return DeletionImpact(
+                len(categories), len(subcategories), 
+                Transaction.objects.filter(_linked_filter(fields)).count())
+
+
+def _linked_filter(fields):
+    return reduce(or_, [Q(**{f'{field}__in': pks}) for field, pks in fields])
+
+
+def delete_reference(obj, size=None, progress=None):
+    """Удаляет элемент справочника obj.
+
+    Сначала ссылки транзакций на obj и его дочерние элементы сбрасываются 
+    пакетными UPDATE ... SET NULL без загрузки записей, затем obj 
+    удаляется штатно: Django каскадно удаляет дочерние элементы 
+    и сбрасывает ссылки строк сводки DailyRollup, а транзакций, 
+    ссылающихся на obj, к этому моменту не остаётся.
+    progress - как в bulk_update().
+    """
+    size = size or settings.CASHFLOW_BULK_CHUNK_SIZE
+    categories, subcategories = _cascade(obj, registry.get())
+    fields = _unlinked_fields(obj, categories, subcategories)
+    linked = (Transaction.objects.filter(_linked_filter(fields))
+                                 .order_by().values('pk'))
+    # Все ссылки записи сбрасываются одним UPDATE, чтобы строка 
+    # и её индексы перезаписывались один раз
+    values = {field: Case(When(**{f'{field}__in': pks}, then=None), 
+                          default=F(field))
+              for field, pks in fields}
+    while True:
+        updated = (Transaction.objects.filter(pk__in=linked[:size])
+                                      .update(**values))
+        if progress is not None:
+            progress(updated)
+        if updated < size:
+            break
+    with write_atomic():
+        obj.delete()
+        bump_ledger_version()
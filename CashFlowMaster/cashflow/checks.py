@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+# Кэши, значения которых не видны другим процессам
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Кэш default должен быть общим для всех процессов.
+
+    В нём хранятся версии данных транзакций и справочников 
+    (cashflow.versions, cashflow.references): с кэшем в памяти процесса 
+    записи фоновых задач и команд управления не меняли бы версии, 
+    которые видит сервер, и он отдавал бы устаревшие страницы.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f'Кэш default ({backend}) не общий для процессов',
+            hint='Используйте FileBasedCache, Memcached, Redis '
+                 'или DatabaseCache',
+            id='cashflow.E001')]
+    return []
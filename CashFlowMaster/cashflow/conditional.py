@@ -0,0 +1,75 @@
+import hashlib
+from calendar import timegm
+from urllib.parse import urlencode
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .references import registry
+from .versions import aledger_version, ledger_version, version_time
+
+
+# Условные запросы (ETag, Last-Modified) к страницам, построенным
+# из транзакций и справочников: ответ не меняется, пока не изменились
+# версии данных транзакций и справочников, поэтому 304 отдаётся
+# без обращений к самим данным.
+
+
+def request_key(request):
+    """Ключ параметров запроса (фильтр, курсоры, размер страницы и т.п.).
+
+    Пустые параметры не учитываются, остальные сортируются, поэтому 
+    ключ не зависит от их порядка в URL.
+    """
+    params = sorted((name, value) for name, values in request.GET.lists()
+                    for value in values if value)
+    return hashlib.sha1(urlencode(params).encode()).hexdigest()[:16]
+
+
+def _etag(ledger, references, request):
+    # ETag относится к конкретной выборке: клиент, пришедший с ETag 
+    # другого фильтра или другой страницы, получает полный ответ
+    return f'"{ledger}-{references}-{request_key(request)}"'
+
+
+def _last_modified(ledger, references):
+    stamps = [version_time(ledger), version_time(references)]
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    return max(stamps) if stamps else None
+
+
+def ledger_etag(request):
+    """ETag ответа: версии транзакций и справочников и ключ параметров 
+    запроса (request_key)."""
+    return _etag(ledger_version(), registry.get().version, request)
+
+
+def ledger_last_modified(request):
+    """Время последнего изменения транзакций или справочников."""
+    return _last_modified(ledger_version(), registry.get().version)
+
+
+async def acondition(request, get_response):
+    """Асинхронный аналог condition(ledger_etag, ledger_last_modified).
+
+    Декоратор condition в Django 4.2 не поддерживает async-представления.
+    get_response - корутинная функция без аргументов, строящая полный
+    ответ; она не вызывается, если клиенту достаточно 304.
+    """
+    ledger = await aledger_version()
+    references = (await registry.aget()).version
+    etag = _etag(ledger, references, request)
+    last_modified = _last_modified(ledger, references)
+    if last_modified is not None:
+        last_modified = timegm(last_modified.utctimetuple())
+
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        response = await get_response()
+    # Заголовки выставляются так же, как в декораторе condition
+    if request.method in ('GET', 'HEAD'):
+        if last_modified and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+        response.headers.setdefault('ETag', etag)
+    return response
@@ -0,0 +1,306 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import date
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from .pagination import KeysetPaginator
+
+
+# Столбцы выгрузки: путь к значению в values_list и заголовок столбца
+EXPORT_COLUMNS = [
+    ('date_created', 'Дата'),
+    ('status_act__name', 'Статус'),
+    ('type_act__name', 'Тип'),
+    ('category_act__name', 'Категория'),
+    ('subcategory_act__name', 'Подкатегория'),
+    ('amount', 'Сумма'),
+    ('comment', 'Комментарий'),
+]
+
+# Начальные символы, с которых табличные редакторы читают ячейку 
+# как формулу. Такие текстовые значения выгружаются в CSV с апострофом 
+# в начале, чтобы при открытии файла формула не выполнилась.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Количество строк, читаемых из базы за один раз,
+# и примерный размер отдаваемого клиенту фрагмента ответа
+CHUNK_SIZE = 2000
+FLUSH_SIZE = 64 * 1024
+
+
+def export_rows(queryset):
+    """Возвращает итератор кортежей значений для выгрузки.
+
+    Строки читаются курсором порциями по CHUNK_SIZE в порядке
+    главного списка, без создания экземпляров модели.
+    """
+    return _export_queryset(queryset).iterator(chunk_size=CHUNK_SIZE)
+
+
+def aexport_rows(queryset):
+    """Асинхронный вариант export_rows() для async-представлений.
+
+    Строки - именованные кортежи: в Django 4.2 aiterator() обычного 
+    values_list выполняет запрос сразу, в цикле событий, а не в потоке.
+    """
+    return (_export_queryset(queryset, named=True)
+                .aiterator(chunk_size=CHUNK_SIZE))
+
+
+def _export_queryset(queryset, named=False):
+    return (KeysetPaginator.order(queryset)
+                           .values_list(*[path for path, _ in EXPORT_COLUMNS],
+                                        named=named))
+
+
+# Значения, начинающиеся с апострофа, тоже экранируются, 
+# чтобы загрузка выгруженного файла вернула их без изменений.
+_ESCAPED_PREFIXES = (*FORMULA_PREFIXES, "'")
+
+
+def escape_formula(value):
+    """Экранирует апострофом текстовое значение, похожее на формулу."""
+    if isinstance(value, str) and value.startswith(_ESCAPED_PREFIXES):
+        return "'" + value
+    return value
+
+
+def unescape_formula(value):
+    """Снимает экранирование escape_formula() при загрузке файла."""
+    if value.startswith("'") and value[1:].startswith(_ESCAPED_PREFIXES):
+        return value[1:]
+    return value
+
+
+def iter_export(encoder_class, rows):
+    """Генерирует файл выгрузки из строк rows фрагментами.
+
+    encoder_class - кодировщик формата из EXPORT_FORMATS: start() 
+    возвращает начало файла, encode(rows) - готовую часть файла после 
+    очередной порции строк (возможно, пустую), finish() - остаток. 
+    Строки передаются кодировщику порциями по CHUNK_SIZE.
+    """
+    encoder = encoder_class()
+    yield encoder.start()
+    rows = iter(rows)
+    while batch := list(islice(rows, CHUNK_SIZE)):
+        data = encoder.encode(batch)
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+async def aiter_export(encoder_class, rows):
+    """Асинхронный вариант iter_export() для асинхронного итератора rows."""
+    encoder = encoder_class()
+    yield encoder.start()
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK_SIZE:
+            data = encoder.encode(batch)
+            batch = []
+            if data:
+                yield data
+    yield encoder.encode(batch) + encoder.finish()
+
+
+class CsvEncoder:
+    """Кодировщик CSV: строки отдаются фрагментами от FLUSH_SIZE символов.
+
+    Файл начинается с BOM, чтобы Excel распознал кодировку UTF-8. 
+    Текстовые значения, похожие на формулы, экранируются 
+    (см. escape_formula).
+    """
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def start(self):
+        self.buffer.write('\ufeff')
+        self.writer.writerow([header for _, header in EXPORT_COLUMNS])
+        return self.finish()
+
+    def encode(self, rows):
+        self.writer.writerows([escape_formula(value) for value in row]
+                              for row in rows)
+        if self.buffer.tell() < FLUSH_SIZE:
+            return ''
+        return self.finish()
+
+    def finish(self):
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+# XLSX
+
+_XLSX_FILES = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'content-types">'
+        '<Default Extension="rels" ContentType="application/'
+        'vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/'
+        '2006/main" xmlns:r="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships">'
+        '<sheets><sheet name="Транзакции" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/'
+        '2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font>'
+        '</fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        # Стиль 1 - формат даты для ячеек date_created
+        '<cellXfs count="2"><xf xfId="0"/>'
+        '<xf numFmtId="14" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1">'
+        '<cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/'
+    '2006/main"><sheetData>'
+)
+_SHEET_FOOTER = '</sheetData></worksheet>'
+
+_EXCEL_EPOCH = date(1899, 12, 30)
+_XML_ILLEGAL_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _StreamBuffer:
+    """Файлоподобный приёмник без seek: zipfile пишет в него архив
+    потоково, а генератор забирает накопленные байты."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - _EXCEL_EPOCH).days}</v></c>'
+    if isinstance(value, int):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL_CHARS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+class XlsxEncoder:
+    """Кодировщик XLSX с постоянным расходом памяти.
+
+    Лист пишется в zip-архив потоково: строки с inline-строками
+    (без таблицы sharedStrings) сжимаются по мере поступления,
+    и готовые байты отдаются клиенту фрагментами.
+    """
+
+    def __init__(self):
+        self.buffer = _StreamBuffer()
+        self.archive = zipfile.ZipFile(self.buffer, 'w', 
+                                       zipfile.ZIP_DEFLATED)
+        self.sheet = None
+
+    def start(self):
+        for name, content in _XLSX_FILES.items():
+            self.archive.writestr(name, content)
+        data = self.buffer.drain()
+        self.sheet = self.archive.open('xl/worksheets/sheet1.xml', 'w',
+                                       force_zip64=True)
+        self.sheet.write((_SHEET_HEADER 
+                          + _xlsx_row([header for _, header 
+                                       in EXPORT_COLUMNS])).encode())
+        return data
+
+    def encode(self, rows):
+        parts = []
+        size = 0
+        for row in rows:
+            xml = _xlsx_row(row)
+            parts.append(xml)
+            size += len(xml)
+            if size >= FLUSH_SIZE:
+                self.sheet.write(''.join(parts).encode())
+                parts.clear()
+                size = 0
+        self.sheet.write(''.join(parts).encode())
+        return self.buffer.drain()
+
+    def finish(self):
+        self.sheet.write(_SHEET_FOOTER.encode())
+        self.sheet.close()
+        self.archive.close()
+        return self.buffer.drain()
+
+
+# Поддерживаемые форматы выгрузки: MIME-тип и кодировщик содержимого
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', CsvEncoder),
+    'xlsx': ('application/'
+             'vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+             XlsxEncoder),
+}
@@ -0,0 +1,121 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django_filters.constants import EMPTY_VALUES
+
+from .rollups import rollup_queryset
+from .versions import aledger_version, ledger_version
+
+
+# Поля TransactFilter, для вариантов которых считается количество
+# транзакций, и соответствующие им поля транзакции
+FACET_FIELDS = {
+    'status_act': 'status_act_id',
+    'type_act': 'type_act_id',
+    'category_act': 'category_act_id',
+    'subcategory_act': 'subcategory_act_id',
+}
+FACETS_KEY = 'cashflow:facets:{version}:{filter_key}'
+FACETS_TIMEOUT = 60 * 60
+
+
+def facet_rows(filterset):
+    """Количество транзакций по сочетаниям статуса, типа, категории
+    и подкатегории для состояния фильтра без учёта самих этих полей.
+
+    Результат - список кортежей (id статуса, id типа, id категории,
+    id подкатегории, количество), полученный одним группирующим запросом
+    к сводке DailyRollup, а если фильтр использует поля вне ключа
+    сводки - к самим транзакциям. Кэшируется по версии данных
+    и ключу фильтра без полей FACET_FIELDS.
+    """
+    key = FACETS_KEY.format(version=ledger_version(),
+                            filter_key=filterset.cache_key(FACET_FIELDS))
+    rows = cache.get(key)
+    if rows is None:
+        rows = [row for row in _facets_queryset(filterset) if row[-1]]
+        cache.set(key, rows, FACETS_TIMEOUT)
+    return rows
+
+
+async def afacet_rows(filterset):
+    """Асинхронный вариант facet_rows() для async-представлений."""
+    key = FACETS_KEY.format(version=await aledger_version(),
+                            filter_key=filterset.cache_key(FACET_FIELDS))
+    rows = await cache.aget(key)
+    if rows is None:
+        rows = [row async for row in _facets_queryset(filterset) if row[-1]]
+        await cache.aset(key, rows, FACETS_TIMEOUT)
+    return rows
+
+
+def _facets_queryset(filterset):
+    fields = list(FACET_FIELDS.values())
+    rollups = rollup_queryset(filterset, exclude=FACET_FIELDS)
+    if rollups is not None:
+        return (rollups.order_by()
+                       .values_list(*fields)
+                       .annotate(total_count=Sum('count')))
+    queryset = filterset.queryset
+    for name, value in filterset.cleaned_filters.items():
+        if value not in EMPTY_VALUES and name not in FACET_FIELDS:
+            queryset = filterset.filters[name].filter(queryset, value)
+    return (queryset.order_by()
+                    .values_list(*fields)
+                    .annotate(total_count=Count('id')))
+
+
+def format_count(count):
+    """Количество с разделением разрядов: 1234 -> '1 234'."""
+    return f'{count:,}'.replace(',', ' ')
+
+
+class FacetCounts:
+    """Количество транзакций для каждого варианта полей FACET_FIELDS.
+
+    Количество для варианта поля считается с учётом остальных полей
+    фильтра, но без учёта выбранного значения самого поля, поэтому
+    видно, сколько транзакций даст выбор любого другого варианта.
+
+    Attributes:
+    -----------
+    counts: dict
+        Количество транзакций (Counter по id варианта) по имени поля
+    """
+
+    def __init__(self, rows, selected):
+        # selected - выбранные значения полей FACET_FIELDS (id или None)
+        self.counts = {name: Counter() for name in FACET_FIELDS}
+        names = list(FACET_FIELDS)
+        for *key, count in rows:
+            matches = [selected[name] is None or selected[name] == value
+                       for name, value in zip(names, key)]
+            for i, name in enumerate(names):
+                if all(matches[:i] + matches[i + 1:]):
+                    self.counts[name][key[i]] += count
+
+    def label_form(self, form):
+        """Дописывает количество транзакций к вариантам полей формы."""
+        for name, counts in self.counts.items():
+            field = form.fields[name]
+            field.choices = [
+                (value, f'{label} ({format_count(counts[int(value)])})')
+                for value, label in field.choices if value != '']
+
+
+def _selected(filterset):
+    cleaned = filterset.cleaned_filters
+    return {name: int(cleaned[name])
+                  if cleaned.get(name) not in EMPTY_VALUES else None
+            for name in FACET_FIELDS}
+
+
+def compute_facets(filterset):
+    """Возвращает FacetCounts для проверенного фильтра транзакций."""
+    return FacetCounts(facet_rows(filterset), _selected(filterset))
+
+
+async def acompute_facets(filterset):
+    """Асинхронный вариант compute_facets() для async-представлений."""
+    return FacetCounts(await afacet_rows(filterset), _selected(filterset))
@@ -1,8 +1,20 @@
+import hashlib
+
 from django import forms 
 import django_filters
+from django_filters.constants import EMPTY_VALUES
+
+from . import search
+from .models import Transaction
+from .references import registry
+
 
-from .models import (Transaction, StatusAction, TypeAction, 
-                     CategoryAction, SubcategoryAction)
+def _reference_id(value):
+    """Идентификатор элемента справочника из параметра запроса или None."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 
 class TransactFilter(django_filters.FilterSet):
@@ -18,14 +30,19 @@ class TransactFilter(django_filters.FilterSet):
     -----------
     date_created: DateFromToRangeFilter
         Фильтр по диапазону дат создания транзакции
-    status_act: ModelChoiceFilter
+    status_act: ChoiceFilter
         Фильтр по статусу действия
-    type_act: ModelChoiceFilter
+    type_act: ChoiceFilter
         Фильтр по типу действия
-    category_act: ModelChoiceFilter
+    category_act: ChoiceFilter
         Фильтр по категории действия
-    subcategory_act: ModelChoiceFilter
+    subcategory_act: ChoiceFilter
         Фильтр по подкатегории действия
+    q: CharFilter
+        Полнотекстовый поиск по комментарию (см. cashflow.search)
+
+    Варианты выбора берутся из кэша справочников (references.registry), 
+    поэтому построение фильтра не обращается к базе.
     """
 
     date_created = django_filters.DateFromToRangeFilter(
@@ -34,30 +51,38 @@ class TransactFilter(django_filters.FilterSet):
                                 'class': 'form-control w-auto m-0 me-2 b-0',
                                 })
     )
-    status_act = django_filters.ModelChoiceFilter(
-        queryset=StatusAction.objects.all(),
+    status_act = django_filters.ChoiceFilter(
+        choices=lambda: registry.get().status_choices(),
         widget=forms.Select(attrs={'onchange': 'this.form.submit();',
                                    'class': 'form-select m-0'})
     )
-    type_act = django_filters.ModelChoiceFilter(
-        queryset=TypeAction.objects.all(),
+    type_act = django_filters.ChoiceFilter(
+        choices=lambda: registry.get().type_choices(),
         widget=forms.Select(attrs={'onchange': 'this.form.submit();',
                                    'class': 'form-select m-0',
                                    })
     )
-    category_act = django_filters.ModelChoiceFilter(
-        queryset=CategoryAction.objects.none(),
+    category_act = django_filters.ChoiceFilter(
+        choices=[],
         widget=forms.Select(attrs={'onchange': 'this.form.submit();',
                                    'class': 'form-select m-0',
                                    })
     )
-    subcategory_act = django_filters.ModelChoiceFilter(
-        queryset=SubcategoryAction.objects.none(),
+    subcategory_act = django_filters.ChoiceFilter(
+        choices=[],
         widget=forms.Select(attrs={'onchange': 'this.form.submit();',
                                    'class': 'form-select m-0',
                                    })
     )
 
+    q = django_filters.CharFilter(
+        method='filter_search',
+        widget=forms.TextInput(attrs={'class': 'form-control',
+                                      'placeholder': 'Поиск по комментарию',
+                                      'type': 'search',
+                                      })
+    )
+
     class Meta:
         model = Transaction
         fields = ['date_created', 'status_act', 'type_act', 
@@ -65,22 +90,40 @@ class TransactFilter(django_filters.FilterSet):
                   
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        references = registry.get()
         
-        if 'type_act' in self.data:
-            try:
-                type_act_id = int(self.data.get('type_act'))
-                self.filters['category_act'].queryset = (
-                    CategoryAction.objects.filter(type_act_id=type_act_id)
-                    )
-            except Exception as e:
-                print(e)
+        # Варианты категорий и подкатегорий зависят от выбранного 
+        # родителя; с некорректным id вариантов нет, и поле 
+        # не проходит проверку формы.
+        type_act_id = _reference_id(self.data.get('type_act'))
+        if type_act_id is not None:
+            self.filters['category_act'].extra['choices'] = (
+                references.category_choices(type_act_id)
+                )
+
+        category_act_id = _reference_id(self.data.get('category_act'))
+        if category_act_id is not None:
+            self.filters['subcategory_act'].extra['choices'] = (
+                references.subcategory_choices(category_act_id)
+                )
+
+    def filter_search(self, queryset, name, value):
+        return search.filter_queryset(queryset, value)
+
+    @property
+    def cleaned_filters(self):
+        """Очищенные значения полей; у несвязанного фильтра - пусто."""
+        return self.form.cleaned_data if self.is_bound else {}
+
+    def cache_key(self, exclude=()):
+        """Нормализованный ключ текущего состояния фильтра для кэша.
 
-        if 'category_act' in self.data:
-            try:
-                category_act_id = int(self.data.get('category_act'))
-                self.filters['subcategory_act'].queryset = (
-                    SubcategoryAction.objects.filter(
-                                            category_act_id=category_act_id)
-                    )
-            except Exception as e:
-                print(e)
\ No newline at end of file
+        Учитываются только заполненные поля после очистки формы, 
+        поэтому порядок и пустые параметры запроса не влияют на ключ. 
+        Поля из exclude в ключ не входят. 
+        Вызывается после успешной валидации фильтра.
+        """
+        parts = [f'{name}={value!r}' 
+                 for name, value in sorted(self.cleaned_filters.items())
+                 if value not in EMPTY_VALUES and name not in exclude]
+        return hashlib.sha1('&'.join(parts).encode()).hexdigest()
@@ -1,14 +1,144 @@
 from datetime import date
 
 from django import forms
+from django.conf import settings
+from django.urls import reverse
+
 from .models import (Transaction, StatusAction, TypeAction, 
-                     CategoryAction, SubcategoryAction)
+                     CategoryAction, SubcategoryAction, RecurringTemplate)
+from .bulk import create_transactions
+from .references import registry
+
+
+def _reference_choices(field, choices):
+    """Подставляет варианты выбора из кэша справочников вместо queryset."""
+    empty = [('', field.empty_label)] if field.empty_label is not None else []
+    field.choices = empty + choices
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _check_chain(form, references, type_id, category_id, subcategory_id):
+    """Проверяет цепочку тип → категория → подкатегория по снимку 
+    справочников и добавляет ошибки в форму."""
+    if category_id and (
+            type_id is None or 
+            references.category_parents.get(category_id) != type_id):
+        form.add_error('category_act', 
+                       'Категория не относится к выбранному типу')
+    if subcategory_id and (
+            category_id is None or 
+            references.subcategory_parents.get(subcategory_id) 
+            != category_id):
+        form.add_error('subcategory_act', 
+                       'Подкатегория не относится к выбранной категории')
+
+
+class ReferenceChainMixin:
+    """Проверка цепочки тип → категория → подкатегория в clean() 
+    модельной формы с полями type_act, category_act и subcategory_act."""
+
+    def chain_references(self):
+        """Снимок справочников, по которому проверяется цепочка."""
+        return registry.get()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        type_act = cleaned_data.get('type_act')
+        category_act = cleaned_data.get('category_act')
+        subcategory_act = cleaned_data.get('subcategory_act')
+        _check_chain(self, self.chain_references(), 
+                     type_act and type_act.pk, 
+                     category_act and category_act.pk, 
+                     subcategory_act and subcategory_act.pk)
+        return cleaned_data
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """Поле выбора справочника, проверяемое по снимку справочников.
+
+    Выбранный элемент собирается из снимка (ReferenceSnapshot.instance) 
+    без запроса к базе; id, которого нет в снимке, - ошибка выбора.
+
+    Attributes:
+    -----------
+    references: ReferenceSnapshot
+        Снимок справочников, по которому проверяется значение
+    """
+
+    def __init__(self, queryset, references=None, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.references = references
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        references = self.references or registry.get()
+        obj = references.instance(self.queryset.model, _to_int(value))
+        if obj is None:
+            raise forms.ValidationError(self.error_messages['invalid_choice'],
+                                        code='invalid_choice',
+                                        params={'value': value})
+        return obj
+
+
+def _reference_field(field, references):
+    """ReferenceChoiceField с параметрами поля модели field."""
+    return ReferenceChoiceField(field.queryset, references, 
+                                required=field.required, 
+                                label=field.label, initial=field.initial,
+                                help_text=field.help_text, 
+                                empty_label=field.empty_label)
+
+
+class ReferenceTreeSelect(forms.Select):
+    """Список выбора, связанный с родительским полем формы.
+
+    Варианты выбора пересобираются в браузере при смене родителя 
+    по дереву справочников (ReferenceTreeView), которое загружается 
+    один раз и кэшируется по версии справочников, без запросов 
+    к серверу на каждое изменение.
+
+    Attributes:
+    -----------
+    parent_field: str
+        Имя родительского поля формы (type_act или category_act)
+    """
 
+    class Media:
+        js = ['cashflow/js/reference_tree.js']
 
-class TransactCreateUpdateForm(forms.ModelForm):
+    def __init__(self, parent_field, attrs=None):
+        super().__init__(attrs)
+        self.parent_field = parent_field
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        prefix = name.rsplit('-', 1)[0] + '-' if '-' in name else ''
+        context['widget']['attrs'].update({
+            'data-chained-parent': prefix + self.parent_field,
+            'data-tree-url': (f"{reverse('cashflow:reference_tree')}"
+                              f"?v={registry.get().version}"),
+        })
+        return context
+
+
+class TransactCreateUpdateForm(ReferenceChainMixin, forms.ModelForm):
     """Форма для создания и обновления транзакции.
     
     Содержит поля для заполнения всех атрибутов модели Transaction.
+
+    Варианты выбора справочников берутся из кэша (references.registry), 
+    по нему же проверяются выбранные значения (ReferenceChoiceField). 
+    Категория и подкатегория связаны с типом и категорией 
+    через ReferenceTreeSelect, а их соответствие проверяется в clean() 
+    (ReferenceChainMixin) по тому же дереву справочников. Существующая 
+    транзакция сохраняется одним UPDATE только изменённых полей.
     
     Attributes:
     -----------
@@ -23,12 +153,37 @@ class TransactCreateUpdateForm(forms.ModelForm):
                                 years=range(1949, date.today().year + 1),
                                 ))
 
+    # Поля справочников: проверяются по снимку, а не запросами к базе
+    reference_fields = ('status_act', 'type_act', 
+                        'category_act', 'subcategory_act')
+
     class Meta:
         model = Transaction
         fields = '__all__'
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, references=None, **kwargs):
         super(TransactCreateUpdateForm, self).__init__(*args, **kwargs)
+        references = self.references = references or registry.get()
+        for name in self.reference_fields:
+            self.fields[name] = _reference_field(self.fields[name], 
+                                                 references)
+        _reference_choices(self.fields['status_act'], 
+                           references.status_choices())
+        _reference_choices(self.fields['type_act'], 
+                           references.type_choices())
+
+        type_act_id = _to_int(self._current_value('type_act'))
+        category_act_id = _to_int(self._current_value('category_act'))
+        self.fields['category_act'].widget = ReferenceTreeSelect('type_act')
+        _reference_choices(self.fields['category_act'], 
+                           references.category_choices(type_act_id)
+                           if type_act_id else [])
+        self.fields['subcategory_act'].widget = (
+                                        ReferenceTreeSelect('category_act'))
+        _reference_choices(self.fields['subcategory_act'], 
+                           references.subcategory_choices(category_act_id)
+                           if category_act_id else [])
+
         self.fields['date_created'].widget.attrs.update({
                                         'class': 'form-select w-auto me-2'})
         self.fields['status_act'].widget.attrs.update({
@@ -44,6 +199,282 @@ class TransactCreateUpdateForm(forms.ModelForm):
         self.fields['comment'].widget.attrs.update({
                                         'class': 'form-control'})
 
+    def _current_value(self, name):
+        if self.is_bound:
+            return self.data.get(self.add_prefix(name))
+        return self.initial.get(name)
+
+    def chain_references(self):
+        return self.references
+
+    def _get_validation_exclusions(self):
+        # Ссылки уже проверены по снимку справочников, а проверка 
+        # ForeignKey.validate() выполнила бы запрос на каждое поле
+        exclude = super()._get_validation_exclusions()
+        exclude.update(self.reference_fields)
+        return exclude
+
+    def save(self, commit=True):
+        if commit and not self.instance._state.adding and not self.errors:
+            if self.has_changed():
+                self.instance.save(update_fields=self.changed_data)
+            return self.instance
+        return super().save(commit)
+
+
+class TransactGridForm(TransactCreateUpdateForm):
+    """Строка таблицы ввода нескольких транзакций (TransactGridFormSet).
+
+    Отличается от TransactCreateUpdateForm только компактными виджетами: 
+    дата - одно поле ввода, комментарий - однострочное поле.
+    """
+
+    date_created = forms.DateField(
+                            initial=date.today, 
+                            widget=forms.DateInput(format='%Y-%m-%d', 
+                                                   attrs={'type': 'date'}))
+
+    class Meta:
+        model = Transaction
+        fields = '__all__'
+        widgets = {
+            'comment': forms.TextInput,
+        }
+
+    class Media:
+        js = ['cashflow/js/grid_transact.js']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['date_created'].widget.attrs.update({
+                                    'class': 'form-control form-control-sm'})
+        for name in (*self.reference_fields, 'amount', 'comment'):
+            widget = self.fields[name].widget
+            size = ('form-select-sm' if 'form-select' in widget.attrs['class']
+                    else 'form-control-sm')
+            widget.attrs['class'] += ' ' + size
+
+
+class BaseTransactGridFormSet(forms.BaseFormSet):
+    """Набор строк таблицы ввода транзакций.
+
+    Все строки проверяются по одному снимку справочников, 
+    а нетронутые пустые строки пропускаются. save() создаёт 
+    транзакции всех заполненных строк одним bulk_create 
+    в одной транзакции (bulk.create_transactions).
+    """
+
+    def __init__(self, *args, **kwargs):
+        form_kwargs = kwargs.setdefault('form_kwargs', {})
+        form_kwargs.setdefault('references', registry.get())
+        super().__init__(*args, **kwargs)
+
+    def filled_forms(self):
+        """Строки, в которые что-то введено."""
+        return [form for form in self.forms if form.has_changed()]
+
+    def clean(self):
+        if not any(form.has_changed() for form in self.forms):
+            raise forms.ValidationError('Заполните хотя бы одну строку')
+
+    def save(self):
+        """Создаёт транзакции заполненных строк и возвращает их."""
+        return create_transactions([form.instance 
+                                    for form in self.filled_forms()])
+
+
+TransactGridFormSet = forms.formset_factory(
+                            TransactGridForm, 
+                            formset=BaseTransactGridFormSet, 
+                            extra=settings.CASHFLOW_GRID_ROWS,
+                            max_num=settings.CASHFLOW_GRID_MAX_ROWS,
+                            absolute_max=settings.CASHFLOW_GRID_MAX_ROWS,
+                            validate_max=True)
+
+
+class TransactAdminForm(ReferenceChainMixin, forms.ModelForm):
+    """Форма транзакции для админки.
+
+    Виджеты справочников задаёт TransactionAdmin (автодополнение), 
+    а соответствие категории типу и подкатегории категории 
+    проверяет ReferenceChainMixin, как в TransactCreateUpdateForm.
+    """
+
+    class Meta:
+        model = Transaction
+        fields = '__all__'
+
+
+class RecurringTemplateAdminForm(ReferenceChainMixin, forms.ModelForm):
+    """Форма шаблона повторяющейся транзакции для админки.
+
+    Соответствие категории типу и подкатегории категории проверяет 
+    ReferenceChainMixin, как в TransactCreateUpdateForm.
+    """
+
+    class Meta:
+        model = RecurringTemplate
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            self.add_error('end_date', 
+                           'Последняя дата раньше первой')
+        return cleaned_data
+
+
+class IdListField(forms.Field):
+    """Список идентификаторов записей из нескольких значений параметра."""
+
+    widget = forms.MultipleHiddenInput
+    hidden_widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [int(item) for item in value or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Некорректный список записей')
+
+
+class TransactBulkForm(forms.Form):
+    """Форма массового действия над транзакциями.
+
+    Действие применяется к отмеченным записям (ids) или ко всем записям, 
+    подходящим под фильтр списка. Варианты справочников берутся из кэша 
+    (references.registry), а цепочка тип → категория → подкатегория 
+    проверяется один раз для всего действия.
+
+    Attributes:
+    -----------
+    action: ChoiceField
+        Действие: установка статуса, перенос в категорию или удаление
+    scope: ChoiceField
+        Отмеченные записи или все записи по фильтру
+    ids: IdListField
+        Идентификаторы отмеченных записей
+    confirm: BooleanField
+        Подтверждение удаления
+    background: BooleanField
+        Выполнить действие фоновой задачей (см. cashflow.jobs)
+    """
+
+    STATUS = 'status'
+    MOVE = 'move'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (STATUS, 'Установить статус'),
+        (MOVE, 'Перенести в категорию'),
+        (DELETE, 'Удалить'),
+    ]
+
+    SELECTED = 'selected'
+    FILTER = 'filter'
+    SCOPE_CHOICES = [
+        (SELECTED, 'Отмеченные записи'),
+        (FILTER, 'Все записи по фильтру'),
+    ]
+
+    action = forms.ChoiceField(label='Действие', choices=ACTION_CHOICES)
+    scope = forms.ChoiceField(label='Записи', choices=SCOPE_CHOICES)
+    ids = IdListField(required=False)
+    status_act = forms.TypedChoiceField(label='Статус', coerce=int, 
+                                        required=False)
+    type_act = forms.TypedChoiceField(label='Тип', coerce=int, 
+                                      required=False)
+    category_act = forms.TypedChoiceField(label='Категория', coerce=int, 
+                                          required=False)
+    subcategory_act = forms.TypedChoiceField(label='Подкатегория', 
+                                             coerce=int, required=False)
+    confirm = forms.BooleanField(required=False, 
+                                 widget=forms.HiddenInput)
+    background = forms.BooleanField(label='Выполнить в фоне', 
+                                    required=False)
+
+    def __init__(self, *args, **kwargs):
+        super(TransactBulkForm, self).__init__(*args, **kwargs)
+        references = registry.get()
+        empty = [('', '---------')]
+        self.fields['status_act'].choices = (empty 
+                                             + references.status_choices())
+        self.fields['type_act'].choices = empty + references.type_choices()
+        self.fields['category_act'].choices = (
+                                    empty + references.category_choices())
+        self.fields['category_act'].widget = ReferenceTreeSelect('type_act')
+        self.fields['subcategory_act'].choices = (
+                                    empty + references.subcategory_choices())
+        self.fields['subcategory_act'].widget = (
+                                        ReferenceTreeSelect('category_act'))
+
+        for name in ('action', 'scope', 'status_act', 'type_act', 
+                     'category_act', 'subcategory_act'):
+            self.fields[name].widget.attrs.update({'class': 'form-select'})
+        self.fields['background'].widget.attrs.update({
+                                        'class': 'form-check-input'})
+
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+        if action == self.STATUS:
+            required = ['status_act']
+        elif action == self.MOVE:
+            required = ['type_act', 'category_act', 'subcategory_act']
+        else:
+            required = []
+        for name in required:
+            if cleaned_data.get(name) in (None, ''):
+                self.add_error(name, 'Обязательное поле для этого действия')
+        if action == self.MOVE:
+            _check_chain(self, registry.get(), 
+                         cleaned_data.get('type_act'), 
+                         cleaned_data.get('category_act'), 
+                         cleaned_data.get('subcategory_act'))
+
+        if (cleaned_data.get('scope') == self.SELECTED 
+                and not cleaned_data.get('ids')):
+            self.add_error('ids', 'Не отмечено ни одной записи')
+        return cleaned_data
+
+    def update_values(self):
+        """Новые значения полей транзакций (attname) для действия."""
+        if self.cleaned_data['action'] == self.STATUS:
+            return {'status_act_id': self.cleaned_data['status_act']}
+        return {'type_act_id': self.cleaned_data['type_act'],
+                'category_act_id': self.cleaned_data['category_act'],
+                'subcategory_act_id': self.cleaned_data['subcategory_act']}
+
+
+class TransactImportForm(forms.Form):
+    """Форма для загрузки транзакций из CSV-файла.
+    
+    Attributes:
+    -----------
+    file: FileField
+        CSV-файл в формате выгрузки транзакций
+    batch_size: IntegerField
+        Необязательный размер пакета записи
+    background: BooleanField
+        Загрузить файл фоновой задачей (см. cashflow.jobs)
+    """
+
+    file = forms.FileField(label='Файл CSV')
+    batch_size = forms.IntegerField(label='Размер пакета', required=False,
+                                    min_value=1, max_value=50000)
+    background = forms.BooleanField(label='Загрузить в фоне', 
+                                    required=False)
+
+    def __init__(self, *args, **kwargs):
+        super(TransactImportForm, self).__init__(*args, **kwargs)
+        self.fields['file'].widget.attrs.update({
+                                        'class': 'form-control',
+                                        'accept': '.csv,text/csv'})
+        self.fields['batch_size'].widget.attrs.update({
+                                        'class': 'form-control'})
+        self.fields['background'].widget.attrs.update({
+                                        'class': 'form-check-input'})
+
 
 class StatusActionForm(forms.ModelForm):
     """Форма для создания и обновления объекта модели StatusAction.
@@ -71,6 +502,8 @@ class TypeActionForm(forms.ModelForm):
     -----------
     name: CharField
         Поле для ввода названия
+    flow: ChoiceField
+        Поле для выбора направления (поступление или списание)
     """
 
     class Meta:
@@ -81,6 +514,8 @@ class TypeActionForm(forms.ModelForm):
         super(TypeActionForm, self).__init__(*args, **kwargs)
         self.fields['name'].widget.attrs.update({
                                         'class': 'form-control mt-3'})
+        self.fields['flow'].widget.attrs.update({
+                                        'class': 'form-select'})
 
 
 class CategoryActionForm(forms.ModelForm):
@@ -102,6 +537,8 @@ class CategoryActionForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super(CategoryActionForm, self).__init__(*args, **kwargs)
+        _reference_choices(self.fields['type_act'], 
+                           registry.get().type_choices())
         self.fields['type_act'].widget.attrs.update({
                                         'class': 'form-select'})
         self.fields['name'].widget.attrs.update({
@@ -127,6 +564,8 @@ class SubcategoryActionForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super(SubcategoryActionForm, self).__init__(*args, **kwargs)
+        _reference_choices(self.fields['category_act'], 
+                           registry.get().category_choices())
         self.fields['category_act'].widget.attrs.update({
                                         'class': 'form-select'})
         self.fields['name'].widget.attrs.update({
@@ -0,0 +1,298 @@
+import codecs
+import csv
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import connection
+
+from . import search
+from .exports import EXPORT_COLUMNS, unescape_formula
+from .models import Transaction
+from .references import registry
+from .rollups import RollupDelta, write_atomic
+from .versions import bump_ledger_version
+
+
+# Заголовки столбцов совпадают с выгрузкой, поэтому выгруженный
+# файл можно загрузить обратно.
+IMPORT_HEADERS = {path: header for path, header in EXPORT_COLUMNS}
+REQUIRED_HEADERS = [IMPORT_HEADERS[path] for path in (
+    'date_created', 'type_act__name', 'category_act__name',
+    'subcategory_act__name', 'amount')]
+
+MAX_AMOUNT = 2147483647
+
+
+class ImportFileError(ValueError):
+    """Файл не может быть загружен целиком (например, нет столбцов)."""
+
+
+class ImportRowError(ValueError):
+    """Строка файла содержит некорректные данные."""
+
+
+class ReferenceLookup:
+    """Таблица соответствия названий справочников их идентификаторам.
+
+    Строится из снимка справочников (references.registry) и используется 
+    для проверки всех строк файла: категория ищется только среди категорий 
+    указанного типа, подкатегория - среди подкатегорий указанной категории, 
+    так же как это ограничивает ChainedForeignKey.
+
+    Attributes:
+    -----------
+    statuses: dict
+        Идентификатор статуса по названию
+    types: dict
+        Идентификатор типа по названию
+    categories: dict
+        Идентификатор категории по (id типа, название)
+    subcategories: dict
+        Идентификатор подкатегории по (id категории, название)
+    """
+
+    def __init__(self, references=None):
+        references = references or registry.get()
+        self.statuses = {item.name: item.pk for item in references.statuses}
+        self.types = {item.name: item.pk for item in references.types}
+        self.categories = {(item.parent_id, item.name): item.pk
+                           for item in references.categories}
+        self.subcategories = {(item.parent_id, item.name): item.pk
+                              for item in references.subcategories}
+
+    def resolve(self, status, type_, category, subcategory):
+        """Возвращает идентификаторы (статус, тип, категория, подкатегория).
+
+        Raises:
+        -------
+        ImportRowError
+            Если название не найдено или не относится к родителю
+        """
+        status_id = None
+        if status:
+            status_id = self.statuses.get(status)
+            if status_id is None:
+                raise ImportRowError(f'Неизвестный статус "{status}"')
+
+        type_id = self.types.get(type_)
+        if type_id is None:
+            raise ImportRowError(f'Неизвестный тип "{type_}"')
+        category_id = self.categories.get((type_id, category))
+        if category_id is None:
+            raise ImportRowError(f'Категория "{category}" не относится '
+                                 f'к типу "{type_}"')
+        subcategory_id = self.subcategories.get((category_id, subcategory))
+        if subcategory_id is None:
+            raise ImportRowError(f'Подкатегория "{subcategory}" не относится '
+                                 f'к категории "{category}"')
+        return status_id, type_id, category_id, subcategory_id
+
+
+class ImportResult:
+    """Итог загрузки файла.
+
+    Attributes:
+    -----------
+    created: int
+        Количество созданных транзакций
+    errors: list
+        Пары (номер строки файла, описание ошибки)
+    aborted: tuple
+        (номер строки файла, описание ошибки), если файл не удалось 
+        дочитать (неверная кодировка, испорченный CSV); транзакции 
+        из строк до неё записаны. None, если файл прочитан целиком.
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+        self.aborted = None
+
+    def write_error_report(self, fileobj):
+        """Записывает отчёт об ошибочных строках в формате CSV."""
+        writer = csv.writer(fileobj)
+        writer.writerow(['Строка', 'Ошибка'])
+        writer.writerows(self.errors)
+
+
+def decode_lines(fileobj, encoding='utf-8-sig'):
+    """Декодирует строки бинарного файла fileobj по одной.
+
+    io.TextIOWrapper декодирует файл блоками, и ошибка кодировки 
+    возникает раньше, чем читается содержащая её строка. Здесь она 
+    возникает при чтении этой строки, поэтому TransactImporter 
+    сообщает точный номер строки.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for line in fileobj:
+        yield decoder.decode(line)
+    yield decoder.decode(b'', final=True)
+
+
+def _read_error_message(error):
+    if isinstance(error, UnicodeDecodeError):
+        return f'Файл не в кодировке {error.encoding.upper()}'
+    return f'Некорректный CSV: {error}'
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(value, '%d.%m.%Y').date()
+    except ValueError:
+        raise ImportRowError(f'Некорректная дата "{value}"')
+
+
+def _parse_amount(value):
+    try:
+        amount = int(value)
+    except ValueError:
+        raise ImportRowError(f'Некорректная сумма "{value}"')
+    if not 0 <= amount <= MAX_AMOUNT:
+        raise ImportRowError(f'Сумма вне допустимого диапазона: {amount}')
+    return amount
+
+
+class TransactImporter:
+    """Потоковая загрузка транзакций из CSV.
+
+    Строки читаются по одной, проверяются по ReferenceLookup без запросов
+    к базе и записываются пакетами (один подготовленный INSERT 
+    на пакет), каждый пакет - в отдельной транзакции вместе 
+    с обновлением сводки DailyRollup.
+    Ошибочные строки попадают в ImportResult.errors и не прерывают загрузку.
+
+    Attributes:
+    -----------
+    batch_size: int
+        Количество строк в одном пакете записи
+    lookup: ReferenceLookup
+        Таблица соответствия названий справочников идентификаторам
+    progress: callable
+        Необязательная функция, которой после записи каждого пакета 
+        передаётся количество его строк (см. jobs.JobProgress)
+    """
+
+    def __init__(self, batch_size=None, lookup=None, progress=None):
+        self.batch_size = batch_size or settings.CASHFLOW_IMPORT_BATCH_SIZE
+        self.lookup = lookup or ReferenceLookup()
+        self.progress = progress
+
+    def run(self, lines):
+        """Загружает транзакции из итерируемого источника строк CSV.
+
+        Если файл не удаётся дочитать, загрузка останавливается: 
+        транзакции из предыдущих строк записываются, а строка с ошибкой 
+        сохраняется в ImportResult.aborted.
+
+        Raises:
+        -------
+        ImportFileError
+            Если заголовок не читается или в нём нет обязательных 
+            столбцов; в этом случае ничего не записывается
+        """
+        reader = csv.reader(lines)
+        try:
+            header = [name.strip().lstrip('\ufeff')
+                      for name in next(reader, [])]
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise ImportFileError(_read_error_message(e))
+        missing = [name for name in REQUIRED_HEADERS if name not in header]
+        if missing:
+            raise ImportFileError('Нет обязательных столбцов: '
+                                  + ', '.join(missing))
+        columns = {path: header.index(name) if name in header else None
+                   for path, name in IMPORT_HEADERS.items()}
+
+        result = ImportResult()
+        batch = []
+        try:
+            for row in reader:
+                if not any(row):
+                    continue
+                try:
+                    batch.append(self.build(row, columns))
+                except ImportRowError as e:
+                    result.errors.append((reader.line_num, str(e)))
+                    continue
+                if len(batch) >= self.batch_size:
+                    result.created += self.flush(batch)
+                    batch = []
+        except UnicodeDecodeError as e:
+            # Строка с ошибкой кодировки не дошла до csv.reader
+            result.aborted = (reader.line_num + 1, _read_error_message(e))
+        except csv.Error as e:
+            result.aborted = (reader.line_num, _read_error_message(e))
+        if batch:
+            result.created += self.flush(batch)
+        return result
+
+    def build(self, row, columns):
+        """Разбирает строку файла в кортеж значений INSERT_FIELDS."""
+        def value(path):
+            index = columns[path]
+            if index is None or index >= len(row):
+                return ''
+            return unescape_formula(row[index].strip())
+
+        date_created = _parse_date(value('date_created'))
+        amount = _parse_amount(value('amount'))
+        status_id, type_id, category_id, subcategory_id = (
+            self.lookup.resolve(value('status_act__name'),
+                                value('type_act__name'),
+                                value('category_act__name'),
+                                value('subcategory_act__name')))
+        return (date_created, status_id, type_id, category_id,
+                subcategory_id, amount, value('comment'))
+
+    def flush(self, batch):
+        """Записывает пакет транзакций, обновляет сводку и поисковый индекс."""
+        insert_transactions(batch)
+        if self.progress is not None:
+            self.progress(len(batch))
+        return len(batch)
+
+
+# Порядок полей в кортеже строки совпадает с ключом сводки
+# (rollups.TRANSACT_KEY_FIELDS), за которым следуют сумма и комментарий.
+INSERT_FIELDS = ('date_created', 'status_act', 'type_act', 'category_act',
+                 'subcategory_act', 'amount', 'comment')
+
+
+def insert_transactions(rows):
+    """Записывает транзакции rows - кортежи значений INSERT_FIELDS.
+
+    Все строки пишутся одним подготовленным INSERT в одной транзакции 
+    вместе с обновлением сводки DailyRollup и поискового индекса.
+    Проверка значений - на стороне вызывающего.
+    """
+    delta = RollupDelta()
+    for row in rows:
+        delta.add(row[:5], 1, row[5])
+
+    adapt_date = connection.ops.adapt_datefield_value
+    with write_atomic():
+        last_id = search.last_transaction_id()
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                _insert_sql(),
+                [(adapt_date(row[0]), *row[1:]) for row in rows])
+        search.index_after(last_id)
+        delta.apply()
+        bump_ledger_version()
+
+
+def _insert_sql():
+    # Пакет пишется одним подготовленным INSERT через executemany: 
+    # bulk_create компилирует каждое значение через ORM и на SQLite 
+    # дробит пакет на запросы по 999 параметров, что в несколько раз 
+    # медленнее при загрузке сотен тысяч строк.
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(Transaction._meta.get_field(name).column)
+                        for name in INSERT_FIELDS)
+    placeholders = ', '.join(['%s'] * len(INSERT_FIELDS))
+    return (f'INSERT INTO {quote(Transaction._meta.db_table)} '
+            f'({columns}) VALUES ({placeholders})')
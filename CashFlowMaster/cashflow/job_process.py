@@ -0,0 +1,20 @@
+import django
+
+
+# Инициализация процессов пула фоновых задач (см. jobs.Worker). 
+# Процессы запускаются методом spawn и импортируют этот модуль до 
+# настройки Django, поэтому он не импортирует модели.
+
+
+def init_process(database_name, caches):
+    """Настраивает Django в новом процессе пула.
+
+    Процесс работает с той же базой и тем же кэшем (caches - значение 
+    CACHES), что и распорядитель, в том числе с тестовыми или временными 
+    базой и кэшем замеров.
+    """
+    from django.conf import settings
+    settings.CACHES = caches
+    django.setup()
+    from django.db import connections
+    connections['default'].settings_dict['NAME'] = database_name
@@ -0,0 +1,511 @@
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import DatabaseError, close_old_connections, connection
+from django.http import QueryDict
+from django.utils import timezone
+
+from . import rollups
+from .job_process import init_process
+from .bulk import (REFERENCE_FIELDS, bulk_delete, bulk_update,
+                   delete_reference, deletion_impact)
+from .exports import CHUNK_SIZE, EXPORT_FORMATS, export_rows, iter_export
+from .filters import TransactFilter
+from .imports import ImportFileError, TransactImporter, decode_lines
+from .models import Job, Transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+# Фоновые задачи. Очередь - таблица Job в основной базе, внешний брокер
+# не нужен: представление ставит задачу (enqueue), распорядитель
+# manage.py run_worker забирает её условным UPDATE и выполняет в пуле
+# процессов. Обработчик задачи сообщает о ходе работы через JobProgress,
+# который заодно проверяет запрос отмены. Отмена срабатывает между
+# пакетами: уже зафиксированные пакеты остаются в силе, сводка DailyRollup
+# и версия данных обновляются вместе с каждым пакетом.
+# Распорядитель периодически отмечает свои выполняемые задачи
+# (Job.heartbeat_at); задачи без отметки дольше CASHFLOW_JOB_STALE_TIMEOUT
+# остались от аварийно остановленного распорядителя и завершаются ошибкой
+# (fail_stale): повторный запуск мог бы повторить уже зафиксированные
+# пакеты загрузки.
+
+# Название вида задачи и обработчик по виду задачи
+JOB_KINDS = {}
+_HANDLERS = {}
+
+# Сколько ошибочных строк загрузки сохранять в результате задачи
+IMPORT_ERRORS_SAVED = 100
+
+
+class JobError(Exception):
+    """Задача не может быть выполнена; сообщение показывается
+    пользователю без трассировки."""
+
+
+class JobCancelled(Exception):
+    """Пользователь запросил отмену выполняемой задачи."""
+
+
+def job_kind(kind, label):
+    """Регистрирует обработчик задач вида kind.
+
+    Обработчик принимает Job и JobProgress и возвращает результат,
+    сериализуемый в JSON.
+    """
+    def register(handler):
+        JOB_KINDS[kind] = label
+        _HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+def job_storage():
+    """Хранилище входных файлов и результатов задач."""
+    return FileSystemStorage(location=settings.CASHFLOW_JOBS_DIR)
+
+
+def enqueue(kind, params=None, upload=None):
+    """Ставит задачу вида kind в очередь и возвращает её Job.
+
+    upload - необязательный загруженный файл, который сохраняется
+    в job_storage() и передаётся обработчику через Job.input_name.
+    """
+    if kind not in _HANDLERS:
+        raise ValueError(f'Неизвестный вид задачи: {kind}')
+    input_name = ''
+    if upload is not None:
+        suffix = Path(upload.name).suffix
+        input_name = job_storage().save(f'input/{uuid.uuid4().hex}{suffix}',
+                                        upload)
+    return Job.objects.create(kind=kind, params=params or {},
+                              input_name=input_name)
+
+
+def cancel(pk):
+    """Отменяет задачу pk.
+
+    Задача в очереди отменяется сразу, выполняемая - при следующей
+    отметке хода работы. Возвращает True, если задача была активна.
+    """
+    if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+                status=Job.CANCELLED, cancel_requested=True,
+                finished_at=timezone.now()):
+        return True
+    return bool(Job.objects.filter(pk=pk, status=Job.RUNNING)
+                           .update(cancel_requested=True))
+
+
+class JobProgress:
+    """Ход выполнения задачи.
+
+    Вызов progress(count) прибавляет count обработанных записей.
+    Счётчик записывается в базу не чаще раза в interval секунд, и тот же
+    UPDATE проверяет запрос отмены и состояние задачи: если он не изменил 
+    строку (отмена запрошена или задача уже завершена, например 
+    fail_stale), выбрасывается JobCancelled.
+
+    Attributes:
+    -----------
+    job_id: int
+        Идентификатор задачи
+    done: int
+        Количество обработанных записей
+    interval: float
+        Минимальный интервал между записями счётчика, с
+    """
+
+    def __init__(self, job, interval=None):
+        self.job_id = job.pk
+        self.done = 0
+        self.interval = (settings.CASHFLOW_JOB_PROGRESS_INTERVAL
+                         if interval is None else interval)
+        self._flushed = time.monotonic()
+
+    def set_total(self, total):
+        """Записывает общее количество записей задачи."""
+        Job.objects.filter(pk=self.job_id).update(total=total)
+
+    def __call__(self, count):
+        self.done += count
+        if time.monotonic() - self._flushed >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Записывает счётчик и отметку распорядителя и проверяет 
+        запрос отмены."""
+        self._flushed = time.monotonic()
+        if not (Job.objects.filter(pk=self.job_id, status=Job.RUNNING,
+                                   cancel_requested=False)
+                           .update(progress=self.done,
+                                   heartbeat_at=timezone.now())):
+            raise JobCancelled
+
+
+def _filterset(query):
+    filterset = TransactFilter(QueryDict(query),
+                               queryset=Transaction.objects.all())
+    if filterset.is_bound and not filterset.is_valid():
+        raise JobError('Некорректные параметры фильтра')
+    return filterset
+
+
+# Обработчики
+
+@job_kind('export', 'Выгрузка транзакций')
+def run_export(job, progress):
+    """Выгрузка по фильтру: params - fmt и query (параметры фильтра)."""
+    fmt = job.params['fmt']
+    if fmt not in EXPORT_FORMATS:
+        raise JobError(f'Неизвестный формат выгрузки: {fmt}')
+    queryset = _filterset(job.params.get('query', '')).qs
+    progress.set_total(queryset.count())
+    exported = 0
+
+    def counted(rows):
+        nonlocal exported
+        for row in rows:
+            yield row
+            exported += 1
+            if exported % CHUNK_SIZE == 0:
+                progress(CHUNK_SIZE)
+
+    storage = job_storage()
+    name = f'export/{job.pk}.{fmt}'
+    path = Path(storage.path(name))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(path, 'wb') as output:
+            for part in iter_export(EXPORT_FORMATS[fmt][1],
+                                    counted(export_rows(queryset))):
+                output.write(part.encode() if isinstance(part, str)
+                             else part)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    Job.objects.filter(pk=job.pk).update(output_name=name)
+    return {'rows': exported}
+
+
+@job_kind('import', 'Загрузка транзакций')
+def run_import(job, progress):
+    """Загрузка CSV из Job.input_name: params - batch_size."""
+    storage = job_storage()
+    importer = TransactImporter(batch_size=job.params.get('batch_size'),
+                                progress=progress)
+    try:
+        with open(storage.path(job.input_name), 'rb') as fileobj:
+            result = importer.run(decode_lines(fileobj))
+    except ImportFileError as e:
+        raise JobError(str(e))
+    finally:
+        storage.delete(job.input_name)
+    return {'created': result.created,
+            'error_count': len(result.errors),
+            'errors': result.errors[:IMPORT_ERRORS_SAVED],
+            'aborted': result.aborted}
+
+
+@job_kind('rebuild_rollups', 'Пересчёт сводки')
+def run_rebuild_rollups(job, progress):
+    """Пересчёт DailyRollup: params - date_from и date_to (YYYY-MM-DD).
+
+    Пересчёт выполняется одной транзакцией и не прерывается отменой.
+    """
+    bounds = [job.params.get(name) for name in ('date_from', 'date_to')]
+    date_from, date_to = [date.fromisoformat(value) if value else None
+                          for value in bounds]
+    return {'created': rollups.rebuild(date_from, date_to)}
+
+
+@job_kind('bulk', 'Массовое действие')
+def run_bulk(job, progress):
+    """Массовое изменение или удаление транзакций.
+
+    params - delete (удалить) или values (новые значения по attname)
+    и записи: ids (отмеченные) либо query (параметры фильтра).
+    """
+    params = job.params
+    if params.get('ids') is not None:
+        queryset = Transaction.objects.filter(pk__in=params['ids'])
+    else:
+        queryset = _filterset(params.get('query', '')).qs
+    progress.set_total(queryset.count())
+    if params.get('delete'):
+        count = bulk_delete(queryset, progress=progress)
+    else:
+        count = bulk_update(queryset, params['values'], progress=progress)
+    return {'count': count}
+
+
+# Модель справочника по имени (model_name) для задач удаления
+REFERENCE_MODELS = {model._meta.model_name: model
+                    for model in REFERENCE_FIELDS}
+
+
+@job_kind('delete_reference', 'Удаление элемента справочника')
+def run_delete_reference(job, progress):
+    """Удаление элемента справочника: params - model (model_name) и pk.
+
+    При отмене ссылки транзакций, сброшенные уже обработанными пакетами,
+    не восстанавливаются, а сам элемент остаётся.
+    """
+    model = REFERENCE_MODELS[job.params['model']]
+    obj = model.objects.filter(pk=job.params['pk']).first()
+    if obj is None:
+        raise JobError('Элемент справочника уже удалён')
+    progress.set_total(deletion_impact(obj).transactions)
+    delete_reference(obj, progress=progress)
+    return {'name': str(obj)}
+
+
+# Выполнение
+
+def execute(pk):
+    """Выполняет задачу pk, уже переведённую в состояние RUNNING.
+
+    Итоговое состояние записывается, только если задача всё ещё 
+    выполняется: задачу, завершённую ошибкой за это время (fail_stale), 
+    оно не перезаписывает. Возвращает итоговое состояние задачи.
+    """
+    job = Job.objects.get(pk=pk)
+    progress = JobProgress(job)
+    fields = {}
+    try:
+        if job.cancel_requested:
+            raise JobCancelled
+        handler = _HANDLERS.get(job.kind)
+        if handler is None:
+            raise JobError(f'Неизвестный вид задачи: {job.kind}')
+        fields['result'] = handler(job, progress)
+        status = Job.DONE
+    except JobCancelled:
+        status = Job.CANCELLED
+    except JobError as e:
+        status, fields['error'] = Job.FAILED, str(e)
+    except Exception:
+        logger.exception('Задача %s завершилась ошибкой', pk)
+        status, fields['error'] = Job.FAILED, traceback.format_exc()
+    Job.objects.filter(pk=pk, status=Job.RUNNING).update(
+                status=status, progress=progress.done,
+                finished_at=timezone.now(), **fields)
+    return status
+
+
+def execute_in_process(pk):
+    """execute() в процессе пула.
+
+    Соединение с базой закрывается по CONN_MAX_AGE так же, как после 
+    обработки запроса сервером.
+    """
+    close_old_connections()
+    try:
+        return execute(pk)
+    finally:
+        close_old_connections()
+
+
+def claim_next(worker=''):
+    """Забирает из очереди следующую задачу и возвращает её id или None.
+
+    Задачу получает тот распорядитель, чей UPDATE ... WHERE status =
+    'queued' изменил строку, поэтому распорядителей может быть несколько.
+    worker - идентификатор распорядителя, записываемый в задачу.
+    """
+    queued = (Job.objects.filter(status=Job.QUEUED)
+                         .order_by('pk')
+                         .values_list('pk', flat=True))
+    for pk in queued[:10]:
+        now = timezone.now()
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+                    status=Job.RUNNING, started_at=now, worker=worker,
+                    heartbeat_at=now):
+            return pk
+    return None
+
+
+def fail_stale(timeout=None):
+    """Завершает ошибкой выполняемые задачи, отметка распорядителя 
+    которых старше timeout секунд (по умолчанию 
+    CASHFLOW_JOB_STALE_TIMEOUT). Возвращает количество таких задач.
+    """
+    if timeout is None:
+        timeout = settings.CASHFLOW_JOB_STALE_TIMEOUT
+    now = timezone.now()
+    return Job.objects.filter(
+                status=Job.RUNNING,
+                heartbeat_at__lt=now - timedelta(seconds=timeout)).update(
+                    status=Job.FAILED, finished_at=now,
+                    error='Распорядитель задачи перестал отвечать')
+
+
+def _fail(pks, error):
+    Job.objects.filter(pk__in=pks, status=Job.RUNNING).update(
+                status=Job.FAILED, error=error, finished_at=timezone.now())
+
+
+class Worker:
+    """Распорядитель фоновых задач.
+
+    Забирает задачи из очереди, пока есть свободные процессы пула,
+    и отмечает задачи, процесс которых завершился аварийно.
+
+    Attributes:
+    -----------
+    processes: int
+        Количество процессов пула; 0 - задачи выполняются в самом
+        распорядителе, по одной
+    poll: float
+        Пауза между опросами пустой очереди, с
+    worker_id: str
+        Идентификатор распорядителя (узел, процесс и случайный суффикс)
+    """
+
+    def __init__(self, processes=None, poll=None):
+        self.processes = (settings.CASHFLOW_WORKER_PROCESSES
+                          if processes is None else processes)
+        self.poll = settings.CASHFLOW_WORKER_POLL if poll is None else poll
+        self.worker_id = (f'{socket.gethostname()}:{os.getpid()}:'
+                          f'{uuid.uuid4().hex[:8]}')
+        self._beaten = None
+
+    def heartbeat(self):
+        """Отмечает выполняемые задачи распорядителя и завершает ошибкой 
+        потерянные задачи (fail_stale).
+
+        Выполняется при запуске и затем не чаще раза 
+        в CASHFLOW_JOB_HEARTBEAT_INTERVAL секунд.
+        """
+        now = time.monotonic()
+        if (self._beaten is not None and now - self._beaten 
+                < settings.CASHFLOW_JOB_HEARTBEAT_INTERVAL):
+            return
+        self._beaten = now
+        self.mark_running()
+        stale = fail_stale()
+        if stale:
+            logger.warning('Задачи остановленных распорядителей '
+                           'завершены ошибкой: %s', stale)
+
+    def mark_running(self):
+        """Ставит отметку распорядителя его выполняемым задачам."""
+        Job.objects.filter(status=Job.RUNNING, worker=self.worker_id).update(
+                    heartbeat_at=timezone.now())
+
+    @contextmanager
+    def beating(self):
+        """Отмечает выполняемые задачи из отдельного потока, пока 
+        распорядитель занят задачей в своём процессе.
+
+        Обработчик может долго не вызывать progress (пересчёт сводки - 
+        одна транзакция), и без отметок задачу завершил бы ошибкой другой 
+        распорядитель (fail_stale).
+        """
+        stop = threading.Event()
+
+        def beat():
+            try:
+                while not stop.wait(settings.CASHFLOW_JOB_HEARTBEAT_INTERVAL):
+                    try:
+                        self.mark_running()
+                    except DatabaseError:
+                        # SQLite: блокировку записи держит транзакция 
+                        # задачи; отметка повторяется через интервал
+                        logger.warning('Не удалось отметить задачи '
+                                       'распорядителя', exc_info=True)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def run(self, burst=False):
+        """Выполняет задачи из очереди.
+
+        При burst=True возвращается, когда очередь пуста и все задачи
+        завершены, иначе работает до прерывания.
+        """
+        if not self.processes:
+            return self.run_inline(burst)
+
+        running = {}
+        pool = self.create_pool()
+        try:
+            while True:
+                self.heartbeat()
+                while len(running) < self.processes:
+                    pk = claim_next(self.worker_id)
+                    if pk is None:
+                        break
+                    logger.info('Задача %s передана в пул', pk)
+                    running[pool.submit(execute_in_process, pk)] = pk
+                if not running:
+                    if burst:
+                        return
+                    time.sleep(self.poll)
+                    continue
+
+                finished, _ = wait(running, timeout=self.poll,
+                                   return_when=FIRST_COMPLETED)
+                broken = False
+                for future in finished:
+                    pk = running.pop(future)
+                    try:
+                        logger.info('Задача %s: %s', pk, future.result())
+                    except BrokenProcessPool:
+                        broken = True
+                        _fail([pk], 'Процесс задачи завершился аварийно')
+                if broken:
+                    # Остальные задачи сломанного пула тоже потеряны
+                    _fail(list(running.values()),
+                          'Процесс задачи завершился аварийно')
+                    running.clear()
+                    pool.shutdown(wait=False)
+                    pool = self.create_pool()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            if running:
+                _fail(list(running.values()), 'Распорядитель остановлен')
+
+    def run_inline(self, burst=False):
+        """Выполняет задачи по одной в текущем процессе."""
+        while True:
+            self.heartbeat()
+            pk = claim_next(self.worker_id)
+            if pk is not None:
+                with self.beating():
+                    status = execute(pk)
+                logger.info('Задача %s: %s', pk, status)
+            elif burst:
+                return
+            else:
+                time.sleep(self.poll)
+
+    def create_pool(self):
+        # spawn, а не fork: процессы пула не наследуют открытые 
+        # соединения распорядителя с базой
+        return ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_process,
+                    initargs=(connection.settings_dict['NAME'],
+                              settings.CACHES))
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from cashflow import benchmarks
+
+
+DEFAULT_URLS = ['/', '/api/transactions/', '/create_transact/']
+
+
+class Command(BaseCommand):
+    help = ('Измеряет время обработки запросов в текущем профиле настроек '
+            '(CASHFLOW_SETTINGS_PROFILE) на временной базе с тестовыми '
+            'данными. Для сравнения запустите команду в профилях '
+            'development (с DJANGO_DEBUG=1) и production. '
+            'Полный набор сценариев - команда benchmark.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Количество запросов на каждый адрес')
+        parser.add_argument('--transactions', type=int, default=2000,
+                            help='Количество тестовых транзакций')
+        parser.add_argument('--url', dest='urls', action='append',
+                            help='Адрес для измерения (можно несколько раз)')
+
+    def handle(self, *args, **options):
+        with benchmarks.temporary_database():
+            benchmarks.generate_references()
+            benchmarks.generate_transactions(options['transactions'])
+            self.stdout.write(
+                f'Профиль: {settings.SETTINGS_PROFILE}, '
+                f'DEBUG={settings.DEBUG}, '
+                f'CONN_MAX_AGE={connection.settings_dict["CONN_MAX_AGE"]}, '
+                f'кэш: {settings.CACHES["default"]["BACKEND"]}')
+            scenarios = [benchmarks.Scenario(url, lambda i, url=url: 
+                                             ('GET', url, None))
+                         for url in options['urls'] or DEFAULT_URLS]
+            with benchmarks.ClientRunner() as runner:
+                results = benchmarks.run_scenarios(runner, scenarios,
+                                                   options['requests'])
+            for url, stats in results.items():
+                self.stdout.write(
+                    f'{url} {stats["statuses"]}: '
+                    f'среднее {stats["mean"]:.2f} мс, '
+                    f'p50 {stats["p50"]:.2f} мс, '
+                    f'p95 {stats["p95"]:.2f} мс, '
+                    f'запросов {stats["queries"]}')
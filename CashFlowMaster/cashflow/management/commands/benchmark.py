@@ -0,0 +1,98 @@
+import json
+import platform
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cashflow import benchmarks
+
+
+RUNNERS = {
+    'client': benchmarks.ClientRunner,
+    'wsgi': benchmarks.WSGIRunner,
+}
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный замер представлений cashflow на временной базе '
+            'с синтетическими данными: p50/p95/p99, запросы к базе '
+            'на запрос и пиковая память. Отчёт сохраняется в JSON и может '
+            'сравниваться с эталоном.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=100000,
+                            help='Количество синтетических транзакций')
+        parser.add_argument('--extra-categories', type=int, default=0,
+                            help='Дополнительные категории каждого типа')
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Количество запросов на сценарий')
+        parser.add_argument('--mode', choices=[*RUNNERS, 'all'],
+                            default='all',
+                            help='Тестовый клиент Django, WSGI-сервер '
+                                 'или оба')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для отчёта JSON')
+        parser.add_argument('--input', 
+                            help='Взять отчёт из файла вместо замера')
+        parser.add_argument('--compare', 
+                            help='Эталонный отчёт JSON для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост p95 (доля), '
+                                 'по умолчанию 0.2')
+
+    def handle(self, *args, **options):
+        if options['input']:
+            with open(options['input'], encoding='utf-8') as f:
+                report = json.load(f)
+        else:
+            report = self.run(options)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        else:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, 
+                                         indent=2))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = benchmarks.compare_results(report, baseline,
+                                                     options['threshold'])
+            if regressions:
+                raise CommandError('Регрессия относительно эталона:\n' 
+                                   + '\n'.join(regressions))
+            self.stderr.write(self.style.SUCCESS(
+                'Регрессий относительно эталона нет'))
+
+    def run(self, options):
+        modes = list(RUNNERS) if options['mode'] == 'all' else [
+                                                            options['mode']]
+        report = {
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'profile': settings.SETTINGS_PROFILE,
+                'database': settings.DB_BACKEND,
+                'transactions': options['transactions'],
+                'requests': options['requests'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'results': {},
+        }
+        with benchmarks.temporary_database():
+            self.stderr.write('Генерация данных...')
+            benchmarks.generate_references(options['extra_categories'])
+            benchmarks.generate_transactions(options['transactions'],
+                                             seed=options['seed'])
+            for mode in modes:
+                self.stderr.write(f'Замер: {mode}')
+                scenarios = benchmarks.build_scenarios(options['requests'],
+                                                       options['seed'])
+                with RUNNERS[mode]() as runner:
+                    report['results'][mode] = benchmarks.run_scenarios(
+                                    runner, scenarios, options['requests'])
+        report['meta']['peak_rss_kb'] = benchmarks.peak_rss_kb()
+        return report
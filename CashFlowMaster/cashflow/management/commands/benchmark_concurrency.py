@@ -0,0 +1,91 @@
+import importlib.util
+import json
+import platform
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cashflow import benchmarks
+
+
+SERVERS = ['wsgi', 'asgi-sync', 'asgi-async']
+
+
+class Command(BaseCommand):
+    help = ('Замер пропускной способности при множестве одновременных '
+            'клиентов: WSGI-сервер с пулом потоков против uvicorn (ASGI) '
+            'с синхронными и асинхронными представлениями. Данные - '
+            'синтетические, во временной базе. Для ASGI нужен uvicorn.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=20000,
+                            help='Количество синтетических транзакций')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Количество запросов на сценарий')
+        parser.add_argument('--clients', type=int, default=50,
+                            help='Количество одновременных клиентов')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Рабочих потоков WSGI-сервера')
+        parser.add_argument('--read-delay', type=float, default=0,
+                            help='Пауза медленного клиента между порциями '
+                                 'чтения ответа, секунд')
+        parser.add_argument('--scenarios', nargs='+',
+                            choices=list(benchmarks.CONCURRENCY_SCENARIOS),
+                            default=list(benchmarks.CONCURRENCY_SCENARIOS))
+        parser.add_argument('--servers', nargs='+', choices=SERVERS,
+                            default=SERVERS)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для отчёта JSON')
+
+    def handle(self, *args, **options):
+        if (any(name.startswith('asgi') for name in options['servers'])
+                and importlib.util.find_spec('uvicorn') is None):
+            raise CommandError('Для замера под ASGI установите uvicorn '
+                               '("pip install uvicorn") или укажите '
+                               '--servers wsgi')
+
+        report = {
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'profile': settings.SETTINGS_PROFILE,
+                'database': settings.DB_BACKEND,
+                'transactions': options['transactions'],
+                'requests': options['requests'],
+                'clients': options['clients'],
+                'threads': options['threads'],
+                'read_delay': options['read_delay'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'results': {},
+        }
+        with benchmarks.temporary_database():
+            self.stderr.write('Генерация данных...')
+            benchmarks.generate_references()
+            benchmarks.generate_transactions(options['transactions'],
+                                             seed=options['seed'])
+            for name in options['servers']:
+                self.stderr.write(f'Замер: {name}')
+                if name == 'wsgi':
+                    server = benchmarks.PooledWSGIServer(options['threads'])
+                else:
+                    server = benchmarks.UvicornServer(
+                                        async_views=name == 'asgi-async')
+                with server:
+                    report['results'][name] = {
+                        scenario: benchmarks.run_load(
+                            server,
+                            benchmarks.concurrency_urls(scenario,
+                                                        options['requests']),
+                            options['clients'], options['read_delay'])
+                        for scenario in options['scenarios']}
+        report['meta']['peak_rss_kb'] = benchmarks.peak_rss_kb()
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        else:
+            self.stdout.write(json.dumps(report, ensure_ascii=False,
+                                         indent=2))
@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cashflow import partitions
+
+
+class Command(BaseCommand):
+    help = ('Создаёт месячные секции таблицы транзакций (PostgreSQL) '
+            'от указанной даты на несколько месяцев вперёд.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', 
+                            type=date.fromisoformat,
+                            help='Первый месяц (YYYY-MM-DD), '
+                                 'по умолчанию текущий')
+        parser.add_argument('--months', type=int, 
+                            default=partitions.MONTHS_AHEAD,
+                            help='Количество месяцев вперёд от текущего')
+
+    def handle(self, *args, **options):
+        if not partitions.is_partitioned():
+            raise CommandError('Таблица транзакций не секционирована: '
+                               'секции доступны только в PostgreSQL')
+        today = date.today()
+        created = partitions.ensure_partitions(
+                            options['date_from'] or today,
+                            partitions.add_months(today, options['months']))
+        for name in created:
+            self.stdout.write(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано секций: {len(created)}'))
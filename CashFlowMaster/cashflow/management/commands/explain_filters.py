@@ -0,0 +1,74 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cashflow.benchmarks import filter_combinations
+from cashflow.filters import TransactFilter
+from cashflow.models import Transaction
+from cashflow.pagination import KeysetPaginator
+
+
+# Признаки полного сканирования и отдельной сортировки в плане запроса
+# для SQLite (EXPLAIN QUERY PLAN) и PostgreSQL (EXPLAIN). В PostgreSQL
+# таблица может быть секционирована, и сканируются её секции.
+TABLE_SCAN_PATTERNS = [
+    re.compile(rf'\bSCAN {Transaction._meta.db_table}\b(?! USING)'),
+    re.compile(rf'Seq Scan on {Transaction._meta.db_table}(_\w+)?\b'),
+]
+SORT_PATTERNS = [
+    re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    # Узел сортировки, но не строка "Sort Key" узла Merge Append
+    re.compile(r'^\s*(->\s*)?(Incremental )?Sort\s+\(', re.MULTILINE),
+]
+
+
+class Command(BaseCommand):
+    help = ('Выводит план выполнения (EXPLAIN) первой страницы главного '
+            'списка для каждого сочетания полей TransactFilter '
+            'и отмечает сочетания с полным сканированием таблицы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если хотя бы один план '
+                 'сканирует таблицу транзакций целиком')
+        parser.add_argument(
+            '--page-size', type=int, default=settings.CASHFLOW_PAGE_SIZE,
+            help='Размер страницы, для которой строится план')
+
+    def handle(self, *args, **options):
+        scans = []
+        try:
+            combinations = list(filter_combinations())
+        except ValueError as e:
+            raise CommandError(f'Нельзя построить планы: {e}')
+        for params in combinations:
+            filterset = TransactFilter(params,
+                                       queryset=Transaction.objects.all())
+            if not filterset.is_valid():
+                raise CommandError(f'Некорректные параметры фильтра '
+                                   f'{params}: {filterset.errors}')
+            queryset = (KeysetPaginator.order(filterset.qs)
+                                       .select_related('status_act',
+                                                       'type_act',
+                                                       'category_act',
+                                                       'subcategory_act')
+                        [:options['page_size'] + 1])
+            plan = queryset.explain()
+
+            label = ', '.join(sorted(params)) or 'без фильтров'
+            is_scan = any(p.search(plan) for p in TABLE_SCAN_PATTERNS)
+            is_sort = any(p.search(plan) for p in SORT_PATTERNS)
+            if is_scan:
+                scans.append(label)
+                self.stdout.write(self.style.ERROR(f'[SCAN] {label}'))
+            elif is_sort:
+                self.stdout.write(self.style.WARNING(f'[SORT] {label}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'[OK]   {label}'))
+            self.stdout.write(plan + '\n')
+
+        if scans and options['strict']:
+            raise CommandError(f'Полное сканирование таблицы ({len(scans)}): '
+                               + '; '.join(scans))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cashflow.imports import (ImportFileError, TransactImporter,
+                              decode_lines)
+
+
+class Command(BaseCommand):
+    help = ('Загружает транзакции из CSV-файла в формате выгрузки. '
+            'Ошибочные строки пропускаются и попадают в отчёт.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к CSV-файлу')
+        parser.add_argument('--batch-size', type=int,
+                            help='Количество строк в одном пакете записи')
+        parser.add_argument('--errors', 
+                            help='Путь для отчёта об ошибочных строках (CSV)')
+        parser.add_argument('--encoding', default='utf-8-sig',
+                            help='Кодировка файла')
+
+    def handle(self, *args, **options):
+        importer = TransactImporter(batch_size=options['batch_size'])
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                result = importer.run(decode_lines(fileobj, 
+                                                   options['encoding']))
+        except (OSError, LookupError, ImportFileError) as e:
+            raise CommandError(e)
+        elapsed = time.perf_counter() - started
+
+        if result.errors and options['errors']:
+            with open(options['errors'], 'w', newline='', 
+                      encoding='utf-8') as report:
+                result.write_error_report(report)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено транзакций: {result.created} '
+            f'за {elapsed:.2f} с '
+            f'({result.created / max(elapsed, 1e-9):.0f} строк/с)'))
+        if result.errors:
+            self.stdout.write(self.style.WARNING(
+                f'Ошибочных строк: {len(result.errors)}'))
+            if not options['errors']:
+                for line_no, message in result.errors[:20]:
+                    self.stdout.write(f'  строка {line_no}: {message}')
+        if result.aborted:
+            line_no, message = result.aborted
+            raise CommandError(f'Загрузка прервана на строке {line_no}: '
+                               f'{message}')
@@ -0,0 +1,38 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from cashflow.models import RecurringTemplate
+from cashflow.recurring import materialize
+
+
+class Command(BaseCommand):
+    help = ('Создаёт транзакции по шаблонам повторяющихся транзакций '
+            'для всех повторений по указанную дату. Повторный запуск '
+            'не создаёт дубликатов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', type=date.fromisoformat,
+                            help='Последняя дата повторений (YYYY-MM-DD), '
+                                 'по умолчанию - сегодня')
+        parser.add_argument('--template', type=int, action='append', 
+                            dest='templates',
+                            help='id шаблона (можно указать несколько раз); '
+                                 'по умолчанию - все шаблоны')
+
+    def handle(self, *args, **options):
+        templates = None
+        if options['templates']:
+            templates = RecurringTemplate.objects.filter(
+                                            pk__in=options['templates'])
+        started = time.perf_counter()
+        result = materialize(options['until'], templates)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано транзакций: {result.created} '
+            f'по {result.templates} шаблонам за {elapsed:.2f} с'))
+        if result.skipped:
+            self.stdout.write(self.style.WARNING(
+                f'Пропущено уже созданных повторений: {result.skipped}'))
@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from cashflow import rollups
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает сводку DailyRollup по транзакциям '
+            'за период или целиком.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', 
+                            type=date.fromisoformat,
+                            help='Начало периода (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', 
+                            type=date.fromisoformat,
+                            help='Конец периода (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        created = rollups.rebuild(options['date_from'], options['date_to'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк сводки: {created}'))
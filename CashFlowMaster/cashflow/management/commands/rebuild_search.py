@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from cashflow import search
+
+
+class Command(BaseCommand):
+    help = ('Заново строит индекс полнотекстового поиска по комментариям '
+            'транзакций (SQLite; в PostgreSQL индекс обновляется СУБД).')
+
+    def handle(self, *args, **options):
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
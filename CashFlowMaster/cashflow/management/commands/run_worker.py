@@ -0,0 +1,40 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from cashflow.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди (cashflow.Job) '
+            'в пуле процессов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int,
+                            help='Количество процессов пула '
+                                 '(0 - выполнять задачи в этом процессе)')
+        parser.add_argument('--poll', type=float,
+                            help='Пауза между опросами пустой очереди, с')
+        parser.add_argument('--burst', action='store_true',
+                            help='Завершиться, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        # Журнал задач - в вывод команды на время её выполнения: 
+        # повторный вызов (call_command) не дублирует строки
+        logger = logging.getLogger('cashflow.jobs')
+        handler, level = None, logger.level
+        if options['verbosity'] > 0:
+            handler = logging.StreamHandler(self.stdout)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+        worker = Worker(processes=options['processes'], poll=options['poll'])
+        try:
+            worker.run(burst=options['burst'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if handler is not None:
+                logger.removeHandler(handler)
+                logger.setLevel(level)
@@ -0,0 +1,105 @@
+import threading
+from bisect import bisect_left
+
+
+# Границы корзин гистограмм (значение попадает в корзину le >= значения)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# (имя метрики, описание, корзины) в порядке аргументов ViewMetrics.observe
+METRICS = (
+    ('cashflow_view_queries', 'SQL-запросов на запрос', QUERY_BUCKETS),
+    ('cashflow_view_sql_seconds', 'Время выполнения SQL', SECONDS_BUCKETS),
+    ('cashflow_view_template_seconds', 'Время отрисовки шаблона',
+     SECONDS_BUCKETS),
+    ('cashflow_view_duration_seconds', 'Полное время обработки запроса',
+     SECONDS_BUCKETS),
+)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами в формате Prometheus.
+
+    Attributes:
+    -----------
+    buckets: tuple
+        Верхние границы корзин (без +Inf)
+    counts: list
+        Количество значений в каждой корзине, последняя - +Inf
+    total: float
+        Сумма значений
+    count: int
+        Количество значений
+    """
+
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _label(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+                      .replace('\n', '\\n'))
+
+
+class ViewMetrics:
+    """Гистограммы METRICS по имени URL представления.
+
+    Значения накапливаются в памяти процесса с момента его запуска;
+    при нескольких процессах сервера каждый отдаёт свои значения.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, queries, sql_seconds, template_seconds,
+                duration_seconds):
+        with self._lock:
+            histograms = self._views.get(view)
+            if histograms is None:
+                histograms = self._views[view] = [
+                    Histogram(buckets) for _, _, buckets in METRICS]
+            histograms[0].observe(queries)
+            histograms[1].observe(sql_seconds)
+            histograms[2].observe(template_seconds)
+            histograms[3].observe(duration_seconds)
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def render(self):
+        """Возвращает все гистограммы в текстовом формате Prometheus."""
+        with self._lock:
+            views = {view: [(list(h.counts), h.total, h.count)
+                            for h in histograms]
+                     for view, histograms in self._views.items()}
+        lines = []
+        for index, (name, help_text, buckets) in enumerate(METRICS):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for view in sorted(views):
+                counts, total, count = views[view][index]
+                label = f'view="{_label(view)}"'
+                cumulative = 0
+                for bound, bucket_count in zip((*buckets, '+Inf'), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} '
+                                 f'{cumulative}')
+                lines.append(f'{name}_sum{{{label}}} {total}')
+                lines.append(f'{name}_count{{{label}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = ViewMetrics()
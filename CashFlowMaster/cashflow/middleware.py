@@ -0,0 +1,141 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+# Статистика текущего запроса; None вне ViewMetricsMiddleware
+_current_stats = ContextVar('cashflow_view_stats', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше SQL-запросов, чем разрешено."""
+
+
+class _RequestStats:
+    __slots__ = ('queries', 'sql_seconds', 'template_started',
+                 'template_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_started = 0.0
+        self.template_seconds = 0.0
+
+    def rendered(self, response):
+        self.template_seconds += perf_counter() - self.template_started
+
+
+@contextmanager
+def timed_render(request):
+    """Учитывает отрисовку шаблона вне TemplateResponse (например,
+    render_to_string) во времени отрисовки шаблона запроса."""
+    stats = getattr(request, '_view_stats', None)
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.template_seconds += perf_counter() - started
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка выполнения SQL, учитывающая запрос в статистике запроса.
+
+    Подключается к каждому соединению один раз при его создании 
+    (cashflow.signals.count_view_queries): подключение обёртки 
+    на каждый запрос через connection.execute_wrapper обходится 
+    в несколько микросекунд на обращение к соединению потока.
+    """
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_seconds += perf_counter() - started
+        stats.queries += 1
+
+
+class ViewMetricsMiddleware:
+    """Учёт SQL-запросов и времени обработки по имени URL представления.
+
+    Для каждого запроса записывает в metrics количество и время
+    SQL-запросов, время отрисовки шаблонов (TemplateResponse и фрагментов,
+    отрисованных внутри timed_render) и полное время обработки. Должен стоять первым в MIDDLEWARE, чтобы учитывать
+    работу остальных middleware. Тело потоковых ответов не учитывается.
+
+    Если представление из settings.CASHFLOW_QUERY_BUDGETS выполнило больше
+    запросов, чем разрешено, пишется предупреждение в журнал, а при
+    settings.CASHFLOW_QUERY_BUDGETS_STRICT - QueryBudgetExceeded.
+
+    Поддерживает и синхронные, и асинхронные запросы, поэтому под ASGI 
+    не переводит async-представления в поток. Запросы асинхронного ORM 
+    выполняются в потоках sync_to_async, которым передаётся контекст 
+    запроса, и тоже учитываются.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = request._view_stats = _RequestStats()
+        token = _current_stats.set(stats)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self.finish(request, stats, perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = request._view_stats = _RequestStats()
+        token = _current_stats.set(stats)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self.finish(request, stats, perf_counter() - started)
+        return response
+
+    def finish(self, request, stats, duration):
+        """Записывает метрики запроса и проверяет бюджет запросов."""
+        match = request.resolver_match
+        view = match.view_name if match else UNRESOLVED_VIEW
+        metrics.observe(view, stats.queries, stats.sql_seconds,
+                        stats.template_seconds, duration)
+
+        budget = settings.CASHFLOW_QUERY_BUDGETS.get(view)
+        if budget is not None and stats.queries > budget:
+            message = (f'{view}: {stats.queries} SQL-запросов '
+                       f'при бюджете {budget} ({request.path})')
+            if settings.CASHFLOW_QUERY_BUDGETS_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+    def process_template_response(self, request, response):
+        # Вызывается непосредственно перед отрисовкой шаблона
+        stats = request._view_stats
+        stats.template_started = perf_counter()
+        response.add_post_render_callback(stats.rendered)
+        return response
@@ -0,0 +1,53 @@
+# Generated by Django 4.2 on 2026-10-18 17:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_rollups(apps, schema_editor):
+    Transaction = apps.get_model('cashflow', 'Transaction')
+    DailyRollup = apps.get_model('cashflow', 'DailyRollup')
+    rows = (Transaction.objects.order_by()
+                               .values_list('date_created', 'status_act_id',
+                                            'type_act_id', 'category_act_id',
+                                            'subcategory_act_id')
+                               .annotate(count=models.Count('id'),
+                                         total=models.Sum('amount')))
+    DailyRollup.objects.bulk_create(
+        [DailyRollup(day=day, status_act_id=status, type_act_id=type_,
+                     category_act_id=category, subcategory_act_id=subcategory,
+                     count=count, amount=total)
+         for day, status, type_, category, subcategory, count, total in rows],
+        batch_size=200)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashflow', '0006_transaction_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(null=True, verbose_name='День')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('amount', models.BigIntegerField(default=0, verbose_name='Сумма')),
+                ('category_act', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='cashflow.categoryaction', verbose_name='Категория')),
+                ('status_act', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='cashflow.statusaction', verbose_name='Статус')),
+                ('subcategory_act', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='cashflow.subcategoryaction', verbose_name='Подкатегория')),
+                ('type_act', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='cashflow.typeaction', verbose_name='Тип')),
+            ],
+            options={
+                'verbose_name': 'Сводка за день',
+                'verbose_name_plural': 'Сводки за день',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'status_act', 'type_act', 'category_act', 'subcategory_act'), name='daily_rollup_key'),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+
+def mark_income_types(apps, schema_editor):
+    # Тип «Пополнение» из исходных справочников считается поступлением
+    TypeAction = apps.get_model('cashflow', 'TypeAction')
+    TypeAction.objects.filter(name='Пополнение').update(flow='income')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashflow', '0007_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='typeaction',
+            name='flow',
+            field=models.CharField(choices=[('income', 'Поступление'), ('expense', 'Списание')], default='expense', max_length=10, verbose_name='Направление'),
+        ),
+        migrations.RunPython(mark_income_types, migrations.RunPython.noop),
+    ]
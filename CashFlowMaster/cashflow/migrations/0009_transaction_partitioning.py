@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from cashflow import partitions
+
+
+def partition_transactions(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        partitions.convert_table(schema_editor.connection, partitioned=True)
+
+
+def unpartition_transactions(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        partitions.convert_table(schema_editor.connection, partitioned=False)
+
+
+class Migration(migrations.Migration):
+    # Секционирование доступно только в PostgreSQL, 
+    # на SQLite миграция ничего не делает
+
+    dependencies = [
+        ('cashflow', '0008_typeaction_flow'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_transactions, 
+                             unpartition_transactions),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from cashflow import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    # Индекс полнотекстового поиска по комментарию: таблица FTS5 в SQLite, 
+    # столбец tsvector с индексом GIN в PostgreSQL (см. cashflow.search)
+
+    dependencies = [
+        ('cashflow', '0009_transaction_partitioning'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
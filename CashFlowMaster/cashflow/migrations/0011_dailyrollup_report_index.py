@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashflow', '0010_transaction_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailyrollup',
+            index=models.Index(fields=['type_act', 'category_act', 'day', 'amount'], name='rollup_type_cat_day_idx'),
+        ),
+    ]
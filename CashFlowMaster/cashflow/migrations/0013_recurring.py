@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-18 18:31
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashflow', '0012_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('period', models.CharField(choices=[('day', 'День'), ('week', 'Неделя'), ('month', 'Месяц'), ('year', 'Год')], default='month', max_length=10, verbose_name='Период')),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Повторять каждые N периодов', verbose_name='Интервал')),
+                ('start_date', models.DateField(default=datetime.date.today, verbose_name='Первая дата')),
+                ('end_date', models.DateField(blank=True, null=True, verbose_name='Последняя дата')),
+                ('amount', models.PositiveIntegerField(verbose_name='Сумма')),
+                ('comment', models.TextField(blank=True, verbose_name='Комментарий')),
+                ('active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('materialized_until', models.DateField(blank=True, editable=False, null=True, verbose_name='Транзакции созданы по')),
+                ('category_act', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='cashflow.categoryaction', verbose_name='Категория')),
+                ('status_act', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='cashflow.statusaction', verbose_name='Статус')),
+                ('subcategory_act', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='cashflow.subcategoryaction', verbose_name='Подкатегория')),
+                ('type_act', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='cashflow.typeaction', verbose_name='Тип')),
+            ],
+            options={
+                'verbose_name': 'Повторяющаяся транзакция',
+                'verbose_name_plural': 'Повторяющиеся транзакции',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecurringOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occurrence_date', models.DateField(verbose_name='Дата повторения')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='cashflow.recurringtemplate', verbose_name='Шаблон')),
+            ],
+            options={
+                'verbose_name': 'Повторение шаблона',
+                'verbose_name_plural': 'Повторения шаблонов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recurringoccurrence',
+            constraint=models.UniqueConstraint(fields=('template', 'occurrence_date'), name='recurring_occurrence_key'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-18 18:43
+
+import cashflow.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashflow', '0013_recurring'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transact_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transact_status_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transact_type_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transact_type_cat_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transact_subcat_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=cashflow.models.ListOrderIndex(models.OrderBy(models.F('date_created'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='transact_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=cashflow.models.ListOrderIndex(models.F('status_act'), models.OrderBy(models.F('date_created'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='transact_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=cashflow.models.ListOrderIndex(models.F('type_act'), models.OrderBy(models.F('date_created'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='transact_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=cashflow.models.ListOrderIndex(models.F('type_act'), models.F('category_act'), models.OrderBy(models.F('date_created'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='transact_type_cat_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=cashflow.models.ListOrderIndex(models.F('subcategory_act'), models.OrderBy(models.F('date_created'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='transact_subcat_date_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from datetime import date
 
-from django.db import models
+from django.db import models, transaction as db_transaction
+from django.db.models import F, OrderBy
 from smart_selects.db_fields import ChainedForeignKey
 
 
@@ -21,11 +22,23 @@ class StatusAction(models.Model):
 
 
 class TypeAction(models.Model):
+    INCOME = 'income'
+    EXPENSE = 'expense'
+    FLOW_CHOICES = [
+        (INCOME, 'Поступление'),
+        (EXPENSE, 'Списание'),
+    ]
+
     name = models.CharField(
                 max_length=100, verbose_name='Тип', unique=True,
                 error_messages={
                     'unique': 'Тип с таким именем уже существует',
                     })
+    flow = models.CharField(max_length=10, 
+                            choices=FLOW_CHOICES, 
+                            default=EXPENSE,
+                            verbose_name='Направление',
+                            )
 
     class Meta:
         verbose_name = 'Тип транзакций'
@@ -73,6 +86,33 @@ class SubcategoryAction(models.Model):
         return self.name
 
 
+class ListOrderIndex(models.Index):
+    """Индекс, допускающий NULLS LAST в выражениях сортировки.
+
+    PostgreSQL обходит индекс в порядке ORDER BY главного списка 
+    (date_created DESC NULLS LAST, id DESC), только если направление 
+    и положение NULL в индексе совпадают с сортировкой. SQLite не допускает 
+    NULLS FIRST/LAST в определении индекса, но NULL в нём меньше любого 
+    значения и при DESC и так идёт последним, поэтому модификатор 
+    опускается.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'sqlite':
+            return super().create_sql(model, schema_editor, using, **kwargs)
+        expressions = [
+            OrderBy(expression.expression, descending=expression.descending)
+            if isinstance(expression, OrderBy) else expression
+            for expression in self.expressions]
+        index = models.Index(*expressions, name=self.name,
+                             condition=self.condition)
+        return index.create_sql(model, schema_editor, using, **kwargs)
+
+
+# Ключ сортировки главного списка (см. KeysetPaginator.order)
+LIST_ORDER = (F('date_created').desc(nulls_last=True), F('id').desc())
+
+
 class Transaction(models.Model):
     date_created = models.DateField(default=date.today,
                                     null=True,
@@ -115,8 +155,278 @@ class Transaction(models.Model):
     class Meta:
         verbose_name = 'Транзакция'
         verbose_name_plural = 'Транзакции'
+        # Индексы повторяют сочетания полей TransactFilter и всегда 
+        # заканчиваются ключом сортировки списка LIST_ORDER, 
+        # чтобы фильтр по диапазону дат и курсорная пагинация 
+        # обходились без сканирования таблицы и отдельной сортировки.
+        indexes = [
+            ListOrderIndex(*LIST_ORDER, name='transact_date_idx'),
+            ListOrderIndex(F('status_act'), *LIST_ORDER,
+                           name='transact_status_date_idx'),
+            ListOrderIndex(F('type_act'), *LIST_ORDER,
+                           name='transact_type_date_idx'),
+            ListOrderIndex(F('type_act'), F('category_act'), *LIST_ORDER,
+                           name='transact_type_cat_date_idx'),
+            ListOrderIndex(F('subcategory_act'), *LIST_ORDER,
+                           name='transact_subcat_date_idx'),
+        ]
         
     def __str__(self):
         return (f'Запись от {self.date_created}, ' 
                 f'статус - {self.status_act}, ' 
-                f'сумма - {self.amount}')
\ No newline at end of file
+                f'сумма - {self.amount}')
+
+    def save(self, *args, **kwargs):
+        # Сигналы сохранения обновляют сводку и поисковый индекс 
+        # (см. cashflow.signals): они фиксируются вместе с записью. 
+        # Удаление Django и так выполняет в транзакции.
+        with db_transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class DailyRollup(models.Model):
+    """Сводка транзакций за день в разрезе справочников.
+
+    Хранит количество и сумму транзакций для каждого сочетания 
+    (день, статус, тип, категория, подкатегория). Поддерживается 
+    инкрементально при изменении транзакций (см. cashflow.rollups), 
+    поэтому отчёты читают несколько тысяч строк сводки 
+    вместо всей таблицы транзакций.
+
+    Внешние ключи удаляются так же, как у Transaction (SET_NULL), 
+    поэтому суммы по любой группировке остаются верными и после 
+    удаления элементов справочников.
+    """
+
+    day = models.DateField(null=True, verbose_name='День')
+    status_act = models.ForeignKey('StatusAction',
+                                   null=True,
+                                   on_delete=models.SET_NULL, 
+                                   verbose_name='Статус',
+                                   )
+    type_act = models.ForeignKey('TypeAction', 
+                                 null=True,
+                                 on_delete=models.SET_NULL, 
+                                 verbose_name='Тип',
+                                 )
+    category_act = models.ForeignKey('CategoryAction',
+                                     null=True,
+                                     on_delete=models.SET_NULL, 
+                                     verbose_name='Категория',
+                                     )
+    subcategory_act = models.ForeignKey('SubcategoryAction',
+                                        null=True,
+                                        on_delete=models.SET_NULL, 
+                                        verbose_name='Подкатегория',
+                                        )
+    count = models.PositiveIntegerField(default=0, 
+                                        verbose_name='Количество')
+    amount = models.BigIntegerField(default=0, verbose_name='Сумма')
+
+    class Meta:
+        verbose_name = 'Сводка за день'
+        verbose_name_plural = 'Сводки за день'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status_act', 'type_act',
+                                            'category_act', 
+                                            'subcategory_act'],
+                                    name='daily_rollup_key'),
+        ]
+        # Покрывающий индекс для помесячного отчёта (cashflow.reports):
+        # группировка по типу и категории читает только индекс
+        indexes = [
+            models.Index(fields=['type_act', 'category_act', 'day', 
+                                 'amount'],
+                         name='rollup_type_cat_day_idx'),
+        ]
+
+    def __str__(self):
+        return (f'Сводка за {self.day}: ' 
+                f'{self.count} шт., сумма - {self.amount}')
+
+
+class Job(models.Model):
+    """Фоновая задача, выполняемая процессом manage.py run_worker.
+
+    Очередь хранится в самой базе: представление создаёт задачу, 
+    а распорядитель run_worker забирает её условным UPDATE и передаёт 
+    в пул процессов (см. cashflow.jobs). Выполняемая задача хранит 
+    идентификатор распорядителя и время его последней отметки: задачи 
+    аварийно остановленного распорядителя завершаются ошибкой.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+        (CANCELLED, 'Отменена'),
+    ]
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    kind = models.CharField(max_length=50, verbose_name='Вид')
+    params = models.JSONField(default=dict, blank=True, 
+                              verbose_name='Параметры')
+    status = models.CharField(max_length=10, 
+                              choices=STATUS_CHOICES, 
+                              default=QUEUED,
+                              verbose_name='Состояние',
+                              )
+    progress = models.PositiveIntegerField(default=0, 
+                                           verbose_name='Обработано')
+    total = models.PositiveIntegerField(null=True, blank=True, 
+                                        verbose_name='Всего')
+    cancel_requested = models.BooleanField(default=False, 
+                                           verbose_name='Запрошена отмена')
+    result = models.JSONField(null=True, blank=True, 
+                              verbose_name='Результат')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    input_name = models.CharField(max_length=255, blank=True, 
+                                  verbose_name='Входной файл')
+    output_name = models.CharField(max_length=255, blank=True, 
+                                   verbose_name='Файл результата')
+    created_at = models.DateTimeField(auto_now_add=True, 
+                                      verbose_name='Создана')
+    started_at = models.DateTimeField(null=True, blank=True, 
+                                      verbose_name='Начата')
+    finished_at = models.DateTimeField(null=True, blank=True, 
+                                       verbose_name='Завершена')
+    worker = models.CharField(max_length=100, blank=True, 
+                              verbose_name='Распорядитель')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, 
+                                        verbose_name='Отметка распорядителя')
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'id'], name='job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'Задача {self.pk}: {self.get_kind_display()}'
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    @property
+    def percent(self):
+        """Доля выполненной работы в процентах или None."""
+        if not self.total:
+            return None
+        return min(100, self.progress * 100 // self.total)
+
+    def get_kind_display(self):
+        # Виды задач регистрируются в cashflow.jobs, который сам 
+        # импортирует модели
+        from .jobs import JOB_KINDS
+        return JOB_KINDS.get(self.kind, self.kind)
+
+
+class RecurringTemplate(models.Model):
+    """Шаблон повторяющейся транзакции (аренда, зарплата, подписки).
+
+    Правило повторения: каждые interval периодов period, начиная 
+    с start_date и до end_date включительно. Для месячного и годового 
+    периода число месяца берётся из start_date, а в коротких месяцах - 
+    последнее число. Транзакции по шаблону создаёт команда 
+    manage.py materialize_recurring (см. cashflow.recurring).
+    """
+
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+    YEAR = 'year'
+    PERIOD_CHOICES = [
+        (DAY, 'День'),
+        (WEEK, 'Неделя'),
+        (MONTH, 'Месяц'),
+        (YEAR, 'Год'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name='Название')
+    period = models.CharField(max_length=10, 
+                              choices=PERIOD_CHOICES, 
+                              default=MONTH,
+                              verbose_name='Период',
+                              )
+    interval = models.PositiveSmallIntegerField(
+                                default=1, 
+                                verbose_name='Интервал',
+                                help_text='Повторять каждые N периодов',
+                                )
+    start_date = models.DateField(default=date.today, 
+                                  verbose_name='Первая дата')
+    end_date = models.DateField(null=True, blank=True, 
+                                verbose_name='Последняя дата')
+    status_act = models.ForeignKey('StatusAction',
+                                   blank=True,
+                                   null=True,
+                                   on_delete=models.SET_NULL, 
+                                   verbose_name='Статус',
+                                   )
+    type_act = models.ForeignKey('TypeAction', 
+                                 null=True,
+                                 on_delete=models.SET_NULL, 
+                                 verbose_name='Тип',
+                                 )
+    category_act = models.ForeignKey('CategoryAction',
+                                     null=True,
+                                     on_delete=models.SET_NULL, 
+                                     verbose_name='Категория',
+                                     )
+    subcategory_act = models.ForeignKey('SubcategoryAction',
+                                        null=True,
+                                        on_delete=models.SET_NULL, 
+                                        verbose_name='Подкатегория',
+                                        )
+    amount = models.PositiveIntegerField(verbose_name='Сумма')
+    comment = models.TextField(blank=True, verbose_name='Комментарий')
+    active = models.BooleanField(default=True, verbose_name='Активен')
+    materialized_until = models.DateField(
+                                null=True, blank=True, editable=False,
+                                verbose_name='Транзакции созданы по',
+                                )
+
+    class Meta:
+        verbose_name = 'Повторяющаяся транзакция'
+        verbose_name_plural = 'Повторяющиеся транзакции'
+
+    def __str__(self):
+        return self.name
+
+
+class RecurringOccurrence(models.Model):
+    """Повторение шаблона, по которому уже создана транзакция.
+
+    Уникальный ключ (шаблон, дата) делает создание транзакций 
+    идемпотентным: повторный запуск или параллельный процесс 
+    не создаст дубликат. Ключ хранится отдельно от транзакций, 
+    потому что уникальный индекс секционированной таблицы транзакций 
+    обязан включать date_created, а дату транзакции можно изменить. 
+    Удалённая вручную транзакция повторения не создаётся заново.
+    """
+
+    template = models.ForeignKey('RecurringTemplate', 
+                                 on_delete=models.CASCADE,
+                                 related_name='occurrences',
+                                 verbose_name='Шаблон',
+                                 )
+    occurrence_date = models.DateField(verbose_name='Дата повторения')
+
+    class Meta:
+        verbose_name = 'Повторение шаблона'
+        verbose_name_plural = 'Повторения шаблонов'
+        constraints = [
+            models.UniqueConstraint(fields=['template', 'occurrence_date'],
+                                    name='recurring_occurrence_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.template} от {self.occurrence_date}'
@@ -0,0 +1,274 @@
+import base64
+import binascii
+from datetime import date
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .models import LIST_ORDER
+
+
+AFTER_PARAM = 'after'
+BEFORE_PARAM = 'before'
+CURSOR_PARAMS = (AFTER_PARAM, BEFORE_PARAM)
+PAGE_SIZE_PARAM = 'page_size'
+
+_NULL_DATE = '~'
+
+
+class InvalidCursor(ValueError):
+    """Курсор страницы повреждён или не может быть разобран."""
+
+
+def requested_page_size(request, default):
+    """Размер страницы из параметра page_size (до CASHFLOW_MAX_PAGE_SIZE)."""
+    try:
+        page_size = int(request.GET.get(PAGE_SIZE_PARAM, default))
+    except ValueError:
+        page_size = default
+    return max(1, min(page_size, settings.CASHFLOW_MAX_PAGE_SIZE))
+
+
+def instance_position(obj):
+    """Позиция (date_created, id) транзакции для курсора."""
+    return obj.date_created, obj.pk
+
+
+def encode_cursor(date_created, pk):
+    """Кодирует позицию (date_created, id) в непрозрачный токен."""
+    raw = f'{date_created.isoformat() if date_created else _NULL_DATE}:{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def cursor_at(obj):
+    """Токен after, с которого страница списка начинается с транзакции obj."""
+    date_created, pk = instance_position(obj)
+    return encode_cursor(date_created, pk + 1)
+
+
+def decode_cursor(token):
+    """Декодирует токен в позицию (date_created, id).
+
+    Raises:
+    -------
+    InvalidCursor
+        Если токен не является корректным курсором
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        raw_date, raw_pk = raw.split(':')
+        date_created = (None if raw_date == _NULL_DATE
+                        else date.fromisoformat(raw_date))
+        return date_created, int(raw_pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(token) from e
+
+
+class KeysetPage:
+    """Страница транзакций, полученная курсорной пагинацией.
+
+    Attributes:
+    -----------
+    object_list: list
+        Транзакции страницы в порядке отображения
+    has_next: bool
+        Есть ли следующая страница
+    has_previous: bool
+        Есть ли предыдущая страница
+    position: callable
+        Функция, возвращающая (date_created, id) элемента страницы
+    """
+
+    def __init__(self, object_list, has_next, has_previous,
+                 position=instance_position):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.position = position
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_token(self):
+        if self.has_next and self.object_list:
+            return encode_cursor(*self.position(self.object_list[-1]))
+        return None
+
+    @property
+    def previous_token(self):
+        if self.has_previous and self.object_list:
+            return encode_cursor(*self.position(self.object_list[0]))
+        return None
+
+
+class KeysetPaginator:
+    """Курсорная (keyset) пагинация транзакций.
+
+    Транзакции упорядочены по (-date_created, -id), записи без даты идут
+    последними. Вместо OFFSET страница ищется по условию относительно
+    позиции курсора, поэтому стоимость N-й страницы равна стоимости первой
+    и опирается на индекс (date_created, id).
+
+    Attributes:
+    -----------
+    queryset: QuerySet
+        Отфильтрованный набор транзакций
+    per_page: int
+        Количество записей на странице
+    position: callable
+        Функция, возвращающая (date_created, id) строки набора; 
+        нужна, если набор возвращает не экземпляры модели (values_list)
+    """
+
+    def __init__(self, queryset, per_page, position=instance_position):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.position = position
+
+    def page(self, after=None, before=None):
+        """Возвращает страницу после курсора after или перед курсором before.
+
+        Без курсоров возвращается первая страница.
+
+        Raises:
+        -------
+        InvalidCursor
+            Если переданный курсор некорректен
+        """
+        steps = self._steps(after, before)
+        rows = None
+        try:
+            while True:
+                rows = list(steps.send(rows))
+        except StopIteration as stop:
+            return stop.value
+
+    async def apage(self, after=None, before=None):
+        """Асинхронный вариант page() для async-представлений."""
+        steps = self._steps(after, before)
+        rows = None
+        try:
+            while True:
+                rows = [row async for row in steps.send(rows)]
+        except StopIteration as stop:
+            return stop.value
+
+    def _steps(self, after, before):
+        # Генератор отдаёт срезы набора, получает их строки
+        # и возвращает KeysetPage; запросы выполняют page и apage.
+        if after:
+            rows = yield from self._forward(*decode_cursor(after))
+            return KeysetPage(rows[:self.per_page],
+                              has_next=len(rows) > self.per_page,
+                              has_previous=True, position=self.position)
+        if before:
+            rows = yield from self._backward(*decode_cursor(before))
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            return KeysetPage(rows, has_next=True, has_previous=has_previous,
+                              position=self.position)
+
+        rows = yield self.order(self.queryset)[:self.per_page + 1]
+        return KeysetPage(rows[:self.per_page],
+                          has_next=len(rows) > self.per_page,
+                          has_previous=False, position=self.position)
+
+    @staticmethod
+    def order(queryset):
+        """Упорядочивает набор в порядке отображения списка."""
+        return queryset.order_by(*LIST_ORDER)
+
+    def _forward(self, date_created, pk):
+        limit = self.per_page + 1
+        undated = self.queryset.filter(date_created__isnull=True)
+        if date_created is None:
+            return (yield undated.filter(id__lt=pk).order_by('-id')[:limit])
+
+        # Верхняя граница date_created__lte позволяет искать по индексу,
+        # а не сканировать его с начала.
+        rows = yield self.order(
+            self.queryset.filter(Q(date_created__lt=date_created)
+                                 | Q(date_created=date_created, id__lt=pk),
+                                 date_created__lte=date_created)
+            )[:limit]
+        if len(rows) < limit:
+            rows += yield undated.order_by('-id')[:limit - len(rows)]
+        return rows
+
+    def _backward(self, date_created, pk):
+        limit = self.per_page + 1
+        dated = self.queryset.filter(date_created__isnull=False)
+        if date_created is not None:
+            return (yield dated.filter(Q(date_created__gt=date_created)
+                                       | Q(date_created=date_created,
+                                           id__gt=pk),
+                                       date_created__gte=date_created)
+                               .order_by('date_created', 'id')[:limit])
+
+        rows = yield (self.queryset.filter(date_created__isnull=True,
+                                           id__gt=pk)
+                                   .order_by('id')[:limit])
+        if len(rows) < limit:
+            rows += yield (dated.order_by('date_created', 'id')
+                                [:limit - len(rows)])
+        return rows
+
+
+def estimated_count(model, using='default'):
+    """Оценка количества строк таблицы модели по статистике СУБД.
+
+    PostgreSQL - pg_class.reltuples (для секционированной таблицы - сумма 
+    по секциям), SQLite - sqlite_stat1 после ANALYZE. 
+    Возвращает None, если статистики нет.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT sum(greatest(reltuples, 0))::bigint FROM pg_class '
+                'WHERE oid = %s::regclass OR oid IN (SELECT inhrelid '
+                'FROM pg_inherits WHERE inhparent = %s::regclass)',
+                [table, table])
+        elif connection.vendor == 'sqlite':
+            try:
+                cursor.execute('SELECT max(CAST(stat AS INTEGER)) '
+                               'FROM sqlite_stat1 WHERE tbl = %s', [table])
+            except DatabaseError:
+                return None
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator без COUNT(*) по всей большой таблице.
+
+    Для набора без условий отбора количество берётся из статистики СУБД 
+    (estimated_count), если оценка не меньше 
+    CASHFLOW_ESTIMATED_COUNT_MIN, иначе считается точно. 
+    Отфильтрованные наборы всегда считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if (estimate is not None 
+                    and estimate >= settings.CASHFLOW_ESTIMATED_COUNT_MIN):
+                return estimate
+        return super().count
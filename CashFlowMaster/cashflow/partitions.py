@@ -0,0 +1,193 @@
+from datetime import date
+
+from django.db import connection as default_connection, transaction
+
+from .models import Transaction
+
+
+TABLE = Transaction._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+# Первичный ключ секционированной таблицы обязан включать ключ
+# секционирования, а date_created допускает NULL, поэтому вместо
+# первичного ключа уникальность id обеспечивается так:
+# - в каждой секции есть уникальный индекс по id (см. _add_id_key);
+# - значения id выдаёт одна последовательность ID_SEQUENCE (значение
+#   по умолчанию столбца), а приложение не вставляет id явно;
+# - при изменении даты строка переносится между секциями со своим id.
+ID_SEQUENCE = f'{TABLE}_id_seq'
+# Сколько месяцев вперёд создаются секции по умолчанию
+MONTHS_AHEAD = 12
+
+
+def add_months(day, months):
+    """Первое число месяца, отстоящего от day на months месяцев."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_y{month.year}m{month.month:02d}'
+
+
+def months_between(first, last):
+    """Первые числа месяцев от first до last включительно."""
+    month = first.replace(day=1)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def is_partitioned(connection=default_connection):
+    """Секционирована ли таблица транзакций (только PostgreSQL)."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table '
+                       'WHERE partrelid = %s::regclass', [TABLE])
+        return cursor.fetchone() is not None
+
+
+def existing_partitions(connection=default_connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT c.relname FROM pg_inherits i '
+                       'JOIN pg_class c ON c.oid = i.inhrelid '
+                       'WHERE i.inhparent = %s::regclass', [TABLE])
+        return {name for name, in cursor.fetchall()}
+
+
+def _bounds(month):
+    # Границы секции - литералы: DDL не принимает параметры запроса
+    return (f"'{month.isoformat()}'",
+            f"'{add_months(month, 1).isoformat()}'")
+
+
+def _add_id_key(cursor, partition):
+    cursor.execute(f'CREATE UNIQUE INDEX {partition}_id_key '
+                   f'ON {partition} (id)')
+
+
+def create_partition(month, connection=default_connection):
+    """Создаёт секцию месяца month.
+
+    Транзакции этого месяца, ранее попавшие в секцию по умолчанию,
+    переносятся в новую секцию в той же транзакции базы.
+    """
+    name = partition_name(month)
+    start, end = _bounds(month)
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        # Вычисляемые столбцы (например, tsvector поиска)
+        # не переносятся, а вычисляются заново
+        cursor.execute("SELECT string_agg(quote_ident(attname), ', ' "
+                       "ORDER BY attnum) FROM pg_attribute "
+                       "WHERE attrelid = %s::regclass AND attnum > 0 "
+                       "AND NOT attisdropped AND attgenerated = ''",
+                       [TABLE])
+        columns = cursor.fetchone()[0]
+        cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} '
+                       f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS '
+                       f'INCLUDING GENERATED)')
+        _add_id_key(cursor, name)
+        cursor.execute(f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+                       f'WHERE date_created >= {start} '
+                       f'AND date_created < {end} RETURNING {columns}) '
+                       f'INSERT INTO {name} ({columns}) '
+                       f'SELECT {columns} FROM moved')
+        cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {name} '
+                       f'FOR VALUES FROM ({start}) TO ({end})')
+
+
+def ensure_partitions(first, last, connection=default_connection):
+    """Создаёт недостающие секции месяцев от first до last.
+
+    Returns:
+    --------
+    list
+        Имена созданных секций
+    """
+    existing = existing_partitions(connection)
+    created = []
+    for month in months_between(first, last):
+        if partition_name(month) not in existing:
+            create_partition(month, connection)
+            created.append(partition_name(month))
+    return created
+
+
+def convert_table(connection, partitioned):
+    """Пересоздаёт таблицу транзакций секционированной по месяцам
+    date_created (partitioned=True) или обычной (partitioned=False).
+
+    Данные, индексы и внешние ключи переносятся в новую таблицу.
+    Секции создаются для месяцев, за которые есть транзакции,
+    и на MONTHS_AHEAD месяцев вперёд; транзакции без даты
+    и вне созданных секций хранятся в секции по умолчанию.
+
+    Обычная таблица получает первичный ключ и identity-столбец id,
+    как её создаёт Django. Секционированная - уникальный индекс по id
+    в каждой секции и последовательность ID_SEQUENCE: identity-столбцы
+    секционированных таблиц поддерживаются только с PostgreSQL 17.
+    """
+    old = f'{TABLE}_old'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes '
+            'WHERE schemaname = current_schema() AND tablename = %s '
+            'AND indexname NOT IN (SELECT conname FROM pg_constraint '
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'u'))",
+            [TABLE, TABLE])
+        indexes = [indexdef.replace(' ON ONLY ', ' ON ')
+                   for name, indexdef in cursor.fetchall()]
+        cursor.execute(
+            'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+            "WHERE conrelid = %s::regclass AND contype = 'f'", [TABLE])
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', date_created)"
+                       f'::date FROM {TABLE} WHERE date_created IS NOT NULL')
+        months = {month for month, in cursor.fetchall()}
+
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {old}')
+        # Без identity и значения по умолчанию id: они создаются
+        # заново после удаления старой таблицы вместе с её
+        # последовательностью
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {old} INCLUDING DEFAULTS '
+            f'INCLUDING CONSTRAINTS)'
+            + (' PARTITION BY RANGE (date_created)' if partitioned else ''))
+        cursor.execute(f'ALTER TABLE {TABLE} ALTER COLUMN id DROP DEFAULT')
+        if partitioned:
+            cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} '
+                           f'PARTITION OF {TABLE} DEFAULT')
+            _add_id_key(cursor, DEFAULT_PARTITION)
+            # Секции месяцев, за которые есть данные, и MONTHS_AHEAD
+            # месяцев вперёд от текущего
+            today = date.today()
+            months.update(months_between(today, add_months(today,
+                                                           MONTHS_AHEAD)))
+            for month in sorted(months):
+                start, end = _bounds(month)
+                cursor.execute(f'CREATE TABLE {partition_name(month)} '
+                               f'PARTITION OF {TABLE} '
+                               f'FOR VALUES FROM ({start}) TO ({end})')
+                _add_id_key(cursor, partition_name(month))
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {old}')
+        cursor.execute(f'DROP TABLE {old} CASCADE')
+
+        if partitioned:
+            cursor.execute(f'CREATE SEQUENCE {ID_SEQUENCE} '
+                           f'OWNED BY {TABLE}.id')
+            cursor.execute(f'ALTER TABLE {TABLE} ALTER COLUMN id '
+                           f"SET DEFAULT nextval('{ID_SEQUENCE}')")
+        else:
+            cursor.execute(f'ALTER TABLE {TABLE} ALTER COLUMN id '
+                           f'ADD GENERATED BY DEFAULT AS IDENTITY')
+            cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id)')
+        for indexdef in indexes:
+            cursor.execute(indexdef)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} '
+                           f'ADD CONSTRAINT {name} {definition}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+            f'coalesce(max(id), 0) + 1, false) FROM {TABLE}')
@@ -0,0 +1,150 @@
+import calendar
+from datetime import date, timedelta
+
+from django.db import connection
+from django.db.models import Q
+
+from .imports import insert_transactions
+from .models import RecurringOccurrence, RecurringTemplate
+from .rollups import write_atomic
+
+
+# Создание транзакций по шаблонам повторяющихся транзакций.
+# Даты повторений вычисляются в памяти, начиная со дня после
+# RecurringTemplate.materialized_until, поэтому обычный ежедневный
+# запуск обрабатывает только новые даты. Все транзакции всех шаблонов
+# записываются одним подготовленным INSERT в одной транзакции вместе
+# с ключами повторений (RecurringOccurrence), сводкой и поисковым индексом.
+
+
+def shift_months(day, months, day_of_month):
+    """Дата через months месяцев после day с числом day_of_month
+    (в коротких месяцах - последним числом месяца)."""
+    index = day.year * 12 + day.month - 1 + months
+    year, month = index // 12, index % 12 + 1
+    return date(year, month,
+                min(day_of_month, calendar.monthrange(year, month)[1]))
+
+
+def occurrence_dates(template, first, last):
+    """Даты повторений шаблона от first до last включительно."""
+    start = template.start_date
+    first = max(first, start)
+    if template.end_date is not None:
+        last = min(last, template.end_date)
+    if first > last:
+        return
+
+    if template.period in (RecurringTemplate.DAY, RecurringTemplate.WEEK):
+        step = template.interval * (7 if template.period ==
+                                    RecurringTemplate.WEEK else 1)
+        # Первое повторение не раньше first
+        day = start + timedelta(days=-(-(first - start).days // step) * step)
+        while day <= last:
+            yield day
+            day += timedelta(days=step)
+        return
+
+    step = template.interval * (12 if template.period ==
+                                RecurringTemplate.YEAR else 1)
+    index = ((first.year - start.year) * 12
+             + first.month - start.month) // step
+    while True:
+        day = shift_months(start, index * step, start.day)
+        if day > last:
+            return
+        if day >= first:
+            yield day
+        index += 1
+
+
+class MaterializeResult:
+    """Итог создания транзакций по шаблонам.
+
+    Attributes:
+    -----------
+    created: int
+        Количество созданных транзакций
+    skipped: int
+        Количество повторений, транзакции которых уже были созданы
+    templates: int
+        Количество обработанных шаблонов
+    """
+
+    def __init__(self, created=0, skipped=0, templates=0):
+        self.created = created
+        self.skipped = skipped
+        self.templates = templates
+
+
+def materialize(until=None, templates=None):
+    """Создаёт транзакции всех повторений шаблонов по дату until.
+
+    templates - набор шаблонов (по умолчанию все); неактивные шаблоны
+    и шаблоны, транзакции которых уже созданы по until, пропускаются.
+    Повторения, ключ которых уже есть в RecurringOccurrence,
+    не создаются повторно. Возвращает MaterializeResult.
+    """
+    until = until or date.today()
+    if templates is None:
+        templates = RecurringTemplate.objects.all()
+    due = templates.filter(Q(materialized_until__isnull=True)
+                           | Q(materialized_until__lt=until),
+                           active=True, start_date__lte=until)
+
+    result = MaterializeResult()
+    with write_atomic():
+        occurrences = []
+        for template in due:
+            result.templates += 1
+            first = (template.materialized_until + timedelta(days=1)
+                     if template.materialized_until 
+                     else template.start_date)
+            occurrences.extend((template, day) for day in
+                               occurrence_dates(template, first, until))
+        if occurrences:
+            existing = _existing_keys(
+                            due.values('pk'),
+                            min(day for _, day in occurrences), until)
+            new = [(template, day) for template, day in occurrences
+                   if (template.pk, day) not in existing]
+            result.skipped = len(occurrences) - len(new)
+            result.created = len(new)
+        else:
+            new = []
+        if new:
+            _insert_occurrences(new)
+            insert_transactions([
+                (day, template.status_act_id, template.type_act_id,
+                 template.category_act_id, template.subcategory_act_id,
+                 template.amount, template.comment)
+                for template, day in new])
+        due.update(materialized_until=until)
+    return result
+
+
+def _existing_keys(templates, first, last):
+    # Шаблоны - подзапросом: список id может превысить допустимое
+    # число параметров запроса
+    return set(RecurringOccurrence.objects
+                                  .filter(template__in=templates,
+                                          occurrence_date__range=(first,
+                                                                  last))
+                                  .values_list('template_id',
+                                               'occurrence_date'))
+
+
+def _insert_occurrences(occurrences):
+    # Один подготовленный INSERT, как и для транзакций
+    # (см. imports.insert_transactions)
+    quote = connection.ops.quote_name
+    meta = RecurringOccurrence._meta
+    adapt_date = connection.ops.adapt_datefield_value
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {quote(meta.db_table)} '
+            f"({quote(meta.get_field('template').column)}, "
+            f"{quote(meta.get_field('occurrence_date').column)}) "
+            f'VALUES (%s, %s)',
+            [(template.pk, adapt_date(day))
+             for template, day in occurrences])
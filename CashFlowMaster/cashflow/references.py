@@ -0,0 +1,217 @@
+import json
+from collections import defaultdict, namedtuple
+from functools import cached_property
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from .models import (StatusAction, TypeAction,
+                     CategoryAction, SubcategoryAction)
+from .versions import new_version
+
+
+VERSION_KEY = 'cashflow:references:version'
+SNAPSHOT_KEY = 'cashflow:references:{version}'
+# Снимки устаревших версий вытесняются из кэша по истечении срока
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+# Элемент справочника: parent_id - тип для категории,
+# категория для подкатегории, None для статусов и типов
+ReferenceItem = namedtuple('ReferenceItem', ['pk', 'name', 'parent_id'])
+
+
+class ReferenceSnapshot:
+    """Неизменяемый снимок всех справочников.
+
+    Attributes:
+    -----------
+    statuses: list
+        Статусы транзакций (ReferenceItem)
+    types: list
+        Типы транзакций (ReferenceItem)
+    categories: list
+        Категории транзакций (ReferenceItem, parent_id - тип)
+    subcategories: list
+        Подкатегории транзакций (ReferenceItem, parent_id - категория)
+    version: str
+        Версия справочников, из которой получен снимок
+    type_flows: dict
+        Направление (TypeAction.flow) по id типа
+    """
+
+    def __init__(self, statuses, types, categories, subcategories, 
+                 version='', type_flows=None):
+        self.version = version
+        self.statuses = statuses
+        self.types = types
+        self.categories = categories
+        self.subcategories = subcategories
+
+        self.categories_by_type = defaultdict(list)
+        for item in categories:
+            self.categories_by_type[item.parent_id].append(item)
+        self.subcategories_by_category = defaultdict(list)
+        for item in subcategories:
+            self.subcategories_by_category[item.parent_id].append(item)
+        self.type_flows = type_flows or {}
+        self.category_parents = {item.pk: item.parent_id 
+                                 for item in categories}
+        self.subcategory_parents = {item.pk: item.parent_id 
+                                    for item in subcategories}
+
+    @classmethod
+    def load(cls, version=''):
+        """Загружает снимок из базы: по одному запросу на справочник."""
+        def items(model, parent_field=None):
+            if parent_field is None:
+                return [ReferenceItem(pk, name, None) for pk, name in
+                        model.objects.order_by('pk').values_list('pk',
+                                                                 'name')]
+            return [ReferenceItem(*row) for row in
+                    model.objects.order_by('pk').values_list('pk', 'name',
+                                                             parent_field)]
+
+        type_rows = list(TypeAction.objects.order_by('pk')
+                                           .values_list('pk', 'name', 'flow'))
+        return cls(items(StatusAction),
+                   [ReferenceItem(pk, name, None) 
+                    for pk, name, _ in type_rows],
+                   items(CategoryAction, 'type_act_id'),
+                   items(SubcategoryAction, 'category_act_id'),
+                   version,
+                   {pk: flow for pk, _, flow in type_rows})
+
+    @staticmethod
+    def _choices(items):
+        return [(item.pk, item.name) for item in items]
+
+    def status_choices(self):
+        return self._choices(self.statuses)
+
+    def type_choices(self):
+        return self._choices(self.types)
+
+    def category_choices(self, type_id=None):
+        """Категории типа type_id или все категории, если тип не задан."""
+        if type_id is None:
+            return self._choices(self.categories)
+        return self._choices(self.categories_by_type.get(type_id, []))
+
+    def subcategory_choices(self, category_id=None):
+        """Подкатегории категории category_id или все подкатегории."""
+        if category_id is None:
+            return self._choices(self.subcategories)
+        return self._choices(
+            self.subcategories_by_category.get(category_id, []))
+
+    @cached_property
+    def _items_by_model(self):
+        return {model: {item.pk: item for item in items}
+                for model, items in ((StatusAction, self.statuses),
+                                     (TypeAction, self.types),
+                                     (CategoryAction, self.categories),
+                                     (SubcategoryAction, self.subcategories))}
+
+    def instance(self, model, pk):
+        """Экземпляр справочника model с id pk, собранный из снимка.
+
+        Используется вместо загрузки из базы, когда нужен объект для
+        ссылки транзакции. Если элемента нет в снимке, возвращает None.
+        """
+        item = self._items_by_model[model].get(pk)
+        if item is None:
+            return None
+        if model is TypeAction:
+            obj = model(pk=item.pk, name=item.name,
+                        flow=self.type_flows.get(item.pk))
+        elif model is CategoryAction:
+            obj = model(pk=item.pk, name=item.name, 
+                        type_act_id=item.parent_id)
+        elif model is SubcategoryAction:
+            obj = model(pk=item.pk, name=item.name, 
+                        category_act_id=item.parent_id)
+        else:
+            obj = model(pk=item.pk, name=item.name)
+        obj._state.adding = False
+        obj._state.db = 'default'
+        return obj
+
+    @cached_property
+    def tree(self):
+        """Дерево тип → категория → подкатегория в компактном виде.
+
+        Каждый узел - список [id, название, дочерние узлы], 
+        у подкатегорий дочерних узлов нет.
+        """
+        return {
+            'version': self.version,
+            'types': [
+                [type_.pk, type_.name, [
+                    [category.pk, category.name, [
+                        [subcategory.pk, subcategory.name]
+                        for subcategory in 
+                        self.subcategories_by_category.get(category.pk, [])
+                    ]]
+                    for category in self.categories_by_type.get(type_.pk, [])
+                ]]
+                for type_ in self.types
+            ],
+        }
+
+    @cached_property
+    def tree_json(self):
+        return json.dumps(self.tree, ensure_ascii=False, 
+                          separators=(',', ':'))
+
+
+class ReferenceRegistry:
+    """Кэш справочников с инвалидацией по номеру версии.
+
+    Снимок справочников хранится в памяти процесса и в кэше Django под
+    ключом текущей версии. На каждый запрос registry.get() читает только
+    номер версии из кэша: если он не изменился, используется снимок
+    процесса, без обращений к базе. Сигналы сохранения и удаления
+    справочников вызывают invalidate(), который выставляет новую версию,
+    и все процессы перечитывают снимок при следующем обращении.
+    """
+
+    def __init__(self):
+        self._local = None
+
+    def get(self):
+        """Возвращает актуальный ReferenceSnapshot."""
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, new_version(), timeout=None)
+            version = cache.get(VERSION_KEY)
+
+        local = self._local
+        if local is not None and local[0] == version:
+            return local[1]
+
+        snapshot_key = SNAPSHOT_KEY.format(version=version)
+        snapshot = cache.get(snapshot_key)
+        if snapshot is None:
+            snapshot = ReferenceSnapshot.load(version)
+            cache.set(snapshot_key, snapshot, timeout=SNAPSHOT_TIMEOUT)
+        self._local = (version, snapshot)
+        return snapshot
+
+    async def aget(self):
+        """Асинхронный вариант get() для async-представлений.
+
+        Актуальный снимок из памяти процесса возвращается сразу, 
+        а чтение из кэша и загрузка из базы выполняются в потоке.
+        """
+        local = self._local
+        if local is not None and local[0] == await cache.aget(VERSION_KEY):
+            return local[1]
+        return await sync_to_async(self.get)()
+
+    def invalidate(self):
+        """Выставляет новую версию справочников."""
+        cache.set(VERSION_KEY, new_version(), timeout=None)
+        self._local = None
+
+
+registry = ReferenceRegistry()
@@ -0,0 +1,214 @@
+from datetime import date
+from itertools import accumulate
+from operator import sub
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from .models import TypeAction
+from .references import registry
+from .rollups import rollup_queryset
+from .versions import ledger_version
+
+
+REPORT_KEY = 'cashflow:report:{version}:{filter_key}'
+REPORT_TIMEOUT = 60 * 60
+
+# Показатели ячеек матрицы отчёта
+AMOUNT = 'amount'
+DELTA = 'delta'
+AVERAGE = 'average'
+METRIC_CHOICES = [
+    (AMOUNT, 'Сумма'),
+    (DELTA, 'Изменение к прошлому месяцу'),
+    (AVERAGE, 'Скользящее среднее'),
+]
+
+
+def report_rows(filterset):
+    """Суммы по (месяц, тип, категория) для состояния фильтра.
+
+    Результат - три столбца одинаковой длины: месяцы, пары
+    (id типа, id категории) и суммы, полученные одним группирующим
+    запросом к сводке DailyRollup, а если фильтр использует поля вне
+    ключа сводки - к самим транзакциям. Кэшируется по версии данных
+    и нормализованному ключу фильтра.
+    """
+    key = REPORT_KEY.format(version=ledger_version(),
+                            filter_key=filterset.cache_key())
+    columns = cache.get(key)
+    if columns is None:
+        rows = [row for row in _report_queryset(filterset)
+                if row[0] is not None and row[3]]
+        months, type_ids, category_ids, amounts = (
+            map(list, zip(*rows)) if rows else ([], [], [], []))
+        columns = (months, list(zip(type_ids, category_ids)), amounts)
+        cache.set(key, columns, REPORT_TIMEOUT)
+    return columns
+
+
+class MonthStart(TruncMonth):
+    """Первое число месяца даты.
+
+    В SQLite TruncMonth вызывает функцию на Python для каждой строки,
+    поэтому там месяц берётся из строки даты (SQLite хранит даты
+    в виде YYYY-MM-DD) встроенными функциями.
+    """
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.lhs)
+        return f"substr({sql}, 1, 8) || '01'", params
+
+
+def _report_queryset(filterset):
+    rollups = rollup_queryset(filterset)
+    if rollups is not None:
+        queryset, date_field = rollups, 'day'
+    else:
+        queryset, date_field = filterset.qs, 'date_created'
+    return (queryset.order_by()
+                    .values_list(MonthStart(date_field), 'type_act_id',
+                                 'category_act_id')
+                    .annotate(total_amount=Sum('amount')))
+
+
+def month_range(first, last):
+    """Первые числа месяцев от first до last включительно."""
+    index = first.year * 12 + first.month - 1
+    end = last.year * 12 + last.month - 1
+    return [date(i // 12, i % 12 + 1, 1) for i in range(index, end + 1)]
+
+
+# Операции над рядами значений по месяцам. Ряды обрабатываются целиком
+# встроенными функциями (accumulate, map, zip): цикл по элементам идёт
+# в их реализации на C, без байт-кода цикла for, но сложение и вычитание
+# элементов - по-прежнему операции над объектами Python. Рядов немного,
+# и длина каждого - число месяцев отчёта.
+
+def cumulative(values):
+    """Нарастающий итог ряда."""
+    return list(accumulate(values))
+
+
+def deltas(values):
+    """Изменение к предыдущему периоду; для первого периода - None."""
+    if not values:
+        return []
+    return [None, *map(sub, values[1:], values[:-1])]
+
+
+def moving_average(values, window):
+    """Скользящее среднее за window периодов; для первых - None."""
+    sums = [0, *accumulate(values)]
+    return [None] * min(window - 1, len(values)) + [
+        total / window for total in map(sub, sums[window:], sums[:-window])]
+
+
+def column_sums(matrix):
+    """Суммы по столбцам матрицы (список строк одинаковой длины)."""
+    return list(map(sum, zip(*matrix)))
+
+
+def format_series(values):
+    """Ряд в виде строк для таблицы: целые с разделением разрядов."""
+    return ['' if value is None else f'{value:,.0f}'.replace(',', '\u00a0')
+            for value in values]
+
+
+class ReportRow:
+    """Строка отчёта: категория и её ряды по месяцам.
+
+    Attributes:
+    -----------
+    type_name: str
+        Название типа
+    name: str
+        Название категории
+    amounts: list
+        Сумма за месяц (поступления со знаком плюс, списания - минус)
+    deltas: list
+        Изменение суммы к предыдущему месяцу
+    averages: list
+        Скользящее среднее суммы
+    total: int
+        Сумма за весь период
+    """
+
+    def __init__(self, type_name, name, amounts, window):
+        self.type_name = type_name
+        self.name = name
+        self.amounts = amounts
+        self.deltas = deltas(amounts)
+        self.averages = moving_average(amounts, window)
+        self.total = sum(amounts)
+
+    def values(self, metric):
+        """Ряд показателя metric (AMOUNT, DELTA или AVERAGE)."""
+        return {AMOUNT: self.amounts, DELTA: self.deltas,
+                AVERAGE: self.averages}[metric]
+
+
+class CashflowReport:
+    """Помесячный отчёт о движении денег по категориям.
+
+    Суммы категорий типов с направлением "поступление" берутся со знаком
+    плюс, остальных - со знаком минус. Названия берутся из текущего
+    снимка справочников, поэтому переименование не требует пересчёта.
+
+    Attributes:
+    -----------
+    months: list
+        Первые числа месяцев отчёта, без пропусков
+    rows: list
+        Строки по категориям (ReportRow), по типу и названию категории
+    net: list
+        Чистый денежный поток за месяц
+    net_deltas: list
+        Изменение чистого потока к предыдущему месяцу
+    net_averages: list
+        Скользящее среднее чистого потока
+    balance: list
+        Остаток нарастающим итогом на конец месяца
+    window: int
+        Окно скользящего среднего, месяцев
+    """
+
+    def __init__(self, columns, references, window=None):
+        self.window = window or settings.CASHFLOW_REPORT_WINDOW
+        months, keys, amounts = columns
+        self.months = month_range(min(months), max(months)) if months else []
+
+        type_names = {item.pk: item.name for item in references.types}
+        category_names = {item.pk: item.name
+                          for item in references.categories}
+        month_index = {month: i for i, month in enumerate(self.months)}
+        key_index = {key: i for i, key in enumerate(sorted(
+                        set(keys),
+                        key=lambda key: (type_names.get(key[0], ''),
+                                         category_names.get(key[1], ''))))}
+
+        # Сводная таблица: строки - пары (тип, категория),
+        # столбцы - месяцы; заполняется по сгруппированным строкам запроса
+        signs = {type_id: 1 if flow == TypeAction.INCOME else -1
+                 for type_id, flow in references.type_flows.items()}
+        matrix = [[0] * len(self.months) for _ in key_index]
+        for month, key, amount in zip(months, keys, amounts):
+            matrix[key_index[key]][month_index[month]] += (
+                                            signs.get(key[0], -1) * amount)
+
+        self.rows = [ReportRow(type_names.get(type_id, 'Без типа'),
+                               category_names.get(category_id,
+                                                  'Без категории'),
+                               matrix[i], self.window)
+                     for (type_id, category_id), i in key_index.items()]
+        self.net = column_sums(matrix) if matrix else [0] * len(self.months)
+        self.net_deltas = deltas(self.net)
+        self.net_averages = moving_average(self.net, self.window)
+        self.balance = cumulative(self.net)
+
+
+def compute_report(filterset):
+    """Возвращает CashflowReport для проверенного фильтра транзакций."""
+    return CashflowReport(report_rows(filterset), registry.get())
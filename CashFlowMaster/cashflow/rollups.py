@@ -0,0 +1,245 @@
+import copy
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q, Subquery, Sum
+from django_filters.constants import EMPTY_VALUES
+
+from .models import DailyRollup, Transaction
+from .versions import bump_ledger_version
+
+
+# Поля ключа сводки в модели DailyRollup и соответствующие им
+# поля транзакции.
+ROLLUP_KEY_FIELDS = ('day', 'status_act_id', 'type_act_id',
+                     'category_act_id', 'subcategory_act_id')
+TRANSACT_KEY_FIELDS = ('date_created', 'status_act_id', 'type_act_id',
+                       'category_act_id', 'subcategory_act_id')
+# Поля TransactFilter, входящие в ключ сводки, и их имена в DailyRollup
+ROLLUP_FILTER_FIELDS = {
+    'date_created': 'day',
+    'status_act': 'status_act',
+    'type_act': 'type_act',
+    'category_act': 'category_act',
+    'subcategory_act': 'subcategory_act',
+}
+
+# До этого количества ключей каждая строка сводки обновляется отдельным
+# запросом ORM, иначе существующие строки читаются одним запросом
+# и обновляются пакетно.
+SINGLE_KEY_LIMIT = 2
+BATCH_SIZE = 200
+
+
+def transaction_key(values):
+    """Возвращает ключ сводки для словаря значений полей транзакции."""
+    return tuple(values[field] for field in TRANSACT_KEY_FIELDS)
+
+
+@contextmanager
+def write_atomic():
+    """transaction.atomic() для пакета, который читает и затем пишет
+    транзакции вместе со сводкой.
+
+    Транзакция SQLite получает блокировку записи при первом изменении, 
+    и если до него она читала, а другое соединение (например, процесс 
+    фоновых задач) успело записать, SQLite сразу отвечает "database is 
+    locked", не дожидаясь timeout. Поэтому в SQLite блокировка 
+    берётся в начале транзакции пустым UPDATE сводки.
+    """
+    with transaction.atomic():
+        lock_for_write()
+        yield
+
+
+def lock_for_write():
+    """Берёт блокировку записи SQLite в начале транзакции базы
+    (см. write_atomic); в других СУБД ничего не делает."""
+    if connection.vendor == 'sqlite':
+        table = connection.ops.quote_name(DailyRollup._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {table} SET count = count WHERE 0')
+
+
+class RollupDelta:
+    """Накопитель изменений сводки DailyRollup.
+
+    Собирает разницу количества и суммы по ключам сводки, после чего
+    apply() применяет её к таблице минимальным числом запросов.
+    Используется сигналами модели Transaction и массовыми операциями,
+    которые обходят сигналы (bulk_create, update, delete).
+
+    Attributes:
+    -----------
+    deltas: dict
+        Разница (количество, сумма) по ключу сводки
+    """
+
+    def __init__(self):
+        self.deltas = defaultdict(lambda: [0, 0])
+
+    def add(self, key, count, amount):
+        delta = self.deltas[key]
+        delta[0] += count
+        delta[1] += amount
+
+    def add_transaction(self, values, sign=1):
+        """Учитывает одну транзакцию, заданную словарём значений полей."""
+        self.add(transaction_key(values), sign, sign * values['amount'])
+
+    def add_queryset(self, queryset, sign=1):
+        """Учитывает все транзакции набора одним группирующим запросом."""
+        for key, count, total in _grouped(queryset):
+            self.add(key, sign * count, sign * total)
+
+    def move_queryset(self, queryset, values):
+        """Учитывает перенос транзакций набора в новые значения полей.
+
+        values - новые значения полей из TRANSACT_KEY_FIELDS; разница 
+        считается одним группирующим запросом до изменения транзакций.
+        """
+        for key, count, total in _grouped(queryset):
+            self.add(key, -count, -total)
+            self.add(tuple(values.get(field, value) for field, value 
+                           in zip(TRANSACT_KEY_FIELDS, key)),
+                     count, total)
+
+    def apply(self):
+        """Применяет накопленную разницу к таблице сводки."""
+        deltas = {key: delta for key, delta in self.deltas.items()
+                  if any(delta)}
+        if not deltas:
+            return
+        if len(deltas) == 1:
+            # Одиночный UPDATE атомарен и без явной транзакции
+            [(key, (count, amount))] = deltas.items()
+            _apply_one(key, count, amount)
+        else:
+            # Внутри транзакции записи (сохранение, пакет) - без точки 
+            # сохранения: ошибка и так откатывает всю транзакцию
+            with transaction.atomic(savepoint=False):
+                if len(deltas) <= SINGLE_KEY_LIMIT:
+                    for key, (count, amount) in deltas.items():
+                        _apply_one(key, count, amount)
+                else:
+                    _apply_many(deltas)
+        self.deltas.clear()
+
+
+def _grouped(queryset):
+    rows = (queryset.order_by()
+                    .values_list(*TRANSACT_KEY_FIELDS)
+                    .annotate(count=Count('id'), total=Sum('amount')))
+    for *key, count, total in rows:
+        yield tuple(key), count, total or 0
+
+
+def _key_filter(key):
+    return dict(zip(ROLLUP_KEY_FIELDS, key))
+
+
+def _apply_one(key, count, amount):
+    # Ключи с NULL не защищены уникальным ограничением, поэтому
+    # обновляется только первая подходящая строка.
+    first_pk = (DailyRollup.objects.filter(**_key_filter(key))
+                                   .order_by('pk').values('pk')[:1])
+    updated = (DailyRollup.objects.filter(pk=Subquery(first_pk))
+                                  .update(count=F('count') + count,
+                                          amount=F('amount') + amount))
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(**_key_filter(key),
+                                       count=count, amount=amount)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        (DailyRollup.objects.filter(pk=Subquery(first_pk))
+                            .update(count=F('count') + count,
+                                    amount=F('amount') + amount))
+
+
+def _apply_many(deltas):
+    days = [key[0] for key in deltas if key[0] is not None]
+    existing_filter = Q(day__isnull=True)
+    if days:
+        existing_filter |= Q(day__range=(min(days), max(days)))
+
+    existing = {}
+    rows = (DailyRollup.objects.filter(existing_filter)
+                               .order_by('pk')
+                               .values_list('pk', *ROLLUP_KEY_FIELDS))
+    for pk, *key in rows:
+        existing.setdefault(tuple(key), pk)
+
+    DailyRollup.objects.bulk_create(
+        [DailyRollup(**_key_filter(key), count=count, amount=amount)
+         for key, (count, amount) in deltas.items() if key not in existing],
+        batch_size=BATCH_SIZE)
+
+    # Построчные UPDATE одним подготовленным запросом: на больших пакетах
+    # это намного дешевле, чем компиляция CASE-выражений в ORM.
+    updates = [(count, amount, existing[key])
+               for key, (count, amount) in deltas.items() if key in existing]
+    if updates:
+        table = connection.ops.quote_name(DailyRollup._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {table} SET count = count + %s, '
+                f'amount = amount + %s WHERE id = %s',
+                updates)
+
+
+def rollup_queryset(filterset, exclude=()):
+    """Строки сводки, соответствующие состоянию фильтра транзакций.
+
+    Фильтры TransactFilter применяются к DailyRollup с заменой имён полей, 
+    поля из exclude пропускаются. Если заполнено поле, которого нет 
+    в ключе сводки, возвращает None: такой выборке нужны сами транзакции.
+    """
+    queryset = DailyRollup.objects.all()
+    for name, value in filterset.cleaned_filters.items():
+        if value in EMPTY_VALUES or name in exclude:
+            continue
+        if name not in ROLLUP_FILTER_FIELDS:
+            return None
+        rollup_filter = copy.copy(filterset.filters[name])
+        rollup_filter.field_name = ROLLUP_FILTER_FIELDS[name]
+        queryset = rollup_filter.filter(queryset, value)
+    return queryset
+
+
+def rebuild(date_from=None, date_to=None):
+    """Пересчитывает сводку по транзакциям за период.
+
+    Без границ периода сводка пересчитывается целиком.
+    Возвращает количество созданных строк сводки.
+    """
+    rollups = DailyRollup.objects.all()
+    transacts = Transaction.objects.all()
+    if date_from is not None:
+        rollups = rollups.filter(day__gte=date_from)
+        transacts = transacts.filter(date_created__gte=date_from)
+    if date_to is not None:
+        rollups = rollups.filter(day__lte=date_to)
+        transacts = transacts.filter(date_created__lte=date_to)
+
+    rows = (transacts.order_by()
+                     .values_list(*TRANSACT_KEY_FIELDS)
+                     .annotate(count=Count('id'), total=Sum('amount')))
+    with write_atomic():
+        if connection.vendor == 'postgresql':
+            # Параллельные записи сводки ждут конца пересчёта, а записи, 
+            # уже изменившие сводку, - фиксируются до чтения транзакций, 
+            # поэтому пересчёт не теряет и не удваивает их разницу.
+            table = connection.ops.quote_name(DailyRollup._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+        rollups.delete()
+        created = DailyRollup.objects.bulk_create(
+            [DailyRollup(**_key_filter(key), count=count, amount=total)
+             for *key, count, total in rows],
+            batch_size=BATCH_SIZE)
+        bump_ledger_version()
+    return len(created)
@@ -0,0 +1,166 @@
+import re
+
+from django.db import NotSupportedError, connection, connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+from .models import Transaction
+from .stemmer import stem
+
+
+TABLE = Transaction._meta.db_table
+# SQLite: виртуальная таблица FTS5 с основами слов комментария,
+# rowid совпадает с id транзакции
+FTS_TABLE = f'{TABLE}_fts'
+# PostgreSQL: вычисляемый столбец tsvector с индексом GIN
+TSV_COLUMN = 'comment_tsv'
+TSV_INDEX = f'{TABLE}_comment_tsv_idx'
+TS_CONFIG = 'russian'
+# Функция SQLite для выделения основ в запросах INSERT ... SELECT
+SQL_FUNCTION = 'cashflow_search_text'
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def search_text(text):
+    """Основы слов текста через пробел - содержимое индекса FTS5."""
+    return ' '.join(stem(word) for word in _WORD_RE.findall(text or ''))
+
+
+def register_functions(connection):
+    """Регистрирует SQL_FUNCTION в соединении SQLite."""
+    connection.connection.create_function(SQL_FUNCTION, 1, search_text,
+                                          deterministic=True)
+
+
+def filter_queryset(queryset, query):
+    """Оставляет транзакции, комментарий которых содержит все слова query.
+
+    Слова сравниваются по основам (с учётом окончаний русского языка),
+    последнее слово может быть введено не полностью. Поиск идёт только
+    по индексу: FTS5 в SQLite, tsvector и GIN в PostgreSQL.
+
+    Raises:
+    -------
+    NotSupportedError
+        Если СУБД не поддерживает полнотекстовый поиск
+    """
+    words = _WORD_RE.findall(query or '')
+    if not words:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        match = ' AND '.join(f'"{stem(word)}"*' for word in words)
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [match]))
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        return queryset.filter(RawSQL(
+            f'{connection.ops.quote_name(TABLE)}.{TSV_COLUMN} '
+            f'@@ to_tsquery(%s, %s)',
+            [TS_CONFIG, tsquery], output_field=BooleanField()))
+    raise NotSupportedError(f'Полнотекстовый поиск не поддерживается '
+                            f'для {vendor}')
+
+
+def create_index(connection):
+    """Создаёт поисковый индекс и заполняет его существующими данными."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING "
+                           f"fts5(comment, tokenize='unicode61 "
+                           f"remove_diacritics 2')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"ALTER TABLE {TABLE} ADD COLUMN {TSV_COLUMN} "
+                           f"tsvector GENERATED ALWAYS AS (to_tsvector("
+                           f"'{TS_CONFIG}', coalesce(comment, ''))) STORED")
+            cursor.execute(f'CREATE INDEX {TSV_INDEX} ON {TABLE} '
+                           f'USING gin ({TSV_COLUMN})')
+    if connection.vendor == 'sqlite':
+        index_after(0, connection)
+
+
+def drop_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'ALTER TABLE {TABLE} '
+                           f'DROP COLUMN IF EXISTS {TSV_COLUMN}')
+
+
+# Индекс PostgreSQL обновляется самой СУБД (вычисляемый столбец),
+# поэтому функции ниже работают только для SQLite.
+
+def index_transaction(pk, comment):
+    """Обновляет запись индекса транзакции pk."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if comment:
+            cursor.execute(f'INSERT OR REPLACE INTO {FTS_TABLE} '
+                           f'(rowid, comment) VALUES (%s, %s)',
+                           [pk, search_text(comment)])
+        else:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def index_transactions(rows):
+    """Индексирует комментарии rows - пар (id, комментарий)."""
+    if connection.vendor != 'sqlite' or not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT OR REPLACE INTO {FTS_TABLE} '
+                           f'(rowid, comment) VALUES (%s, %s)',
+                           [(pk, search_text(comment)) 
+                            for pk, comment in rows])
+
+
+def unindex_transaction(pk):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def unindex_transactions(pks):
+    """Удаляет записи индекса транзакций pks одним запросом."""
+    if connection.vendor != 'sqlite' or not pks:
+        return
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} '
+                       f'WHERE rowid IN ({placeholders})', pks)
+
+
+def last_transaction_id():
+    """Наибольший id транзакции - граница для index_after().
+
+    Индекс ведётся только в SQLite; в других СУБД запрос не выполняется 
+    и возвращается None.
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT coalesce(max(id), 0) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def index_after(last_id, connection=connection):
+    """Индексирует транзакции с id больше last_id одним запросом."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, comment) '
+                       f'SELECT id, {SQL_FUNCTION}(comment) FROM {TABLE} '
+                       f"WHERE id > %s AND comment != ''", [last_id])
+
+
+def rebuild():
+    """Заново строит индекс SQLite по всем транзакциям."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    index_after(0)
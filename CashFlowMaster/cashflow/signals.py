@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (pre_save, post_save, pre_delete,
+                                      post_delete)
+from django.dispatch import receiver
+
+from . import search
+from .middleware import record_query
+from .models import (Transaction, StatusAction, TypeAction, 
+                     CategoryAction, SubcategoryAction)
+from .references import registry
+from .rollups import RollupDelta, TRANSACT_KEY_FIELDS, lock_for_write
+from .versions import bump_ledger_version
+
+
+_ROLLUP_FIELDS = (*TRANSACT_KEY_FIELDS, 'amount')
+
+
+def _rollup_values(instance):
+    return {field: getattr(instance, field) for field in _ROLLUP_FIELDS}
+
+
+def remember_locked_values(instance):
+    """Отмечает значения экземпляра как сохранённые в базе.
+
+    Вызывается для экземпляра, загруженного select_for_update() 
+    в транзакции записи (write_atomic), в которой он и будет сохранён: 
+    сигнал сохранения тогда берёт старые значения для сводки и поискового 
+    индекса из экземпляра, не перечитывая строку. Изменения экземпляра 
+    до сохранения (например, формой) на отметку не влияют.
+    """
+    instance._locked_values = {field: getattr(instance, field)
+                               for field in (*_ROLLUP_FIELDS, 'comment')}
+
+
+def _stored_values(instance):
+    locked = instance.__dict__.pop('_locked_values', None)
+    if locked is not None:
+        return locked
+    # Значения, загруженные вместе с экземпляром, могли устареть: 
+    # строка перечитывается с блокировкой в транзакции сохранения 
+    # или удаления (см. Transaction.save), и до её конца 
+    # параллельная запись не изменит строку.
+    lock_for_write()
+    return (Transaction.objects.select_for_update()
+                               .filter(pk=instance.pk)
+                               .values(*_ROLLUP_FIELDS, 'comment')
+                               .first())
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_old_values(sender, instance, raw, **kwargs):
+    """Запоминает значения транзакции до сохранения для расчёта сводки
+    и обновления поискового индекса."""
+    if raw or instance._state.adding:
+        instance._old_values = None
+    else:
+        instance._old_values = _stored_values(instance)
+
+
+@receiver(pre_delete, sender=Transaction)
+def remember_deleted_values(sender, instance, **kwargs):
+    """Запоминает значения удаляемой транзакции для расчёта сводки."""
+    instance._old_values = _stored_values(instance)
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, created, raw, **kwargs):
+    """Применяет к сводке разницу между старыми и новыми значениями."""
+    if raw:
+        return
+    delta = RollupDelta()
+    if instance._old_values is not None:
+        delta.add_transaction(instance._old_values, sign=-1)
+    delta.add_transaction(_rollup_values(instance))
+    delta.apply()
+    bump_ledger_version()
+
+
+@receiver(post_save, sender=Transaction)
+def update_search_on_save(sender, instance, created, raw, **kwargs):
+    """Обновляет поисковый индекс, если изменился комментарий."""
+    old_values = getattr(instance, '_old_values', None)
+    if old_values is not None and old_values['comment'] == instance.comment:
+        return
+    if old_values is None and not instance.comment:
+        return
+    search.index_transaction(instance.pk, instance.comment)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_search_on_delete(sender, instance, **kwargs):
+    search.unindex_transaction(instance.pk)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """Вычитает удалённую транзакцию из сводки."""
+    old_values = instance._old_values
+    if old_values is None:
+        return
+    delta = RollupDelta()
+    delta.add_transaction(old_values, sign=-1)
+    delta.apply()
+    bump_ledger_version()
+
+
+@receiver(post_save, sender=StatusAction)
+@receiver(post_save, sender=TypeAction)
+@receiver(post_save, sender=CategoryAction)
+@receiver(post_save, sender=SubcategoryAction)
+@receiver(post_delete, sender=StatusAction)
+@receiver(post_delete, sender=TypeAction)
+@receiver(post_delete, sender=CategoryAction)
+@receiver(post_delete, sender=SubcategoryAction)
+def invalidate_references(sender, **kwargs):
+    """Сбрасывает кэш справочников после фиксации изменений."""
+    db_transaction.on_commit(registry.invalidate)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Выполняет settings.SQLITE_PRAGMAS для нового соединения SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def count_view_queries(sender, connection, **kwargs):
+    """Подключает учёт SQL-запросов ViewMetricsMiddleware к соединению."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def register_search_functions(sender, connection, **kwargs):
+    """Регистрирует функции полнотекстового поиска в соединении SQLite."""
+    if connection.vendor == 'sqlite':
+        search.register_functions(connection)
@@ -0,0 +1,68 @@
+/*
+ * Таблица ввода нескольких транзакций.
+ *
+ * Новая строка собирается из шаблона пустой формы набора (empty_form)
+ * с очередным номером вместо __prefix__. Enter переводит фокус на ту же
+ * ячейку следующей строки (в последней строке сначала добавляет строку),
+ * Ctrl+Enter отправляет таблицу.
+ */
+(function () {
+	'use strict';
+
+	function addRow(form) {
+		const total = form.querySelector('[name$="-TOTAL_FORMS"]');
+		const maxForms = form.querySelector('[name$="-MAX_NUM_FORMS"]');
+		const index = Number(total.value);
+		if (maxForms && index >= Number(maxForms.value)) {
+			return null;
+		}
+		const template = document.getElementById('grid-empty-row');
+		const html = template.innerHTML.replace(/__prefix__/g, index);
+		const rows = document.getElementById('grid-rows');
+		rows.insertAdjacentHTML('beforeend', html);
+		const row = rows.lastElementChild;
+		row.firstElementChild.textContent = index + 1;
+		total.value = index + 1;
+		// Связанные списки строки подключает reference_tree.js
+		row.dispatchEvent(new CustomEvent('formset:added', { bubbles: true }));
+		return row;
+	}
+
+	function moveDown(field) {
+		const cell = field.closest('td');
+		const row = field.closest('tr');
+		const column = Array.from(row.children).indexOf(cell);
+		let next = row.nextElementSibling;
+		while (next && !next.classList.contains('grid-row')) {
+			next = next.nextElementSibling;
+		}
+		next = next || addRow(field.form);
+		if (next) {
+			next.children[column].querySelector('input, select').focus();
+		}
+	}
+
+	document.addEventListener('DOMContentLoaded', () => {
+		const form = document.getElementById('grid-form');
+		if (!form) {
+			return;
+		}
+		document.getElementById('grid-add-row').addEventListener('click', () => {
+			const row = addRow(form);
+			if (row) {
+				row.querySelector('input, select').focus();
+			}
+		});
+		form.addEventListener('keydown', (event) => {
+			if (event.key !== 'Enter' || !event.target.closest('.grid-row')) {
+				return;
+			}
+			event.preventDefault();
+			if (event.ctrlKey || event.metaKey) {
+				form.requestSubmit();
+			} else {
+				moveDown(event.target);
+			}
+		});
+	});
+})();
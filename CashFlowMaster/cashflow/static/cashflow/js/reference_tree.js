@@ -0,0 +1,69 @@
+/*
+ * Связанные списки выбора тип → категория → подкатегория.
+ *
+ * Дерево справочников загружается один раз по адресу из data-tree-url
+ * (адрес содержит версию справочников и кэшируется браузером),
+ * после чего варианты дочерних списков пересобираются локально
+ * при каждой смене родителя.
+ */
+(function () {
+	'use strict';
+
+	const trees = {};
+
+	function loadTree(url) {
+		if (!trees[url]) {
+			trees[url] = fetch(url, { cache: 'force-cache' })
+				.then((response) => response.json())
+				.then((tree) => {
+					// Дочерние элементы по id родителя для каждого уровня
+					const children = { type_act: {}, category_act: {} };
+					tree.types.forEach(([typeId, , categories]) => {
+						children.type_act[typeId] = categories;
+						categories.forEach(([categoryId, , subcategories]) => {
+							children.category_act[categoryId] = subcategories;
+						});
+					});
+					return children;
+				});
+		}
+		return trees[url];
+	}
+
+	function fillOptions(select, items) {
+		const emptyOption = select.querySelector('option[value=""]');
+		select.replaceChildren();
+		if (emptyOption) {
+			select.append(emptyOption);
+		}
+		items.forEach(([id, name]) => select.append(new Option(name, id)));
+		select.value = '';
+		select.dispatchEvent(new Event('change'));
+	}
+
+	function bind(select) {
+		const form = select.form || document;
+		const parentName = select.dataset.chainedParent;
+		const parent = form.querySelector(`[name="${parentName}"]`);
+		// Уровень дерева определяется по имени родительского поля без префикса формы
+		const level = parentName.split('-').pop();
+		if (!parent) {
+			return;
+		}
+		loadTree(select.dataset.treeUrl);
+		parent.addEventListener('change', () => {
+			loadTree(select.dataset.treeUrl).then((children) => {
+				fillOptions(select, children[level][parent.value] || []);
+			});
+		});
+	}
+
+	document.addEventListener('DOMContentLoaded', () => {
+		document.querySelectorAll('select[data-chained-parent]').forEach(bind);
+	});
+
+	// Строки, добавленные в набор форм на странице
+	document.addEventListener('formset:added', (event) => {
+		event.target.querySelectorAll('select[data-chained-parent]').forEach(bind);
+	});
+})();
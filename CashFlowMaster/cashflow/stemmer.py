@@ -0,0 +1,78 @@
+"""Стеммер русского языка по алгоритму Snowball (Портера).
+
+Используется полнотекстовым поиском SQLite (cashflow.search): FTS5
+не умеет выделять основы русских слов, поэтому в индекс и в запрос
+попадают уже выделенные основы.
+"""
+import re
+
+
+_VOWELS = 'аеиоуыэюя'
+
+_PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+_REFLEXIVE = re.compile(r'(ся|сь)$')
+_ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|'
+    r'их|ых|ую|юю|ая|яя|ою|ею)$')
+_PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+_VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+_NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|'
+    r'ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+_SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+_DERIVATIONAL = re.compile(r'ость?$')
+
+
+def _region(word, start=0):
+    """Позиция после первой согласной, следующей за гласной (R1/R2)."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            return i + 1
+    return len(word)
+
+
+def stem(word):
+    """Возвращает основу слова (в нижнем регистре, ё заменяется на е)."""
+    word = word.lower().replace('ё', 'е')
+    rv_start = next((i + 1 for i, char in enumerate(word)
+                     if char in _VOWELS), len(word))
+    r2_start = _region(word, _region(word))
+    head, rv = word[:rv_start], word[rv_start:]
+
+    # Шаг 1: деепричастие, иначе возвратная частица
+    # и окончание прилагательного, глагола или существительного
+    stripped = _PERFECTIVE_GERUND.sub('', rv, count=1)
+    if stripped == rv:
+        rv = _REFLEXIVE.sub('', rv, count=1)
+        stripped = _ADJECTIVE.sub('', rv, count=1)
+        if stripped != rv:
+            stripped = _PARTICIPLE.sub('', stripped, count=1)
+        else:
+            stripped = _VERB.sub('', rv, count=1)
+            if stripped == rv:
+                stripped = _NOUN.sub('', rv, count=1)
+    rv = stripped
+
+    # Шаг 2
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательное окончание целиком в R2
+    match = _DERIVATIONAL.search(rv)
+    if match and rv_start + match.start() >= r2_start:
+        rv = rv[:match.start()]
+
+    # Шаг 4
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        superlative = _SUPERLATIVE.sub('', rv, count=1)
+        if superlative != rv:
+            rv = superlative[:-1] if superlative.endswith('нн') else superlative
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return head + rv
@@ -1,3 +1,1751 @@
-from django.test import TestCase
+import csv
+import io
+import logging
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from io import StringIO
+from time import sleep
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import exports, jobs, partitions, rollups
+from .admin import TransactionAdmin
+from .bulk import (bulk_delete, bulk_update, delete_reference,
+                   deletion_impact)
+from .checks import PROCESS_LOCAL_CACHES, check_shared_cache
+from .facets import FACET_FIELDS, compute_facets
+from .filters import TransactFilter
+from .forms import RecurringTemplateAdminForm, TransactAdminForm
+from .imports import TransactImporter, insert_transactions
+from .middleware import QueryBudgetExceeded
+from .models import (Transaction, StatusAction, TypeAction,
+                     CategoryAction, SubcategoryAction, DailyRollup, Job,
+                     RecurringTemplate)
+from .pagination import (KeysetPaginator, InvalidCursor, encode_cursor,
+                         decode_cursor)
+from .recurring import materialize, occurrence_dates
+from .references import registry
+from .reports import compute_report
+from .rollups import ROLLUP_KEY_FIELDS, rebuild, rollup_queryset
+from .totals import compute_totals
+from .views import transact_location
+
+
+class TemporaryCacheMixin:
+    """Файловый кэш во временном каталоге на время тестов класса.
+
+    Тесты очищают кэш, поэтому рабочий кэш (CASHFLOW_CACHE_DIR) они 
+    не используют. Процессы фоновых задач получают тот же кэш 
+    (см. job_process.init_process).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        workdir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(workdir.cleanup)
+        cls.enterClassContext(override_settings(CACHES={
+                    'default': {**settings.CACHES['default'],
+                                'LOCATION': workdir.name}}))
+        super().setUpClass()
+
+
+@override_settings(CASHFLOW_QUERY_BUDGETS_STRICT=True)
+class LedgerTestCase(TemporaryCacheMixin, TestCase):
+    """TestCase с пустым кэшем и строгими бюджетами SQL-запросов.
+
+    Снимок справочников и версии данных хранятся в кэше, а on_commit
+    внутри TestCase не выполняется, поэтому кэш очищается перед каждым
+    тестом.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def assertRollupMatches(self, params=None):
+        """Итоги сводки для фильтра params равны итогам транзакций."""
+        filterset = TransactFilter(params or {},
+                                   queryset=Transaction.objects.all())
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+        rollups = rollup_queryset(filterset).aggregate(
+                                    count=Sum('count'), amount=Sum('amount'))
+        transacts = filterset.qs.aggregate(count=Count('id'),
+                                           amount=Sum('amount'))
+        self.assertEqual((rollups['count'] or 0, rollups['amount'] or 0),
+                         (transacts['count'], transacts['amount'] or 0))
+
+    def assertRollupRebuilt(self):
+        """Сводка, поддерживаемая разницами, равна пересчитанной заново."""
+        def state():
+            rows = {}
+            for *key, count, amount in DailyRollup.objects.values_list(
+                                *ROLLUP_KEY_FIELDS, 'count', 'amount'):
+                total = rows.get(tuple(key), (0, 0))
+                rows[tuple(key)] = (total[0] + count, total[1] + amount)
+            # Строки с нулевыми итогами пересчёт не создаёт
+            return {key: total for key, total in rows.items() if any(total)}
+
+        maintained = state()
+        rebuild()
+        self.assertEqual(maintained, state())
+
+
+def create_references():
+    """Справочники для тестов: статус, тип, категория и подкатегория."""
+    status = StatusAction.objects.create(name='Бизнес')
+    type_act = TypeAction.objects.create(name='Списание')
+    category = CategoryAction.objects.create(name='Маркетинг',
+                                             type_act=type_act)
+    subcategory = SubcategoryAction.objects.create(name='Avito',
+                                                   category_act=category)
+    return status, type_act, category, subcategory
+
+
+class KeysetPaginationTest(LedgerTestCase):
+    """Курсорная пагинация обходит список без пропусков и повторов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        status, type_act, category, subcategory = create_references()
+        dates = [date(2024, 3, 5), date(2024, 3, 5), date(2024, 3, 4),
+                 date(2024, 3, 4), date(2024, 3, 4), date(2024, 3, 1),
+                 date(2024, 2, 1), None, None, None]
+        Transaction.objects.bulk_create([
+            Transaction(date_created=day, status_act=status,
+                        type_act=type_act, category_act=category,
+                        subcategory_act=subcategory, amount=i)
+            for i, day in enumerate(dates)])
+        # Записи без даты - последними, внутри даты - по убыванию id
+        cls.expected = sorted(
+            Transaction.objects.all(),
+            key=lambda obj: (obj.date_created is not None,
+                             obj.date_created or date.min, obj.pk),
+            reverse=True)
+
+    def paginator(self, per_page):
+        return KeysetPaginator(Transaction.objects.all(), per_page)
+
+    def test_forward_and_backward_cover_list(self):
+        # Границы страниц размера 7 совпадают с переходом к записям 
+        # без даты, размера 3 и 4 - приходятся на даты и на записи без даты
+        for per_page in (3, 4, 7):
+            with self.subTest(per_page=per_page):
+                paginator = self.paginator(per_page)
+                pages = [paginator.page()]
+                while pages[-1].next_token:
+                    pages.append(paginator.page(after=pages[-1].next_token))
+                self.assertEqual([obj for page in pages for obj in page],
+                                 self.expected)
+                self.assertFalse(pages[0].has_previous)
+                self.assertFalse(pages[-1].has_next)
+
+                backward = [pages[-1]]
+                while backward[-1].previous_token:
+                    backward.append(paginator.page(
+                                    before=backward[-1].previous_token))
+                self.assertEqual(
+                    [list(page) for page in reversed(backward)],
+                    [list(page) for page in pages])
+
+    def test_cursor_round_trip(self):
+        for obj in self.expected:
+            with self.subTest(pk=obj.pk):
+                token = encode_cursor(obj.date_created, obj.pk)
+                self.assertEqual(decode_cursor(token),
+                                 (obj.date_created, obj.pk))
+                index = self.expected.index(obj)
+                self.assertEqual(
+                    list(self.paginator(3).page(after=token)),
+                    self.expected[index + 1:index + 4])
+
+    def test_invalid_cursor(self):
+        for token in ('', 'Zm9v', '!!!',
+                      'MjAyNC0xMy0wMTox'):
+            with self.subTest(token=token):
+                with self.assertRaises(InvalidCursor):
+                    decode_cursor(token)
+        response = self.client.get(reverse('cashflow:main'), 
+                                   {'after': '!!!'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ExplainFiltersTest(LedgerTestCase):
+    """Первая страница списка при любом сочетании фильтров читается
+    по индексу без сканирования таблицы и отдельной сортировки."""
+
+    def test_plans_use_list_order_indexes(self):
+        create_ledger(50)
+        if connection.vendor == 'postgresql':
+            # На маленькой таблице планировщик предпочёл бы сканирование 
+            # и сортировку; запрещённые, они остаются в плане, 
+            # только если подходящего индекса нет
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+        out = StringIO()
+        call_command('explain_filters', strict=True, stdout=out)
+        labels = [line for line in out.getvalue().splitlines()
+                  if line.startswith('[')]
+        self.assertEqual(len(labels), 16)
+        self.assertTrue(all(label.startswith('[OK]') for label in labels),
+                        out.getvalue())
+
+
+class RollupSignalsTest(LedgerTestCase):
+    """Сводка следует за созданием, изменением и удалением транзакций."""
+
+    @classmethod
+    def setUpTestData(cls):
+        (cls.status, cls.type_act, cls.category,
+         cls.subcategory) = create_references()
+        cls.other_category = CategoryAction.objects.create(
+                                    name='Офис', type_act=cls.type_act)
+        cls.other_subcategory = SubcategoryAction.objects.create(
+                                    name='Аренда',
+                                    category_act=cls.other_category)
+
+    def assertRollupsMatch(self):
+        for params in ({}, {'status_act': self.status.pk},
+                       {'type_act': self.type_act.pk,
+                        'category_act': self.other_category.pk},
+                       {'date_created_min': '2024-03-05'}):
+            with self.subTest(params=params):
+                self.assertRollupMatches(params)
+
+    def create(self, **kwargs):
+        return Transaction.objects.create(**{
+                    'date_created': date(2024, 3, 5),
+                    'status_act': self.status, 'type_act': self.type_act,
+                    'category_act': self.category,
+                    'subcategory_act': self.subcategory, 'amount': 100,
+                    **kwargs})
+
+    def test_create_update_delete(self):
+        obj = self.create()
+        self.create(amount=50)
+        self.assertRollupsMatch()
+
+        obj.date_created = date(2024, 2, 1)
+        obj.category_act = self.other_category
+        obj.subcategory_act = self.other_subcategory
+        obj.amount = 70
+        obj.save()
+        self.assertRollupsMatch()
+
+        obj.delete()
+        self.assertRollupsMatch()
+        self.assertEqual(
+            list(DailyRollup.objects.filter(count__gt=0)
+                                    .values_list('day', 'count', 'amount')),
+            [(date(2024, 3, 5), 1, 50)])
+
+    def test_save_of_stale_instance(self):
+        obj = self.create()
+        stale = Transaction.objects.get(pk=obj.pk)
+        obj.status_act = None
+        obj.save()
+
+        stale.amount = 30
+        stale.save()
+        self.assertRollupsMatch()
+
+        Transaction.objects.get(pk=obj.pk).delete()
+        stale.delete()
+        self.assertFalse(DailyRollup.objects.filter(count__gt=0).exists())
+
+    def test_rebuild_equals_incremental_rollups(self):
+        obj = self.create()
+        self.create(date_created=None, status_act=None)
+        obj.type_act = None
+        obj.save()
+        incremental = set(DailyRollup.objects.filter(count__gt=0).values_list(
+                            *ROLLUP_KEY_FIELDS, 'count', 'amount'))
+        rebuild()
+        self.assertEqual(set(DailyRollup.objects.values_list(
+                                *ROLLUP_KEY_FIELDS, 'count', 'amount')),
+                         incremental)
+
+
+class CsvExportTest(LedgerTestCase):
+    """Выгрузка CSV защищена от формул и загружается обратно без потерь."""
+
+    @classmethod
+    def setUpTestData(cls):
+        status, type_act, category, subcategory = create_references()
+        for day, status_act, amount, comment in (
+                (date(2024, 3, 5), status, 100, '=HYPERLINK("x")'),
+                (date(2024, 3, 4), None, 0, '-5 за доставку'),
+                (date(2024, 3, 4), status, 250, "'@ не формула"),
+                (date(2024, 2, 1), status, 30, 'Обычный, "с кавычками"')):
+            Transaction.objects.create(
+                date_created=day, status_act=status_act, type_act=type_act,
+                category_act=category, subcategory_act=subcategory,
+                amount=amount, comment=comment)
+
+    def export(self):
+        response = self.client.get(reverse('cashflow:export_transact',
+                                           args=['csv']))
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_formula_cells_are_escaped(self):
+        rows = list(csv.reader(io.StringIO(self.export())))
+        comments = [row[-1] for row in rows[1:]]
+        self.assertEqual(comments, ['\'=HYPERLINK("x")', "''@ не формула",
+                                    "'-5 за доставку",
+                                    'Обычный, "с кавычками"'])
+
+    def transactions(self):
+        return list(Transaction.objects.order_by('date_created', 'amount')
+                               .values_list('date_created', 'status_act',
+                                            'type_act', 'category_act',
+                                            'subcategory_act', 'amount',
+                                            'comment'))
+
+    def test_export_import_round_trip(self):
+        exported = self.transactions()
+        content = self.export()
+        Transaction.objects.all().delete()
+
+        result = TransactImporter().run(io.StringIO(content))
+        self.assertEqual((result.created, result.errors), (4, []))
+        self.assertEqual(self.transactions(), exported)
+        self.assertRollupMatches()
+
+
+@mock.patch.multiple(exports, CHUNK_SIZE=2, FLUSH_SIZE=100)
+class XlsxExportTest(LedgerTestCase):
+    """Потоковая выгрузка XLSX читается как книга с одним листом.
+
+    Порции строк и размер фрагмента уменьшены, чтобы лист писался 
+    в архив несколькими частями.
+    """
+
+    NS = {'main': 
+          'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+    @classmethod
+    def setUpTestData(cls):
+        status, type_act, category, subcategory = create_references()
+        for day, status_act, amount, comment in (
+                (date(2024, 3, 5), status, 100, '<b>Счёт</b> & "акт"'),
+                (date(2024, 3, 4), None, 0, '=SUM(A1:A2)'),
+                (date(2024, 3, 4), status, 250, 'Без\x01 символов\x0b'),
+                (date(2024, 2, 1), status, 30, '')):
+            Transaction.objects.create(
+                date_created=day, status_act=status_act, type_act=type_act,
+                category_act=category, subcategory_act=subcategory,
+                amount=amount, comment=comment)
+
+    def export(self):
+        response = self.client.get(reverse('cashflow:export_transact',
+                                           args=['xlsx']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 
+                         exports.EXPORT_FORMATS['xlsx'][0])
+        return zipfile.ZipFile(
+                    io.BytesIO(b''.join(response.streaming_content)))
+
+    def cell_value(self, cell):
+        if cell.get('t') == 'inlineStr':
+            return cell.find('main:is/main:t', self.NS).text or ''
+        value = cell.find('main:v', self.NS)
+        if value is None:
+            return None
+        if cell.get('s') == '1':
+            return date(1899, 12, 30) + timedelta(days=int(value.text))
+        return int(value.text)
+
+    def test_workbook_parts(self):
+        archive = self.export()
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(set(archive.namelist()), 
+                         {'[Content_Types].xml', '_rels/.rels', 
+                          'xl/workbook.xml', 'xl/_rels/workbook.xml.rels', 
+                          'xl/styles.xml', 'xl/worksheets/sheet1.xml'})
+        # Все части - корректный XML
+        for name in archive.namelist():
+            ElementTree.fromstring(archive.read(name))
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        self.assertEqual(
+            [sheet.get('name') for sheet 
+             in workbook.findall('main:sheets/main:sheet', self.NS)],
+            ['Транзакции'])
+
+    def test_sheet_rows(self):
+        sheet = ElementTree.fromstring(
+                    self.export().read('xl/worksheets/sheet1.xml'))
+        rows = [[self.cell_value(cell) 
+                 for cell in row.findall('main:c', self.NS)]
+                for row in sheet.findall('main:sheetData/main:row', self.NS)]
+        self.assertEqual(rows[0], 
+                         [header for _, header in exports.EXPORT_COLUMNS])
+        self.assertEqual(rows[1:], [
+            [date(2024, 3, 5), 'Бизнес', 'Списание', 'Маркетинг', 'Avito',
+             100, '<b>Счёт</b> & "акт"'],
+            [date(2024, 3, 4), 'Бизнес', 'Списание', 'Маркетинг', 'Avito',
+             250, 'Без символов'],
+            [date(2024, 3, 4), None, 'Списание', 'Маркетинг', 'Avito',
+             0, '=SUM(A1:A2)'],
+            [date(2024, 2, 1), 'Бизнес', 'Списание', 'Маркетинг', 'Avito',
+             30, ''],
+        ])
+
+
+class TransactImportTest(LedgerTestCase):
+    """Загрузка CSV пишет транзакции вместе со сводкой и поисковым индексом."""
+
+    header = 'Дата,Статус,Тип,Категория,Подкатегория,Сумма,Комментарий\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        create_references()
+
+    def upload(self, content, batch_size=2):
+        upload = SimpleUploadedFile('transactions.csv', content,
+                                    content_type='text/csv')
+        return self.client.post(reverse('cashflow:import_transact'),
+                                {'file': upload, 'batch_size': batch_size})
+
+    def test_import_with_rejected_rows(self):
+        content = (self.header
+                   + '2024-03-05,Бизнес,Списание,Маркетинг,Avito,100,'
+                     'Оплата рекламы\n'
+                   + '05.03.2024,,Списание,Маркетинг,Avito,50,\n'
+                   + '2024-03-06,Бизнес,Списание,Офис,Avito,10,\n'
+                   + '2024-03-07,Бизнес,Списание,Маркетинг,Avito,-1,\n'
+                   + 'вчера,Бизнес,Списание,Маркетинг,Avito,1,\n'
+                   + '2024-02-01,Бизнес,Списание,Маркетинг,Avito,70,'
+                     '"Расходы на рекламу, кампании"\n')
+        response = self.upload(('\ufeff' + content).encode())
+        result = response.context['result']
+        self.assertEqual(result.created, 3)
+        self.assertEqual([line for line, _ in result.errors], [4, 5, 6])
+        self.assertIsNone(result.aborted)
+        self.assertEqual(
+            sorted(Transaction.objects.values_list('amount', flat=True)),
+            [50, 70, 100])
+        self.assertRollupMatches()
+        self.assertRollupMatches({'status_act': StatusAction.objects.get().pk})
+        # Поиск по основе слова находит обе формы слова
+        self.assertEqual(
+            sorted(TransactFilter({'q': 'реклама'}, 
+                                  queryset=Transaction.objects.all())
+                   .qs.values_list('amount', flat=True)),
+            [70, 100])
+
+    def test_decode_error_reports_partial_result(self):
+        rows = [f'2024-03-0{day},Бизнес,Списание,Маркетинг,Avito,{day},\n'
+                for day in range(1, 6)]
+        content = (self.header + ''.join(rows[:3])).encode()
+        content += ('2024-03-04,Бизнес,Списание,Маркетинг,Avito,4,'
+                    'Кафе\n').encode('cp1251')
+        content += rows[4].encode()
+        response = self.upload(content)
+        result = response.context['result']
+        self.assertEqual(result.aborted, (5, 'Файл не в кодировке UTF-8'))
+        # Строки до ошибки записаны - и полный пакет, и остаток
+        self.assertEqual(result.created, 3)
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertRollupMatches()
+        self.assertContains(response, 'Загрузка прервана на строке 5')
+
+    def test_missing_columns_write_nothing(self):
+        response = self.upload('Дата,Сумма\n2024-03-05,100\n'.encode())
+        self.assertIn('file', response.context['form'].errors)
+        self.assertFalse(Transaction.objects.exists())
+
+
+class ReferenceRegistryTest(LedgerTestCase):
+    """Снимок справочников обновляется после фиксации их изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        (cls.status, cls.type_act, cls.category,
+         cls.subcategory) = create_references()
+
+    def test_snapshot_is_invalidated_after_commit(self):
+        snapshot = registry.get()
+        with self.captureOnCommitCallbacks() as callbacks:
+            category = CategoryAction.objects.create(name='Офис',
+                                                     type_act=self.type_act)
+            self.category.name = 'Реклама'
+            self.category.save()
+        # До фиксации читается прежний снимок
+        self.assertIs(registry.get(), snapshot)
+
+        for callback in callbacks:
+            callback()
+        references = registry.get()
+        self.assertNotEqual(references.version, snapshot.version)
+        self.assertEqual(references.category_choices(self.type_act.pk),
+                         [(self.category.pk, 'Реклама'), 
+                          (category.pk, 'Офис')])
+
+    def test_filter_choices_follow_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            subcategory = SubcategoryAction.objects.create(
+                                name='Яндекс', category_act=self.category)
+        filterset = TransactFilter({'type_act': self.type_act.pk,
+                                    'category_act': self.category.pk,
+                                    'subcategory_act': subcategory.pk})
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+
+    def test_invalid_parent_id_is_rejected(self):
+        filterset = TransactFilter({'type_act': 'x',
+                                    'category_act': self.category.pk,
+                                    'subcategory_act': self.subcategory.pk})
+        self.assertFalse(filterset.is_valid())
+        self.assertEqual(set(filterset.errors), 
+                         {'type_act', 'category_act'})
+
+
+class ReferenceTreeTest(LedgerTestCase):
+    """Дерево справочников для связанных списков формы транзакции."""
+
+    @classmethod
+    def setUpTestData(cls):
+        (cls.status, cls.type_act, cls.category,
+         cls.subcategory) = create_references()
+        cls.income = TypeAction.objects.create(name='Пополнение')
+        cls.salary = CategoryAction.objects.create(name='Зарплата',
+                                                   type_act=cls.income)
+        cls.bonus = SubcategoryAction.objects.create(name='Премия',
+                                                     category_act=cls.salary)
+        cls.data = {'date_created_year': 2024, 'date_created_month': 3,
+                    'date_created_day': 5, 'status_act': cls.status.pk,
+                    'type_act': cls.type_act.pk, 
+                    'category_act': cls.category.pk,
+                    'subcategory_act': cls.subcategory.pk, 'amount': 100,
+                    'comment': ''}
+
+    def test_tree_json(self):
+        response = self.client.get(reverse('cashflow:reference_tree'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json(), {
+            'version': registry.get().version,
+            'types': [
+                [self.type_act.pk, 'Списание', [
+                    [self.category.pk, 'Маркетинг', 
+                     [[self.subcategory.pk, 'Avito']]]]],
+                [self.income.pk, 'Пополнение', [
+                    [self.salary.pk, 'Зарплата', 
+                     [[self.bonus.pk, 'Премия']]]]],
+            ]})
+
+    def test_unchanged_tree_is_not_modified(self):
+        url = reverse('cashflow:reference_tree')
+        response = self.client.get(url)
+        self.assertEqual(response['ETag'], f'"{registry.get().version}"')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CategoryAction.objects.create(name='Офис', 
+                                          type_act=self.type_act)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Офис', response.content.decode())
+
+    def test_versioned_url_is_immutable(self):
+        url = reverse('cashflow:reference_tree')
+        version = registry.get().version
+        response = self.client.get(url, {'v': version})
+        self.assertEqual(response['Cache-Control'], 
+                         'public, max-age=31536000, immutable')
+        # Ссылка на устаревшую версию проверяется заново
+        response = self.client.get(url, {'v': 'old'})
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+    def test_chained_selects_link_tree_version(self):
+        response = self.client.get(reverse('cashflow:create_transact'))
+        form = response.context['form']
+        tree_url = (f"{reverse('cashflow:reference_tree')}"
+                    f"?v={registry.get().version}")
+        for name, parent in (('category_act', 'type_act'),
+                             ('subcategory_act', 'category_act')):
+            attrs = form[name].field.widget.get_context(
+                                    name, None, {})['widget']['attrs']
+            self.assertEqual((attrs['data-chained-parent'], 
+                              attrs['data-tree-url']), (parent, tree_url))
+        self.assertContains(response, f'data-tree-url="{tree_url}"', 2)
+
+    def test_mismatched_chain_is_rejected(self):
+        url = reverse('cashflow:create_transact')
+        for data, field in (
+                ({'category_act': self.salary.pk, 
+                  'subcategory_act': self.bonus.pk}, 'category_act'),
+                ({'subcategory_act': self.bonus.pk}, 'subcategory_act')):
+            response = self.client.post(url, {**self.data, **data})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(list(response.context['form'].errors), [field])
+        self.assertFalse(Transaction.objects.exists())
+
+        response = self.client.post(url, self.data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+class CashflowTotalsTest(LedgerTestCase):
+    """Итоги списка по сводке и по транзакциям совпадают с данными."""
+
+    @classmethod
+    def setUpTestData(cls):
+        (cls.status, cls.expense_type, cls.expense_category,
+         cls.expense_subcategory) = create_references()
+        cls.income_type = TypeAction.objects.create(name='Поступление',
+                                                    flow=TypeAction.INCOME)
+        cls.income_category = CategoryAction.objects.create(
+                                    name='Продажи', type_act=cls.income_type)
+        income_subcategory = SubcategoryAction.objects.create(
+                                    name='Сайт', 
+                                    category_act=cls.income_category)
+        for type_act, category, subcategory, amount, comment in (
+                (cls.income_type, cls.income_category, income_subcategory, 
+                 1000, 'Оплата заказа'),
+                (cls.income_type, cls.income_category, income_subcategory,
+                 300, ''),
+                (cls.expense_type, cls.expense_category, 
+                 cls.expense_subcategory, 200, ''),
+                (cls.expense_type, cls.expense_category,
+                 cls.expense_subcategory, 50, 'Оплата доставки')):
+            Transaction.objects.create(
+                    date_created=date(2024, 3, 5), status_act=cls.status,
+                    type_act=type_act, category_act=category,
+                    subcategory_act=subcategory, amount=amount,
+                    comment=comment)
+
+    def totals(self, params=None):
+        filterset = TransactFilter(params or {},
+                                   queryset=Transaction.objects.all())
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+        return compute_totals(filterset)
+
+    def test_totals_from_rollups(self):
+        totals = self.totals({'status_act': self.status.pk})
+        self.assertEqual((totals.income, totals.expense, totals.net,
+                          totals.count), (1300, 250, 1050, 4))
+        self.assertEqual([(group.name, group.flow, group.amount, group.count)
+                          for group in totals.by_type],
+                         [('Поступление', TypeAction.INCOME, 1300, 2),
+                          ('Списание', TypeAction.EXPENSE, 250, 2)])
+        self.assertEqual([[(category.name, category.amount) 
+                           for category in group.children]
+                          for group in totals.by_type],
+                         [[('Продажи', 1300)], [('Маркетинг', 250)]])
+
+    def test_totals_from_transactions(self):
+        # Поиск не входит в ключ сводки - итоги считаются по транзакциям
+        totals = self.totals({'q': 'оплата'})
+        self.assertEqual((totals.income, totals.expense, totals.net,
+                          totals.count), (1000, 50, 950, 2))
+
+    def test_cached_totals_follow_writes(self):
+        self.assertEqual(self.totals().net, 1050)
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                    date_created=date(2024, 3, 6), type_act=self.expense_type,
+                    category_act=self.expense_category,
+                    subcategory_act=self.expense_subcategory, amount=1050)
+        totals = self.totals()
+        self.assertEqual((totals.net, totals.count), (0, 5))
+
+
+class SharedCacheCheckTest(LedgerTestCase):
+    """Версии данных хранятся в кэше, общем для всех процессов."""
+
+    def test_process_local_cache_rejected(self):
+        self.assertEqual(check_shared_cache(None), [])
+        for backend in PROCESS_LOCAL_CACHES:
+            with self.subTest(backend=backend), self.settings(
+                            CACHES={'default': {'BACKEND': backend}}):
+                self.assertEqual([error.id for error in
+                                  check_shared_cache(None)],
+                                 ['cashflow.E001'])
+
+
+class AsyncViewsTest(LedgerTestCase):
+    """Асинхронные список и выгрузка отдают то же, что синхронные."""
+
+    @classmethod
+    def setUpTestData(cls):
+        (cls.status, type_act, category, 
+         subcategory) = create_references()
+        for i in range(7):
+            Transaction.objects.create(
+                date_created=date(2024, 3, 1 + i % 3), 
+                status_act=cls.status if i % 2 else None,
+                type_act=type_act, category_act=category,
+                subcategory_act=subcategory, amount=100 * i,
+                comment='Доставка' if i % 3 else f'Оплата {i}')
+
+    def list_params(self):
+        return [{}, {'page_size': 3}, {'status_act': self.status.pk}, 
+                {'q': 'доставка'}, {'date_created_min': '2024-03-02'}]
+
+    def page(self, response):
+        """Строки, курсоры, итоги и таблица страницы списка."""
+        self.assertEqual(response.status_code, 200)
+        context = response.context
+        page, totals = context['page_obj'], context['totals']
+        return ([obj.pk for obj in page], page.has_next, 
+                page.next_token, page.previous_token,
+                (totals.income, totals.expense, totals.count,
+                 [(group.name, group.amount, group.count, 
+                   [(category.name, category.amount, category.count)
+                    for category in group.children])
+                  for group in totals.by_type]),
+                context['table'])
+
+    async def test_list_matches_sync(self):
+        for params in self.list_params():
+            with self.subTest(params=params):
+                # Таблица из кэша отрисовки не сравнивала бы страницы
+                await cache.aclear()
+                sync = self.page(await sync_to_async(self.client.get)(
+                                    reverse('cashflow:main'), params))
+                await cache.aclear()
+                response = await self.async_client.get(
+                                    reverse('cashflow:async_main'), params)
+                self.assertEqual(self.page(response), sync)
+                self.assertTrue(sync[0])
+
+    async def test_next_page_matches_sync(self):
+        params = {'page_size': 3}
+        response = await sync_to_async(self.client.get)(
+                                reverse('cashflow:main'), params)
+        params['after'] = response.context['page_obj'].next_token
+        await cache.aclear()
+        sync = self.page(await sync_to_async(self.client.get)(
+                                reverse('cashflow:main'), params))
+        await cache.aclear()
+        response = await self.async_client.get(
+                                reverse('cashflow:async_main'), params)
+        self.assertEqual(self.page(response), sync)
+        self.assertEqual(len(sync[0]), 3)
+
+    async def test_export_matches_sync(self):
+        for params in self.list_params():
+            with self.subTest(params=params):
+                response = await sync_to_async(self.client.get)(
+                            reverse('cashflow:export_transact', 
+                                    args=['csv']), params)
+                sync = await sync_to_async(b''.join)(
+                                            response.streaming_content)
+                response = await self.async_client.get(
+                            reverse('cashflow:async_export_transact', 
+                                    args=['csv']), params)
+                self.assertEqual(response['Content-Type'], 
+                                 'text/csv; charset=utf-8')
+                content = b''.join([chunk async for chunk 
+                                    in response.streaming_content])
+                self.assertEqual(content, sync)
+                self.assertGreater(content.count(b'\n'), 1)
+
+
+class ConditionalApiTest(LedgerTestCase):
+    """API отдаёт 304, пока не изменились данные и параметры запроса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = create_ledger(5)
+
+    def get(self, params, etag=None, url='cashflow:api_transactions'):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(reverse(url), params, headers=headers)
+
+    def test_not_modified_until_write(self):
+        for url in ('cashflow:api_transactions',
+                    'cashflow:async_api_transactions'):
+            with self.subTest(url=url):
+                response = self.get({'page_size': 2}, url=url)
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+                # Порядок и пустые параметры не меняют ETag
+                self.assertEqual(self.get({'page_size': 2, 'q': ''}, etag,
+                                          url).status_code, 304)
+
+                next_page = {'page_size': 2, 
+                             'after': response.json()['next']}
+                self.assertEqual(self.get(next_page, etag, url).status_code,
+                                 200)
+                self.assertEqual(self.get({'page_size': 2, 
+                                           'status_act': self.status.pk},
+                                          etag, url).status_code, 200)
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    Transaction.objects.order_by('pk').first().delete()
+                response = self.get({'page_size': 2}, etag, url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_main_page_etag_depends_on_filter(self):
+        url = reverse('cashflow:main')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, {'status_act': self.status.pk},
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'секционирование только в PostgreSQL '
+            '(CASHFLOW_DB_BACKEND=postgresql)')
+class PartitioningTest(LedgerTestCase):
+    """Секционирование таблицы транзакций в PostgreSQL."""
+
+    def setUp(self):
+        super().setUp()
+        status, type_act, category, subcategory = create_references()
+        self.dates = [date(2021, 5, 3), date(2021, 5, 30), 
+                      date(2022, 1, 1), None]
+        self.transacts = Transaction.objects.bulk_create([
+            Transaction(date_created=day, status_act=status,
+                        type_act=type_act, category_act=category,
+                        subcategory_act=subcategory, amount=i)
+            for i, day in enumerate(self.dates)])
+
+    def location(self, pk):
+        """Таблица (секция), в которой хранится транзакция pk."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text '
+                           f'FROM {partitions.TABLE} WHERE id = %s', [pk])
+            return cursor.fetchone()[0]
+
+    def test_migration_both_ways(self):
+        executor = MigrationExecutor(connection)
+        latest = executor.loader.graph.leaf_nodes('cashflow')
+        rows = list(Transaction.objects.order_by('pk')
+                                       .values_list('pk', 'date_created'))
+        # Миграция пересоздаёт таблицу в транзакции теста: отложенные
+        # проверки внешних ключей помешали бы созданию индексов
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+        executor.migrate([('cashflow', '0008_typeaction_flow')])
+        self.assertFalse(partitions.is_partitioned())
+        self.assertEqual(list(Transaction.objects.order_by('pk')
+                                         .values_list('pk', 'date_created')),
+                         rows)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT contype FROM pg_constraint "
+                           "WHERE conrelid = %s::regclass "
+                           "AND contype = 'p'", [partitions.TABLE])
+            self.assertIsNotNone(cursor.fetchone())
+        self.assertGreater(Transaction.objects.create(amount=1).pk, 
+                           rows[-1][0])
+
+        executor.loader.build_graph()
+        executor.migrate(latest)
+        self.assertTrue(partitions.is_partitioned())
+        self.assertEqual(
+            self.location(self.transacts[0].pk),
+            partitions.partition_name(date(2021, 5, 1)))
+        self.assertEqual(self.location(self.transacts[-1].pk),
+                         partitions.DEFAULT_PARTITION)
+        created = Transaction.objects.create(amount=2, 
+                                             date_created=date(2021, 5, 9))
+        self.assertEqual(created.pk, 
+                         Transaction.objects.order_by('pk').last().pk)
+        # id уникален внутри секции
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Transaction.objects.create(pk=created.pk, amount=3,
+                                       date_created=date(2021, 5, 10))
+
+    def test_create_partitions_moves_default_rows(self):
+        month = partitions.add_months(date.today(),
+                                      partitions.MONTHS_AHEAD + 2)
+        transact = Transaction.objects.create(date_created=month, amount=5)
+        self.assertEqual(self.location(transact.pk),
+                         partitions.DEFAULT_PARTITION)
+
+        out = StringIO()
+        call_command('create_partitions', 
+                     months=partitions.MONTHS_AHEAD + 3, stdout=out)
+        self.assertIn(partitions.partition_name(month), out.getvalue())
+        self.assertEqual(self.location(transact.pk),
+                         partitions.partition_name(month))
+        self.assertEqual(Transaction.objects.get(pk=transact.pk).amount, 5)
+
+    def test_date_range_prunes_partitions(self):
+        partitions.ensure_partitions(date(2021, 5, 1), date(2022, 1, 1))
+        plan = Transaction.objects.filter(
+                        date_created__range=(date(2021, 5, 1),
+                                             date(2021, 5, 31))).explain()
+        self.assertIn(partitions.partition_name(date(2021, 5, 1)), plan)
+        self.assertNotIn(partitions.partition_name(date(2022, 1, 1)), plan)
+        self.assertNotIn(partitions.DEFAULT_PARTITION, plan)
+
+
+class ViewMetricsTest(LedgerTestCase):
+    """Метрики и бюджеты SQL-запросов представлений."""
+
+    def test_budget_exceeded_in_strict_mode(self):
+        budgets = {'cashflow:main': 1}
+        with self.settings(CASHFLOW_QUERY_BUDGETS=budgets):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('cashflow:main'))
+        cache.clear()
+        with self.settings(CASHFLOW_QUERY_BUDGETS=budgets,
+                           CASHFLOW_QUERY_BUDGETS_STRICT=False), \
+                self.assertLogs('cashflow.middleware', 'WARNING'):
+            response = self.client.get(reverse('cashflow:main'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_table_render_counts_as_template_time(self):
+        def slow_render(*args, **kwargs):
+            sleep(0.05)
+            return ''
+
+        with mock.patch('cashflow.views.render_to_string', slow_render):
+            response = self.client.get(reverse('cashflow:main'))
+        self.assertGreaterEqual(
+                    response.wsgi_request._view_stats.template_seconds, 0.05)
+
+
+class SearchTest(LedgerTestCase):
+    """Полнотекстовый поиск по комментарию: основы слов и префиксы."""
+
+    def setUp(self):
+        super().setUp()
+        comments = ['Оплата рекламы на Avito', 'Расходы на рекламу',
+                    'Аренда офиса', 'Оплата аренды склада']
+        self.transacts = [Transaction.objects.create(amount=1,
+                                                     comment=comment)
+                          for comment in comments]
+
+    def found(self, query):
+        filterset = TransactFilter({'q': query},
+                                   queryset=Transaction.objects.all())
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+        return sorted(obj.comment for obj in filterset.qs)
+
+    def test_word_forms_match(self):
+        self.assertEqual(self.found('реклама'),
+                         ['Оплата рекламы на Avito', 'Расходы на рекламу'])
+        self.assertEqual(self.found('АРЕНДУ'),
+                         ['Аренда офиса', 'Оплата аренды склада'])
+        self.assertEqual(self.found('оплаты аренда'),
+                         ['Оплата аренды склада'])
+        self.assertEqual(self.found('доставка'), [])
+
+    def test_last_word_prefix(self):
+        self.assertEqual(self.found('рекл'),
+                         ['Оплата рекламы на Avito', 'Расходы на рекламу'])
+        self.assertEqual(self.found('оплата avi'),
+                         ['Оплата рекламы на Avito'])
+        self.assertEqual(self.found('скл'), ['Оплата аренды склада'])
+
+    def test_index_follows_changes(self):
+        transact = self.transacts[2]
+        transact.comment = 'Аренда склада'
+        transact.save()
+        self.assertEqual(self.found('склад'),
+                         ['Аренда склада', 'Оплата аренды склада'])
+        self.transacts[3].delete()
+        self.assertEqual(self.found('склад'), ['Аренда склада'])
+        self.assertEqual(self.found('офис'), [])
+
+    def test_bulk_insert_indexes_new_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            insert_transactions([(date(2024, 3, 5), None, None, None, None,
+                                  10, 'Доставка рекламы')])
+        self.assertEqual(self.found('реклама'),
+                         ['Доставка рекламы', 'Оплата рекламы на Avito',
+                          'Расходы на рекламу'])
+        # Граница индексации нужна только индексу SQLite
+        self.assertEqual(
+            any('max(id)' in query['sql'] 
+                for query in queries.captured_queries),
+            connection.vendor == 'sqlite')
+
+
+class FacetCountsTest(LedgerTestCase):
+    """Количество транзакций у вариантов фильтра считается без учёта
+    выбранного значения самого поля."""
+
+    def setUp(self):
+        super().setUp()
+        business, type_act, marketing, avito = create_references()
+        personal = StatusAction.objects.create(name='Личное')
+        office = CategoryAction.objects.create(name='Офис',
+                                               type_act=type_act)
+        rent = SubcategoryAction.objects.create(name='Аренда',
+                                                category_act=office)
+        rows = [(business, marketing, avito, date(2024, 3, 1), 'Avito'),
+                (business, marketing, avito, date(2024, 3, 2), 'Avito'),
+                (business, marketing, avito, date(2024, 4, 1), 'Avito'),
+                (business, office, rent, date(2024, 3, 5), 'Аренда'),
+                (business, office, rent, date(2024, 4, 5), 'Аренда'),
+                (personal, marketing, avito, date(2024, 3, 9), 'Avito')]
+        for status, category, subcategory, day, comment in rows:
+            Transaction.objects.create(
+                        status_act=status, type_act=type_act,
+                        category_act=category, subcategory_act=subcategory,
+                        date_created=day, comment=comment, amount=10)
+        self.refs = {'business': business, 'personal': personal,
+                     'type': type_act, 'marketing': marketing,
+                     'office': office}
+
+    def counts(self, params):
+        filterset = TransactFilter(params, queryset=Transaction.objects.all())
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+        facets = compute_facets(filterset)
+        return {name: dict(counts) for name, counts in facets.counts.items()
+                if counts}
+
+    def expected(self, params):
+        """Подсчёт перебором: для каждого поля - транзакции, подходящие
+        под остальные поля фильтра."""
+        filterset = TransactFilter(
+                        {key: value for key, value in params.items()
+                         if key not in FACET_FIELDS},
+                        queryset=Transaction.objects.all())
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+        rows = list(filterset.qs.values(*FACET_FIELDS.values()))
+        result = {}
+        for name, field in FACET_FIELDS.items():
+            counts = {}
+            for row in rows:
+                if all(row[other] == params[key]
+                       for key, other in FACET_FIELDS.items()
+                       if key != name and key in params):
+                    counts[row[field]] = counts.get(row[field], 0) + 1
+            if counts:
+                result[name] = counts
+        return result
+
+    def test_own_selection_ignored(self):
+        refs = self.refs
+        params = {'status_act': refs['business'].pk}
+        counts = self.counts(params)
+        self.assertEqual(counts['status_act'],
+                         {refs['business'].pk: 5, refs['personal'].pk: 1})
+        self.assertEqual(counts['category_act'],
+                         {refs['marketing'].pk: 3, refs['office'].pk: 2})
+
+    def test_matches_brute_force(self):
+        refs = self.refs
+        cases = [
+            {},
+            {'status_act': refs['personal'].pk},
+            {'type_act': refs['type'].pk,
+             'category_act': refs['office'].pk},
+            {'status_act': refs['business'].pk,
+             'type_act': refs['type'].pk,
+             'category_act': refs['marketing'].pk},
+            # Поле вне ключа сводки: подсчёт по самим транзакциям
+            {'status_act': refs['business'].pk, 'q': 'аренда'},
+            {'date_created_min': '2024-03-01',
+             'date_created_max': '2024-03-31',
+             'type_act': refs['type'].pk,
+             'category_act': refs['marketing'].pk},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self.counts(params), self.expected(params))
+
+
+@override_settings(CASHFLOW_BULK_CHUNK_SIZE=4)
+class BulkChangesTest(LedgerTestCase):
+    """Массовые изменения пакетами сохраняют сводку согласованной."""
+
+    def setUp(self):
+        super().setUp()
+        status, type_act, category, subcategory = create_references()
+        office = CategoryAction.objects.create(name='Офис',
+                                               type_act=type_act)
+        self.rent = SubcategoryAction.objects.create(name='Аренда',
+                                                     category_act=office)
+        self.status, self.category = status, category
+        for i in range(15):
+            Transaction.objects.create(
+                        date_created=date(2024, 3, 1 + i % 5) if i % 7
+                                     else None,
+                        status_act=status if i % 3 else None,
+                        type_act=type_act,
+                        category_act=category if i % 2 else office,
+                        subcategory_act=subcategory if i % 2 else self.rent,
+                        amount=100 + i, comment=f'Платёж {i}')
+        self.assertRollupRebuilt()
+
+    def test_bulk_update(self):
+        updated = bulk_update(Transaction.objects.filter(status_act=None),
+                              {'status_act_id': self.status.pk})
+        self.assertEqual(updated, 5)
+        self.assertRollupRebuilt()
+
+        rent = self.rent
+        updated = bulk_update(
+                    Transaction.objects.filter(category_act=self.category),
+                    {'category_act_id': rent.category_act_id,
+                     'subcategory_act_id': rent.pk})
+        self.assertEqual(updated, 7)
+        self.assertFalse(Transaction.objects.filter(
+                                    category_act=self.category).exists())
+        self.assertRollupRebuilt()
+
+    def test_bulk_delete(self):
+        deleted = bulk_delete(Transaction.objects.filter(
+                                    date_created__lte=date(2024, 3, 2)))
+        self.assertEqual(deleted, 5)
+        self.assertEqual(Transaction.objects.count(), 10)
+        self.assertRollupRebuilt()
+        self.assertEqual(len(TransactFilter({'q': 'платёж'},
+                                            queryset=Transaction.objects
+                                                                .all()).qs),
+                         10)
+
+        self.assertEqual(bulk_delete(Transaction.objects.all()), 10)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertRollupRebuilt()
+
+
+class DeleteReferenceTest(LedgerTestCase):
+    """Удаление элемента справочника сбрасывает ссылки транзакций
+    и оставляет сводку согласованной."""
+
+    def setUp(self):
+        super().setUp()
+        self.status, self.type_act, self.category, self.subcategory = (
+                                                        create_references())
+        other = TypeAction.objects.create(name='Поступление')
+        self.other_category = CategoryAction.objects.create(name='Продажи',
+                                                            type_act=other)
+        for i in range(7):
+            own = i % 3 != 0
+            Transaction.objects.create(
+                        date_created=date(2024, 5, 1 + i % 2),
+                        status_act=self.status if i % 2 else None,
+                        type_act=self.type_act if own else other,
+                        category_act=(self.category if own 
+                                      else self.other_category),
+                        subcategory_act=self.subcategory if own else None,
+                        amount=10 * i)
+
+    def test_delete_type_cascades(self):
+        impact = deletion_impact(self.type_act)
+        self.assertEqual((impact.categories, impact.subcategories,
+                          impact.transactions), (1, 1, 4))
+
+        delete_reference(self.type_act, size=3)
+        self.assertFalse(CategoryAction.objects.filter(
+                                    pk=self.category.pk).exists())
+        self.assertFalse(SubcategoryAction.objects.filter(
+                                    pk=self.subcategory.pk).exists())
+        self.assertEqual(
+            Transaction.objects.filter(type_act=None, category_act=None,
+                                       subcategory_act=None).count(), 4)
+        self.assertEqual(Transaction.objects.filter(
+                            category_act=self.other_category).count(), 3)
+        self.assertRollupRebuilt()
+        self.assertRollupMatches()
+
+    def test_delete_status(self):
+        delete_reference(self.status, size=2)
+        self.assertFalse(Transaction.objects.exclude(
+                                    status_act=None).exists())
+        self.assertEqual(Transaction.objects.count(), 7)
+        self.assertRollupRebuilt()
+
+
+class AdminFormsTest(LedgerTestCase):
+    """Формы админки проверяют цепочку справочников."""
+
+    def setUp(self):
+        super().setUp()
+        self.status, self.type_act, self.category, self.subcategory = (
+                                                        create_references())
+        self.other_type = TypeAction.objects.create(name='Поступление')
+
+    def data(self, **values):
+        data = {'status_act': self.status.pk, 'type_act': self.type_act.pk,
+                'category_act': self.category.pk,
+                'subcategory_act': self.subcategory.pk,
+                'amount': 100, 'comment': ''}
+        data.update(values)
+        return data
+
+    def test_chain_checked(self):
+        template = {'name': 'Аренда', 'period': RecurringTemplate.MONTH,
+                    'interval': 1, 'start_date': '2024-01-31'}
+        forms = [(TransactAdminForm, {'date_created': '2024-01-31'}),
+                 (RecurringTemplateAdminForm, template)]
+        for form_class, extra in forms:
+            with self.subTest(form=form_class.__name__):
+                form = form_class(self.data(**extra))
+                self.assertTrue(form.is_valid(), form.errors)
+
+                form = form_class(self.data(type_act=self.other_type.pk,
+                                            **extra))
+                self.assertFalse(form.is_valid())
+                self.assertEqual(set(form.errors), {'category_act'})
+
+    def test_template_dates_checked(self):
+        form = RecurringTemplateAdminForm(self.data(
+                    name='Аренда', period=RecurringTemplate.MONTH,
+                    interval=1, start_date='2024-01-31',
+                    end_date='2024-01-01'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(set(form.errors), {'end_date'})
+
+
+@override_settings(CASHFLOW_REPORT_WINDOW=2)
+class CashflowReportTest(LedgerTestCase):
+    """Ряды помесячного отчёта на небольшом наборе транзакций."""
+
+    def setUp(self):
+        super().setUp()
+        status, expense, marketing, avito = create_references()
+        income = TypeAction.objects.create(name='Поступление',
+                                           flow=TypeAction.INCOME)
+        sales = CategoryAction.objects.create(name='Продажи',
+                                              type_act=income)
+        rows = [(date(2024, 1, 10), expense, marketing, 100),
+                (date(2024, 1, 20), income, sales, 500),
+                (date(2024, 2, 5), expense, marketing, 300),
+                (date(2024, 2, 6), income, sales, 400),
+                # В марте транзакций нет
+                (date(2024, 4, 1), income, sales, 1000)]
+        for day, type_act, category, amount in rows:
+            Transaction.objects.create(date_created=day, type_act=type_act,
+                                       category_act=category, amount=amount,
+                                       comment='Оплата')
+
+    def report(self, params):
+        filterset = TransactFilter(params, queryset=Transaction.objects.all())
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+        return compute_report(filterset)
+
+    def test_report_numbers(self):
+        # Сводка DailyRollup и (с поиском) сами транзакции
+        for params in ({}, {'q': 'оплата'}):
+            with self.subTest(params=params):
+                report = self.report(params)
+                self.assertEqual(report.months,
+                                 [date(2024, month, 1)
+                                  for month in (1, 2, 3, 4)])
+                self.assertEqual(
+                    [(row.type_name, row.name, row.amounts, row.deltas,
+                      row.averages, row.total) for row in report.rows],
+                    [('Поступление', 'Продажи', [500, 400, 0, 1000],
+                      [None, -100, -400, 1000], [None, 450, 200, 500], 1900),
+                     ('Списание', 'Маркетинг', [-100, -300, 0, 0],
+                      [None, -200, 300, 0], [None, -200, -150, 0], -400)])
+                self.assertEqual(report.net, [400, 100, 0, 1000])
+                self.assertEqual(report.net_deltas, [None, -300, -100, 1000])
+                self.assertEqual(report.net_averages, [None, 250, 50, 500])
+                self.assertEqual(report.balance, [400, 500, 500, 1500])
+
+    def test_empty_report(self):
+        report = self.report({'date_created_min': '2030-01-01'})
+        self.assertEqual((report.months, report.rows, report.net,
+                          report.balance), ([], [], [], []))
+
+
+class TransactionAdminQueriesTest(LedgerTestCase):
+    """Список транзакций в админке выполняет постоянное число запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        status = StatusAction.objects.create(name='Бизнес')
+        type_act = TypeAction.objects.create(name='Списание')
+        category = CategoryAction.objects.create(name='Маркетинг',
+                                                 type_act=type_act)
+        subcategory = SubcategoryAction.objects.create(name='Avito',
+                                                       category_act=category)
+        Transaction.objects.bulk_create([
+            Transaction(status_act=status, type_act=type_act,
+                        category_act=category, subcategory_act=subcategory,
+                        amount=i)
+            for i in range(120)])
+        cls.user = get_user_model().objects.create_superuser(
+                                    'admin', 'admin@example.com', 'admin')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def changelist_queries(self, per_page):
+        url = reverse('admin:cashflow_transaction_changelist')
+        with mock.patch.object(TransactionAdmin, 'list_per_page', per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), per_page)
+        return queries
+
+    def test_changelist_queries_do_not_depend_on_page_size(self):
+        for per_page in (10, 50, 100):
+            with self.subTest(per_page=per_page):
+                self.assertEqual(len(self.changelist_queries(per_page)), 9)
+
+    def test_changelist_uses_estimated_count_for_large_table(self):
+        with mock.patch('cashflow.pagination.estimated_count',
+                        return_value=10 ** 7):
+            queries = self.changelist_queries(50)
+        self.assertEqual(len(queries), 7)
+        self.assertFalse(any('COUNT(*)' in query['sql']
+                             for query in queries.captured_queries))
+
+
+class TransactSaveQueriesTest(LedgerTestCase):
+    """Запросы сохранения транзакции из формы.
+
+    Создание - INSERT и обновление сводки. Изменение - чтение записи 
+    для сравнения с формой; форма без изменений больше ничего не делает, 
+    изменённая - повторное чтение с блокировкой, UPDATE изменённых полей 
+    и обновление сводки: старые значения нужны для точной разницы сводки. 
+    SQLite добавляет запрос блокировки записи (rollups.lock_for_write) 
+    и запись в таблицу FTS5 при изменении комментария, новая строка 
+    сводки - INSERT в точке сохранения.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = StatusAction.objects.create(name='Бизнес')
+        type_act = TypeAction.objects.create(name='Списание')
+        category = CategoryAction.objects.create(name='Маркетинг',
+                                                 type_act=type_act)
+        cls.subcategory = SubcategoryAction.objects.create(
+                                    name='Avito', category_act=category)
+        cls.office = CategoryAction.objects.create(name='Офис',
+                                                   type_act=type_act)
+        cls.rent = SubcategoryAction.objects.create(name='Аренда',
+                                                    category_act=cls.office)
+        cls.data = {'date_created_year': 2024, 'date_created_month': 3,
+                    'date_created_day': 5, 'status_act': cls.status.pk,
+                    'type_act': type_act.pk, 'category_act': category.pk,
+                    'subcategory_act': cls.subcategory.pk, 'amount': 100,
+                    'comment': ''}
+        cls.obj = Transaction.objects.create(
+                    date_created=date(2024, 3, 5), status_act=cls.status,
+                    type_act=type_act, category_act=category,
+                    subcategory_act=cls.subcategory, amount=100)
+
+    def post(self, url, data):
+        # Снимок справочников уже в кэше
+        registry.get()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data)
+        return response, [query['sql'] 
+                          for query in queries.captured_queries]
+
+    def update(self, data):
+        response, queries = self.post(
+                    reverse('cashflow:update_transact', args=[self.obj.pk]),
+                    {**self.data, **data})
+        # Транзакция записи изменения (write_atomic) внутри транзакции 
+        # теста - первая точка сохранения; в запросе сервера это BEGIN 
+        # и COMMIT, без запросов
+        savepoint = next((sql for sql in queries 
+                          if sql.startswith('SAVEPOINT')), None)
+        if savepoint is not None:
+            queries = [sql for sql in queries 
+                       if sql not in (savepoint, 'RELEASE ' + savepoint)]
+        return response, queries
+
+    def sqlite(self, count):
+        """count запросов только в SQLite."""
+        return count if connection.vendor == 'sqlite' else 0
+
+    def found(self, query):
+        return list(TransactFilter({'q': query},
+                                   queryset=Transaction.objects.all()).qs)
+
+    def test_create_is_insert_and_rollup_update(self):
+        response, queries = self.post(reverse('cashflow:create_transact'),
+                                      self.data)
+        obj = Transaction.objects.latest('pk')
+        self.assertRedirects(response, transact_location(obj),
+                             fetch_redirect_response=False)
+        self.assertEqual(len(queries), 2, queries)
+        self.assertTrue(queries[0].startswith('INSERT'))
+        self.assertEqual(DailyRollup.objects.get().count, 2)
+
+    def test_create_with_comment_on_new_day(self):
+        response, queries = self.post(reverse('cashflow:create_transact'),
+                                      {**self.data, 'date_created_day': 9,
+                                       'comment': 'Оплата'})
+        obj = Transaction.objects.latest('pk')
+        # INSERT, UPDATE сводки без строки дня, INSERT строки сводки 
+        # в точке сохранения (и запись в FTS5)
+        self.assertEqual(len(queries), 5 + self.sqlite(1), queries)
+        self.assertEqual(
+            DailyRollup.objects.get(day=date(2024, 3, 9)).count, 1)
+        self.assertEqual(self.found('оплата'), [obj])
+        self.assertRollupRebuilt()
+
+    def test_update_saves_changed_fields_only(self):
+        response, queries = self.update({'amount': 150})
+        self.assertRedirects(response, transact_location(self.obj),
+                             fetch_redirect_response=False)
+        # Чтение, (блокировка записи SQLite,) чтение с блокировкой, 
+        # UPDATE одного поля и обновление сводки
+        self.assertEqual(len(queries), 4 + self.sqlite(1), queries)
+        self.assertIn('SET "amount" = 150 WHERE', queries[-2])
+        self.assertEqual(DailyRollup.objects.get().amount, 150)
+
+    def test_unchanged_update_does_not_write(self):
+        response, queries = self.update({})
+        self.assertRedirects(response, transact_location(self.obj),
+                             fetch_redirect_response=False)
+        # Только чтение записи для сравнения с формой
+        self.assertEqual(len(queries), 1, queries)
+        self.assertTrue(queries[0].startswith('SELECT'))
+        self.assertNotIn('FOR UPDATE', queries[0])
+
+    def test_update_comment(self):
+        response, queries = self.update({'comment': 'Аренда склада'})
+        self.assertEqual(response.status_code, 302)
+        # Сводка не меняется; tsvector в PostgreSQL - вычисляемый столбец
+        self.assertEqual(len(queries), 3 + self.sqlite(2), queries)
+        self.assertEqual(self.found('склад'), [self.obj])
+
+        response, queries = self.update({'comment': 'Аренда офиса'})
+        self.assertEqual(self.found('склад'), [])
+        self.assertEqual(self.found('офис'), [self.obj])
+
+    def test_update_moves_to_other_category(self):
+        response, queries = self.update({'category_act': self.office.pk,
+                                         'subcategory_act': self.rent.pk})
+        self.assertEqual(response.status_code, 302)
+        # Два чтения, UPDATE, вычитание из старой строки сводки, UPDATE 
+        # и INSERT в точке сохранения новой строки
+        self.assertEqual(len(queries), 8 + self.sqlite(1), queries)
+        self.assertEqual(
+            DailyRollup.objects.get(category_act=self.office).count, 1)
+        self.assertRollupRebuilt()
+
+    def test_unknown_reference_is_invalid(self):
+        response, queries = self.post(reverse('cashflow:create_transact'),
+                                      {**self.data, 'status_act': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('status_act', response.context['form'].errors)
+        self.assertEqual(queries, [])
+
+    def test_location_opens_page_with_transaction(self):
+        response = self.client.get(transact_location(self.obj))
+        self.assertEqual(list(response.context['object_list']), [self.obj])
+
+
+class TransactGridTest(LedgerTestCase):
+    """Таблица ввода создаёт все строки одним пакетом или не создаёт ни одной."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = StatusAction.objects.create(name='Бизнес')
+        cls.type_act = TypeAction.objects.create(name='Списание')
+        cls.category = CategoryAction.objects.create(name='Маркетинг',
+                                                     type_act=cls.type_act)
+        cls.other_category = CategoryAction.objects.create(
+                                    name='Офис', type_act=cls.type_act)
+        cls.subcategory = SubcategoryAction.objects.create(
+                                    name='Avito', category_act=cls.category)
+
+    def grid_data(self, count, year=2024):
+        # Две последние строки не заполнены, как пустые строки таблицы
+        data = {'form-TOTAL_FORMS': count + 2, 'form-INITIAL_FORMS': 0}
+        for i in range(count + 2):
+            data[f'form-{i}-date_created'] = date.today().isoformat()
+        for i in range(count):
+            data.update({
+                f'form-{i}-date_created': f'{year}-03-{i % 28 + 1:02d}',
+                f'form-{i}-status_act': self.status.pk,
+                f'form-{i}-type_act': self.type_act.pk,
+                f'form-{i}-category_act': self.category.pk,
+                f'form-{i}-subcategory_act': self.subcategory.pk,
+                f'form-{i}-amount': i + 1,
+                f'form-{i}-comment': 'кофе' if i % 2 else ''})
+        return data
+
+    def post(self, data):
+        registry.get()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('cashflow:grid_transact'),
+                                        data)
+        return response, len(queries)
+
+    def test_rows_are_created_with_constant_queries(self):
+        counts = []
+        # Разные годы - чтобы оба пакета создавали новые строки сводки
+        for count, year in ((5, 2023), (50, 2024)):
+            response, queries = self.post(self.grid_data(count, year))
+            self.assertEqual(response.context['result'], count)
+            counts.append(queries)
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Transaction.objects.count(), 55)
+        self.assertEqual(sum(DailyRollup.objects.values_list('amount', 
+                                                              flat=True)),
+                         sum(range(1, 6)) + sum(range(1, 51)))
+
+    def test_invalid_row_creates_nothing(self):
+        data = self.grid_data(5)
+        data['form-3-category_act'] = self.other_category.pk
+        response, queries = self.post(data)
+        self.assertEqual(queries, 0)
+        errors = [form.errors for form in response.context['form'].forms]
+        self.assertIn('subcategory_act', errors[3])
+        self.assertFalse(any(errors[:3] + errors[4:]))
+        self.assertFalse(Transaction.objects.exists())
+
+
+class RecurringTest(LedgerTestCase):
+    """Транзакции по шаблонам создаются один раз на каждое повторение."""
+
+    @classmethod
+    def setUpTestData(cls):
+        type_act = TypeAction.objects.create(name='Списание')
+        category = CategoryAction.objects.create(name='Аренда',
+                                                 type_act=type_act)
+        subcategory = SubcategoryAction.objects.create(
+                                    name='Офис', category_act=category)
+        cls.template = RecurringTemplate.objects.create(
+                    name='Аренда офиса', period=RecurringTemplate.MONTH,
+                    start_date=date(2024, 1, 31), type_act=type_act,
+                    category_act=category, subcategory_act=subcategory,
+                    amount=1000)
+
+    def test_monthly_occurrences_use_last_day_of_short_months(self):
+        self.assertEqual(
+            list(occurrence_dates(self.template, date(2024, 1, 1), 
+                                  date(2024, 4, 30))),
+            [date(2024, 1, 31), date(2024, 2, 29), 
+             date(2024, 3, 31), date(2024, 4, 30)])
+
+    def test_materialize_is_idempotent(self):
+        result = materialize(date(2024, 4, 30))
+        self.assertEqual((result.created, result.templates), (4, 1))
+        self.assertEqual(materialize(date(2024, 4, 30)).templates, 0)
+
+        # Без отметки о созданных датах дубликаты не создаются 
+        # благодаря ключу (шаблон, дата)
+        RecurringTemplate.objects.update(materialized_until=None)
+        result = materialize(date(2024, 5, 31))
+        self.assertEqual((result.created, result.skipped), (1, 4))
+        self.assertEqual(
+            list(Transaction.objects.order_by('date_created')
+                                    .values_list('date_created', flat=True)),
+            [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), 
+             date(2024, 4, 30), date(2024, 5, 31)])
+        self.assertEqual(sum(DailyRollup.objects.values_list('amount', 
+                                                              flat=True)),
+                         5000)
+
+
+def create_ledger(count):
+    """Справочники и count транзакций без статуса; возвращает статус."""
+    status = StatusAction.objects.create(name='Личное')
+    type_act = TypeAction.objects.create(name='Списание')
+    category = CategoryAction.objects.create(name='Маркетинг',
+                                             type_act=type_act)
+    subcategory = SubcategoryAction.objects.create(name='Avito',
+                                                   category_act=category)
+    Transaction.objects.bulk_create([
+        Transaction(type_act=type_act, category_act=category,
+                    subcategory_act=subcategory, amount=i)
+        for i in range(count)])
+    return status
+
+
+@override_settings(CASHFLOW_BULK_CHUNK_SIZE=10,
+                   CASHFLOW_JOB_PROGRESS_INTERVAL=0)
+class JobQueueTest(LedgerTestCase):
+    """Фоновые задачи, выполняемые распорядителем в своём процессе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = create_ledger(30)
+
+    def run_worker(self):
+        jobs.Worker(processes=0).run(burst=True)
+
+    def enqueue_status(self):
+        return jobs.enqueue('bulk', {
+                    'values': {'status_act_id': self.status.pk},
+                    'ids': None, 'query': ''})
+
+    def test_bulk_job_updates_transactions_and_rollups(self):
+        job = self.enqueue_status()
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result, {'count': 30})
+        self.assertEqual((job.progress, job.total), (30, 30))
+        self.assertEqual(
+            Transaction.objects.filter(status_act=self.status).count(), 30)
+        self.assertEqual(
+            DailyRollup.objects.filter(status_act=self.status, 
+                                       count=30).count(), 1)
+
+    def test_cancelled_queued_job_is_not_run(self):
+        job = self.enqueue_status()
+        self.assertTrue(jobs.cancel(job.pk))
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.CANCELLED)
+        self.assertIsNone(job.started_at)
+        self.assertFalse(
+            Transaction.objects.filter(status_act=self.status).exists())
+
+    def test_cancel_stops_running_job_between_chunks(self):
+        set_total = jobs.JobProgress.set_total
+
+        def set_total_and_cancel(progress, total):
+            set_total(progress, total)
+            jobs.cancel(progress.job_id)
+
+        job = self.enqueue_status()
+        with mock.patch.object(jobs.JobProgress, 'set_total',
+                               set_total_and_cancel):
+            self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.CANCELLED)
+        # Первый пакет зафиксирован до проверки отмены
+        self.assertEqual(job.progress, 10)
+        self.assertEqual(
+            Transaction.objects.filter(status_act=self.status).count(), 10)
+
+    def test_invalid_params_fail_job(self):
+        job = jobs.enqueue('export', {'fmt': 'csv',
+                                      'query': 'date_created_min=x'})
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.error, 'Некорректные параметры фильтра')
+
+    def test_stale_running_jobs_failed_on_worker_start(self):
+        stale, alive = self.enqueue_status(), self.enqueue_status()
+        self.assertEqual(jobs.claim_next('dead-worker'), stale.pk)
+        self.assertEqual(jobs.claim_next('other-worker'), alive.pk)
+        Job.objects.filter(pk=stale.pk).update(
+                    heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        with self.assertLogs('cashflow.jobs', 'WARNING') as logs:
+            self.run_worker()
+        self.assertEqual(logs.output, [
+                    'WARNING:cashflow.jobs:Задачи остановленных '
+                    'распорядителей завершены ошибкой: 1'])
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(stale.status, Job.FAILED)
+        self.assertEqual(stale.error, 
+                         'Распорядитель задачи перестал отвечать')
+        self.assertEqual((alive.status, alive.worker),
+                         (Job.RUNNING, 'other-worker'))
+
+    def test_heartbeat_marks_own_jobs(self):
+        worker = jobs.Worker(processes=0)
+        job = self.enqueue_status()
+        jobs.claim_next(worker.worker_id)
+        old = timezone.now() - timedelta(minutes=1)
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=old)
+        worker.heartbeat()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), 
+                         (Job.RUNNING, worker.worker_id))
+        self.assertGreater(job.heartbeat_at, old)
+
+    def test_run_worker_command_logs_to_its_output(self):
+        for _ in range(2):
+            job = self.enqueue_status()
+            out = StringIO()
+            call_command('run_worker', processes=0, burst=True, stdout=out)
+            self.assertEqual(out.getvalue().count(f'Задача {job.pk}:'), 1)
+        self.assertEqual(logging.getLogger('cashflow.jobs').handlers, [])
+
+    def test_failed_stale_job_keeps_failed_status(self):
+        # Другой распорядитель счёл задачу потерянной, пока она выполнялась
+        def rebuild(date_from, date_to):
+            self.assertEqual(jobs.fail_stale(timeout=-1), 1)
+            return 0
+
+        job = jobs.enqueue('rebuild_rollups')
+        with mock.patch.object(rollups, 'rebuild', rebuild):
+            self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.error, 
+                         'Распорядитель задачи перестал отвечать')
+
+    def test_progress_stops_failed_job(self):
+        job = self.enqueue_status()
+        jobs.claim_next()
+        progress = jobs.JobProgress(job)
+        progress.flush()
+        jobs.fail_stale(timeout=-1)
+        with self.assertRaises(jobs.JobCancelled):
+            progress.flush()
+
+
+class JobWorkerProcessTest(TemporaryCacheMixin, TransactionTestCase):
+    """Фоновые задачи, выполняемые в пуле процессов распорядителя."""
+
+    def test_pool_runs_jobs(self):
+        status = create_ledger(30)
+        queued = [jobs.enqueue('bulk', {
+                        'values': {'status_act_id': status.pk},
+                        'ids': None, 'query': ''}),
+                  jobs.enqueue('rebuild_rollups')]
+        jobs.Worker(processes=2, poll=0.1).run(burst=True)
+        for job in queued:
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.DONE, job.error)
+        self.assertEqual(
+            Transaction.objects.filter(status_act=status).count(), 30)
+
+    def test_worker_write_changes_page_version(self):
+        # Задача выполняется в другом процессе; новая версия данных
+        # попадает к серверу через общий кэш
+        status = create_ledger(5)
+        url = reverse('cashflow:main')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                                    .status_code, 304)
+
+        job = jobs.enqueue('bulk', {
+                    'values': {'status_act_id': status.pk},
+                    'ids': None, 'query': ''})
+        jobs.Worker(processes=1, poll=0.1).run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE, job.error)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(CASHFLOW_JOB_HEARTBEAT_INTERVAL=0.05)
+    def test_inline_worker_marks_long_job(self):
+        # Пересчёт сводки - одна транзакция без вызовов progress
+        job = jobs.enqueue('rebuild_rollups')
+        beats = []
+
+        def rebuild(date_from, date_to):
+            for _ in range(3):
+                sleep(0.2)
+                beats.append(Job.objects.get(pk=job.pk).heartbeat_at)
+            return 0
+
+        with mock.patch.object(rollups, 'rebuild', rebuild):
+            jobs.Worker(processes=0, poll=0.1).run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE, job.error)
+        self.assertLess(beats[0], beats[1])
+        self.assertLess(beats[1], beats[2])
@@ -0,0 +1,145 @@
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from .models import TypeAction
+from .references import registry
+from .rollups import rollup_queryset
+from .versions import aledger_version, ledger_version
+
+
+TOTALS_KEY = 'cashflow:totals:{version}:{filter_key}'
+TOTALS_TIMEOUT = 60 * 60
+
+
+def totals_rows(filterset):
+    """Суммы и количества по (тип, категория) для состояния фильтра.
+
+    Результат - список кортежей (id типа, id категории, сумма, количество),
+    полученный одним группирующим запросом к сводке DailyRollup, а если
+    фильтр использует поля вне ключа сводки - к самим транзакциям.
+    Кэшируется по версии данных и нормализованному ключу фильтра.
+    """
+    key = TOTALS_KEY.format(version=ledger_version(),
+                            filter_key=filterset.cache_key())
+    rows = cache.get(key)
+    if rows is None:
+        rows = [row for row in _totals_queryset(filterset) if row[3]]
+        cache.set(key, rows, TOTALS_TIMEOUT)
+    return rows
+
+
+async def atotals_rows(filterset):
+    """Асинхронный вариант totals_rows() для async-представлений."""
+    key = TOTALS_KEY.format(version=await aledger_version(),
+                            filter_key=filterset.cache_key())
+    rows = await cache.aget(key)
+    if rows is None:
+        rows = [row async for row in _totals_queryset(filterset) if row[3]]
+        await cache.aset(key, rows, TOTALS_TIMEOUT)
+    return rows
+
+
+def _totals_queryset(filterset):
+    rollups = rollup_queryset(filterset)
+    if rollups is not None:
+        return (rollups.order_by()
+                       .values_list('type_act_id', 'category_act_id')
+                       .annotate(total_amount=Sum('amount'),
+                                 total_count=Sum('count')))
+    return (filterset.qs.order_by()
+                        .values_list('type_act_id', 'category_act_id')
+                        .annotate(total_amount=Sum('amount'),
+                                  total_count=Count('id')))
+
+
+class TotalsGroup:
+    """Итог по одному типу или категории.
+
+    Attributes:
+    -----------
+    name: str
+        Название типа или категории
+    amount: int
+        Сумма транзакций
+    count: int
+        Количество транзакций
+    flow: str
+        Направление типа (TypeAction.flow), для категорий - None
+    children: list
+        Итоги по категориям типа (TotalsGroup)
+    """
+
+    def __init__(self, name, flow=None):
+        self.name = name
+        self.flow = flow
+        self.amount = 0
+        self.count = 0
+        self.children = []
+
+
+class CashflowTotals:
+    """Итоги отфильтрованного списка транзакций.
+
+    Поступления и списания определяются по направлению типа
+    (TypeAction.flow). Названия берутся из текущего снимка справочников,
+    поэтому переименование не требует пересчёта итогов.
+
+    Attributes:
+    -----------
+    income: int
+        Сумма поступлений
+    expense: int
+        Сумма списаний
+    net: int
+        Разница поступлений и списаний
+    count: int
+        Количество транзакций
+    by_type: list
+        Итоги по типам с разбивкой по категориям (TotalsGroup)
+    """
+
+    def __init__(self, rows, references):
+        self.income = 0
+        self.expense = 0
+        self.count = 0
+        type_names = {item.pk: item.name for item in references.types}
+        category_names = {item.pk: item.name
+                          for item in references.categories}
+
+        groups = {}
+        for type_id, category_id, amount, count in rows:
+            self.count += count
+            flow = references.type_flows.get(type_id)
+            if flow == TypeAction.INCOME:
+                self.income += amount
+            elif flow == TypeAction.EXPENSE:
+                self.expense += amount
+
+            group = groups.get(type_id)
+            if group is None:
+                group = groups[type_id] = TotalsGroup(
+                                    type_names.get(type_id, 'Без типа'), flow)
+            group.amount += amount
+            group.count += count
+            category = TotalsGroup(category_names.get(category_id,
+                                                      'Без категории'))
+            category.amount = amount
+            category.count = count
+            group.children.append(category)
+
+        self.net = self.income - self.expense
+        self.by_type = sorted(groups.values(),
+                              key=lambda group: -group.amount)
+        for group in self.by_type:
+            group.children.sort(key=lambda category: -category.amount)
+
+
+def compute_totals(filterset):
+    """Возвращает CashflowTotals для проверенного фильтра транзакций."""
+    return CashflowTotals(totals_rows(filterset), registry.get())
+
+
+async def acompute_totals(filterset):
+    """Асинхронный вариант compute_totals() для async-представлений."""
+    return CashflowTotals(await atotals_rows(filterset), 
+                          await registry.aget())
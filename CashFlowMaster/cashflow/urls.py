@@ -10,17 +10,34 @@ app_name = 'cashflow'
 urlpatterns = [
      path('', views.MainView.as_view(), name='main'),
      
+     path('report/', 
+          views.ReportView.as_view(), 
+          name='report'),
+
      path('reference_manage/', 
           views.ReferenceManage.as_view(), 
           name='reference_manage'),
 
 
+     path('reference_tree/', 
+          views.ReferenceTreeView.as_view(), 
+          name='reference_tree'),
+
+     path('metrics/', 
+          views.MetricsView.as_view(), 
+          name='metrics'),
+
+
      # Transaction
 
      path('create_transact/', 
           views.TransactCreateView.as_view(), 
           name='create_transact'),
 
+     path('grid_transact/', 
+          views.TransactGridView.as_view(), 
+          name='grid_transact'),
+
      path('detail_transact/<int:pk>', 
           views.TransactDetailView.as_view(), 
           name='detail_transact'),
@@ -33,6 +50,60 @@ urlpatterns = [
           views.TransactDeleteView.as_view(), 
           name='delete_transact'),
 
+     path('import_transact/', 
+          views.TransactImportView.as_view(), 
+          name='import_transact'),
+
+     path('bulk_transact/', 
+          views.TransactBulkView.as_view(), 
+          name='bulk_transact'),
+
+     path('export_transact/<str:fmt>', 
+          views.TransactExportView.as_view(), 
+          name='export_transact'),
+
+     path('api/transactions/', 
+          views.TransactApiView.as_view(), 
+          name='api_transactions'),
+
+
+     # Фоновые задачи
+
+     path('jobs/', 
+          views.JobListView.as_view(), 
+          name='jobs'),
+
+     path('detail_job/<int:pk>', 
+          views.JobDetailView.as_view(), 
+          name='detail_job'),
+
+     path('status_job/<int:pk>', 
+          views.JobStatusView.as_view(), 
+          name='status_job'),
+
+     path('cancel_job/<int:pk>', 
+          views.JobCancelView.as_view(), 
+          name='cancel_job'),
+
+     path('download_job/<int:pk>', 
+          views.JobDownloadView.as_view(), 
+          name='download_job'),
+
+
+     # Асинхронные варианты для работы под ASGI
+
+     path('async/', 
+          views.AsyncMainView.as_view(), 
+          name='async_main'),
+
+     path('async/export_transact/<str:fmt>', 
+          views.AsyncTransactExportView.as_view(), 
+          name='async_export_transact'),
+
+     path('async/api/transactions/', 
+          views.AsyncTransactApiView.as_view(), 
+          name='async_api_transactions'),
+
 
      # StatusAction
 
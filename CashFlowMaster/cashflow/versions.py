@@ -0,0 +1,58 @@
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+LEDGER_VERSION_KEY = 'cashflow:ledger:version'
+
+# Первые 16 шестнадцатеричных цифр версии - время её выставления
+# в наносекундах, остальные - случайный суффикс
+_STAMP_DIGITS = 16
+
+
+def new_version():
+    """Возвращает новую уникальную версию с отметкой текущего времени."""
+    return f'{time.time_ns():0{_STAMP_DIGITS}x}{uuid.uuid4().hex[:8]}'
+
+
+def version_time(version):
+    """Возвращает время выставления версии (datetime в UTC) или None."""
+    try:
+        stamp = int(version[:_STAMP_DIGITS], 16)
+    except (TypeError, ValueError):
+        return None
+    return datetime.fromtimestamp(stamp / 1e9, tz=timezone.utc)
+
+
+def ledger_version():
+    """Возвращает текущую версию данных транзакций.
+
+    Версия меняется при каждой записи транзакций и входит в ключи кэша
+    производных данных (итогов и т.п.), поэтому после изменения
+    транзакций устаревшие значения кэша больше не читаются.
+    Кэш общий для всех процессов (см. cashflow.checks), поэтому записи 
+    фоновых задач и команд управления видны серверу.
+    """
+    version = cache.get(LEDGER_VERSION_KEY)
+    if version is None:
+        cache.add(LEDGER_VERSION_KEY, new_version(), timeout=None)
+        version = cache.get(LEDGER_VERSION_KEY)
+    return version
+
+
+async def aledger_version():
+    """Асинхронный вариант ledger_version() для async-представлений."""
+    version = await cache.aget(LEDGER_VERSION_KEY)
+    if version is None:
+        await cache.aadd(LEDGER_VERSION_KEY, new_version(), timeout=None)
+        version = await cache.aget(LEDGER_VERSION_KEY)
+    return version
+
+
+def bump_ledger_version():
+    """Выставляет новую версию данных транзакций после фиксации записи."""
+    transaction.on_commit(
+        lambda: cache.set(LEDGER_VERSION_KEY, new_version(), timeout=None))
@@ -1,18 +1,55 @@
-from django.shortcuts import render
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import (FileResponse, Http404, HttpResponse, 
+                         HttpResponseRedirect, JsonResponse, 
+                         StreamingHttpResponse)
+from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
 from django.views.generic.detail import DetailView
 from django.views.generic import (CreateView, UpdateView, TemplateView, 
-                                  ListView, DeleteView)
-from django.urls import reverse_lazy
+                                  ListView, DeleteView, View, FormView)
+from django.urls import reverse, reverse_lazy
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 
-from django_filters.views import FilterView
+from django_filters.views import FilterMixin, FilterView
 
 from .models import (Transaction, StatusAction, TypeAction, 
-                     CategoryAction, SubcategoryAction)
+                     CategoryAction, SubcategoryAction, Job)
+from .api import (FIELDS_PARAM, InvalidFields, parse_fields, 
+                  transaction_page, atransaction_page)
+from .conditional import acondition, ledger_etag, ledger_last_modified
 from .filters import TransactFilter
-from .forms import (TransactCreateUpdateForm, StatusActionForm, TypeActionForm, 
+from .facets import compute_facets, acompute_facets
+from .exports import (EXPORT_FORMATS, export_rows, aexport_rows, 
+                      iter_export, aiter_export)
+from .pagination import (KeysetPaginator, InvalidCursor, 
+                         AFTER_PARAM, BEFORE_PARAM, CURSOR_PARAMS, 
+                         cursor_at, requested_page_size)
+from .bulk import (bulk_delete, bulk_update, delete_reference, 
+                   deletion_impact)
+from .forms import (TransactCreateUpdateForm, TransactImportForm, 
+                    TransactBulkForm, TransactGridFormSet, 
+                    StatusActionForm, TypeActionForm, 
                     CategoryActionForm, SubcategoryActionForm)
-
-
+from .imports import ImportFileError, TransactImporter, decode_lines
+from .jobs import cancel, enqueue, job_storage
+from .metrics import metrics
+from .middleware import timed_render
+from .references import registry
+from .reports import AMOUNT, METRIC_CHOICES, compute_report, format_series
+from .rollups import write_atomic
+from .signals import remember_locked_values
+from .totals import compute_totals, acompute_totals
+from .versions import aledger_version, ledger_version
+
+
+@method_decorator(condition(etag_func=ledger_etag, 
+                             last_modified_func=ledger_last_modified), 
+                  name='get')
 class MainView(FilterView):
     """Представление для главной страницы.
 
@@ -23,6 +60,25 @@ class MainView(FilterView):
     Представление использует TransactFilter для фильтрации данных 
     и оптимизирует запросы через предварительную загрузку связанных объектов.
 
+    Список разбит на страницы курсорной пагинацией (KeysetPaginator): 
+    ссылки на соседние страницы содержат непрозрачные токены after/before 
+    и сохраняют текущие параметры фильтра. Размер страницы задаётся 
+    параметром page_size, но не больше CASHFLOW_MAX_PAGE_SIZE.
+
+    Над списком выводятся итоги по всей отфильтрованной выборке 
+    (поступления, списания, разница и разбивка по типам и категориям), 
+    посчитанные одним группирующим запросом (см. cashflow.totals). 
+    К вариантам статуса, типа, категории и подкатегории в фильтре 
+    дописывается количество подходящих транзакций (см. cashflow.facets).
+
+    Страница зависит только от версий транзакций и справочников 
+    и параметров запроса: по ним строятся ETag и Last-Modified 
+    (см. cashflow.conditional), и неизменённая страница отдаётся 
+    ответом 304 без обращений к транзакциям. Отрисованная таблица 
+    кэшируется по тем же версиям и параметрам запроса, поэтому любое 
+    изменение транзакции или справочника приводит к её повторной 
+    отрисовке.
+
     Attributes:
     ----------
     model: Transaction
@@ -31,18 +87,256 @@ class MainView(FilterView):
         Путь к шаблону для отображения списка транзакций
     filterset_class: TransactFilter
         Класс фильтра, используемый для фильтрации данных
+    paginate_by: int
+        Размер страницы по умолчанию
+    table_template_name: str
+        Шаблон таблицы транзакций с навигацией по страницам
     """
 
     model = Transaction
     template_name = 'cashflow/main.html' 
     filterset_class = TransactFilter
+    paginate_by = settings.CASHFLOW_PAGE_SIZE
+    # Представление, на которое ведут ссылки выгрузки
+    export_view = 'cashflow:export_transact'
+    table_template_name = 'cashflow/transaction/table.html'
+    table_cache_key = 'cashflow:table:{ledger}:{references}:{query}'
+    # Таблицы устаревших версий вытесняются из кэша по истечении срока
+    table_timeout = 60 * 60
 
     def get_queryset(self):
         return (super().get_queryset()
-                       .order_by('-date_created')
+                       .order_by('-date_created', '-id')
                        .select_related('status_act', 'type_act', 
                                        'category_act', 'subcategory_act',))
 
+    def get_paginate_by(self, queryset):
+        return requested_page_size(self.request, self.paginate_by)
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.table is not None:
+            # Таблица взята из кэша, страница списка не нужна
+            return None, None, queryset, False
+        paginator, page = self.paginate_keyset(queryset, page_size)
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def paginate_keyset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size)
+        try:
+            page = paginator.page(after=self.request.GET.get(AFTER_PARAM),
+                                  before=self.request.GET.get(BEFORE_PARAM))
+        except InvalidCursor:
+            raise Http404('Некорректный курсор страницы')
+        return paginator, page
+
+    def get_table_key(self, ledger, references):
+        """Ключ кэша таблицы или None, если фильтр некорректен.
+
+        Таблица зависит от всех параметров запроса: они определяют 
+        выборку, страницу и ссылки навигации.
+        """
+        if self.filterset.is_bound and not self.filterset.is_valid():
+            return None
+        query = hashlib.sha1(self.request.GET.urlencode().encode())
+        return self.table_cache_key.format(ledger=ledger, 
+                                           references=references,
+                                           query=query.hexdigest())
+
+    def get_context_data(self, **kwargs):
+        table_key = self.get_table_key(ledger_version(), 
+                                       registry.get().version)
+        self.table = cache.get(table_key) if table_key else None
+        context = self.get_list_context_data(**kwargs)
+        if self.table is None:
+            self.table = self.render_table(context)
+            if table_key:
+                cache.set(table_key, self.table, self.table_timeout)
+        context['table'] = self.table
+        return context
+
+    def render_table(self, context):
+        """Отрисовывает таблицу; время отрисовки учитывается в метриках
+        запроса вместе со временем шаблона страницы."""
+        with timed_render(self.request):
+            return render_to_string(self.table_template_name, context,
+                                    self.request)
+
+    def get_list_context_data(self, **kwargs):
+        """Контекст страницы без отрисованной таблицы."""
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.copy()
+        for param in CURSOR_PARAMS:
+            query.pop(param, None)
+        context['page_query'] = query.urlencode()
+        context['export_view'] = self.export_view
+        context['bulk_form'] = TransactBulkForm(initial={
+                                    'scope': TransactBulkForm.SELECTED})
+        if not self.filterset.is_bound or self.filterset.is_valid():
+            context['totals'] = self.get_totals()
+            self.get_facets().label_form(self.filterset.form)
+        return context
+
+    def get_totals(self):
+        return compute_totals(self.filterset)
+
+    def get_facets(self):
+        return compute_facets(self.filterset)
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        # Браузер проверяет актуальность страницы при каждом показе
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class AsyncFilterMixin(FilterMixin):
+    """Построение фильтра для async-представлений."""
+
+    async def aget_filterset(self):
+        """Строит и проверяет фильтр в потоке.
+
+        Варианты выбора фильтра берутся из справочников, которые 
+        при промахе кэша читаются из базы синхронным ORM. Набор 
+        filterset.qs после этого строится без обращений к базе.
+        """
+        def build():
+            filterset = self.get_filterset(self.get_filterset_class())
+            if not filterset.is_bound or filterset.is_valid():
+                filterset.qs
+            return filterset
+        return await sync_to_async(build)()
+
+
+class AsyncMainView(AsyncFilterMixin, MainView):
+    """Асинхронный вариант MainView для работы под ASGI (uvicorn).
+
+    Страница списка и итоги читаются асинхронным ORM, и пока выполняются 
+    запросы к базе, процесс обслуживает другие запросы. Ссылки выгрузки 
+    ведут на AsyncTransactExportView.
+    """
+
+    export_view = 'cashflow:async_export_transact'
+
+    async def get(self, request, *args, **kwargs):
+        return await acondition(request, lambda: self.get_page(request))
+
+    async def get_page(self, request):
+        self.filterset = await self.aget_filterset()
+        self.totals = self.facets = None
+        if not self.filterset.is_bound or self.filterset.is_valid():
+            self.object_list = self.filterset.qs
+            self.totals = await acompute_totals(self.filterset)
+            self.facets = await acompute_facets(self.filterset)
+        else:
+            self.object_list = self.filterset.queryset.none()
+
+        table_key = self.get_table_key(await aledger_version(), 
+                                       (await registry.aget()).version)
+        self.table = await cache.aget(table_key) if table_key else None
+        if self.table is None:
+            self.paginator = KeysetPaginator(
+                                self.object_list, 
+                                self.get_paginate_by(self.object_list))
+            try:
+                self.page = await self.paginator.apage(
+                                        after=request.GET.get(AFTER_PARAM),
+                                        before=request.GET.get(BEFORE_PARAM))
+            except InvalidCursor:
+                raise Http404('Некорректный курсор страницы')
+
+        context = self.get_list_context_data(filter=self.filterset, 
+                                             object_list=self.object_list)
+        if self.table is None:
+            self.table = await sync_to_async(self.render_table)(context)
+            if table_key:
+                await cache.aset(table_key, self.table, self.table_timeout)
+        context['table'] = self.table
+        return self.render_to_response(context)
+
+    def paginate_keyset(self, queryset, page_size):
+        return self.paginator, self.page
+
+    def get_totals(self):
+        return self.totals
+
+    def get_facets(self):
+        return self.facets
+
+
+class TransactExportView(FilterMixin, View):
+    """Представление для выгрузки отфильтрованного списка транзакций.
+
+    Принимает те же параметры, что и TransactFilter на главной странице, 
+    и потоково отдаёт все подходящие транзакции в формате CSV или XLSX. 
+    Строки читаются из базы порциями, поэтому расход памяти не зависит 
+    от размера выгрузки. POST с теми же параметрами ставит выгрузку 
+    в очередь фоновых задач; файл скачивается со страницы задачи.
+
+    Attributes:
+    ----------
+    filterset_class: TransactFilter
+        Класс фильтра, используемый для фильтрации данных
+    """
+
+    model = Transaction
+    filterset_class = TransactFilter
+
+    def get_queryset(self):
+        return Transaction.objects.all()
+
+    def get(self, request, fmt):
+        encoder_class = self.get_encoder_class(fmt)
+        filterset = self.get_filterset(self.get_filterset_class())
+        rows = export_rows(self.get_export_queryset(filterset))
+        return self.export_response(fmt, iter_export(encoder_class, rows))
+
+    def post(self, request, fmt):
+        self.get_encoder_class(fmt)
+        job = enqueue('export', {'fmt': fmt, 
+                                 'query': request.GET.urlencode()})
+        return job_redirect(job)
+
+    def get_encoder_class(self, fmt):
+        if fmt not in EXPORT_FORMATS:
+            raise Http404('Неизвестный формат выгрузки')
+        return EXPORT_FORMATS[fmt][1]
+
+    @staticmethod
+    def get_export_queryset(filterset):
+        if not filterset.is_bound or filterset.is_valid():
+            return filterset.qs
+        return filterset.queryset.none()
+
+    @staticmethod
+    def export_response(fmt, content):
+        response = StreamingHttpResponse(content, 
+                                         content_type=EXPORT_FORMATS[fmt][0])
+        response['Content-Disposition'] = (
+            f'attachment; filename="transactions.{fmt}"')
+        return response
+
+
+class AsyncTransactExportView(AsyncFilterMixin, TransactExportView):
+    """Асинхронный вариант TransactExportView для работы под ASGI.
+
+    Строки читаются через QuerySet.aiterator() и отдаются асинхронным 
+    потоковым ответом: медленный клиент не занимает поток сервера, 
+    пока получает файл. Под ASGI синхронная выгрузка так не работает - 
+    Django 4.2 читает синхронный поток ответа целиком в память.
+    """
+
+    async def get(self, request, fmt):
+        encoder_class = self.get_encoder_class(fmt)
+        filterset = await self.aget_filterset()
+        rows = aexport_rows(self.get_export_queryset(filterset))
+        return self.export_response(fmt, aiter_export(encoder_class, rows))
+
+    async def post(self, request, fmt):
+        self.get_encoder_class(fmt)
+        job = await sync_to_async(enqueue)('export', {
+                            'fmt': fmt, 'query': request.GET.urlencode()})
+        return job_redirect(job)
+
 
 class ReferenceManage(TemplateView):
     """Представление для управления справочниками.
@@ -63,43 +357,292 @@ class ReferenceManage(TemplateView):
     get_context_data(**kwargs)
         Переопределён для динамического изменения контекстных данных. 
         Загружает все необходимые справочники в контекст шаблона
-        для их отображения и управления.
+        для их отображения и управления. Справочники берутся 
+        из кэша (references.registry), а не из базы.
     """
 
     template_name = 'cashflow/reference_manage.html' 
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['status_act_qs'] = StatusAction.objects.all()
-        context['type_act_qs'] = TypeAction.objects.all()
-        context['category_act_qs'] = CategoryAction.objects.all()
-        context['subcategory_act_qs'] = SubcategoryAction.objects.all()
+        references = registry.get()
+        context['status_act_qs'] = references.statuses
+        context['type_act_qs'] = references.types
+        context['category_act_qs'] = references.categories
+        context['subcategory_act_qs'] = references.subcategories
+        return context
+
+
+@method_decorator(condition(etag_func=lambda request: 
+                             f'"{registry.get().version}"'), 
+                  name='get')
+class ReferenceTreeView(View):
+    """Дерево справочников тип → категория → подкатегория в формате JSON.
+
+    Используется связанными списками выбора форм транзакций. 
+    ETag совпадает с версией справочников, поэтому неизменённое дерево 
+    отдаётся ответом 304. Ссылки из форм содержат версию в параметре v, 
+    и такой ответ браузер может кэшировать без повторной проверки.
+    """
+
+    def get(self, request):
+        references = registry.get()
+        response = HttpResponse(references.tree_json, 
+                                content_type='application/json')
+        if request.GET.get('v') == references.version:
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'no-cache'
+        return response
+
+
+@method_decorator(condition(etag_func=ledger_etag, 
+                             last_modified_func=ledger_last_modified), 
+                  name='get')
+class TransactApiView(FilterMixin, View):
+    """Список транзакций в формате JSON для интеграций.
+
+    Принимает параметры TransactFilter, курсоры after/before, page_size 
+    и fields - список полей ответа через запятую (см. api.API_FIELDS). 
+    Строки выбираются через values_list без создания экземпляров модели 
+    и шаблонов. ETag и Last-Modified определяются версиями транзакций 
+    и справочников (ETag - ещё и параметрами запроса), поэтому повторный 
+    опрос без изменений получает 304.
+
+    Attributes:
+    ----------
+    filterset_class: TransactFilter
+        Класс фильтра, используемый для фильтрации данных
+    paginate_by: int
+        Размер страницы по умолчанию
+    """
+
+    model = Transaction
+    filterset_class = TransactFilter
+    paginate_by = settings.CASHFLOW_PAGE_SIZE
+
+    def get_queryset(self):
+        return Transaction.objects.all()
+
+    def get(self, request):
+        filterset = self.get_filterset(self.get_filterset_class())
+        if filterset.is_bound and not filterset.is_valid():
+            return self.errors_response(filterset.errors)
+        try:
+            page, results = transaction_page(filterset.qs, 
+                                             **self.page_params(request))
+        except (InvalidFields, InvalidCursor) as e:
+            return self.errors_response({'__all__': [str(e)]})
+        return self.page_response(page, results)
+
+    def page_params(self, request):
+        """Параметры transaction_page из запроса.
+
+        Raises:
+        -------
+        InvalidFields
+            Если параметр fields содержит неизвестные поля
+        """
+        return {'fields': parse_fields(request.GET.get(FIELDS_PARAM)),
+                'per_page': requested_page_size(request, self.paginate_by),
+                'after': request.GET.get(AFTER_PARAM),
+                'before': request.GET.get(BEFORE_PARAM)}
+
+    @staticmethod
+    def errors_response(errors):
+        return JsonResponse({'errors': errors}, status=400)
+
+    @staticmethod
+    def page_response(page, results):
+        response = JsonResponse({'results': results, 
+                                 'next': page.next_token,
+                                 'previous': page.previous_token})
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class AsyncTransactApiView(AsyncFilterMixin, TransactApiView):
+    """Асинхронный вариант TransactApiView для работы под ASGI.
+
+    Страница читается асинхронным ORM. Условный ответ (304) строится 
+    в самом представлении: декоратор condition в Django 4.2 
+    не поддерживает async-представления.
+    """
+
+    async def get(self, request):
+        return await acondition(request, lambda: self.get_page(request))
+
+    async def get_page(self, request):
+        filterset = await self.aget_filterset()
+        if filterset.is_bound and not filterset.is_valid():
+            return self.errors_response(filterset.errors)
+        try:
+            page, results = await atransaction_page(
+                                    filterset.qs, **self.page_params(request))
+        except (InvalidFields, InvalidCursor) as e:
+            return self.errors_response({'__all__': [str(e)]})
+        return self.page_response(page, results)
+
+
+@method_decorator(condition(etag_func=ledger_etag, 
+                             last_modified_func=ledger_last_modified), 
+                  name='get')
+class ReportView(FilterMixin, TemplateView):
+    """Отчёт о движении денег по месяцам и категориям.
+
+    Принимает параметры TransactFilter и показатель ячеек metric 
+    (сумма, изменение к прошлому месяцу или скользящее среднее). 
+    Данные читаются одним группирующим запросом (см. cashflow.reports), 
+    ряды считаются целиком, без циклов по транзакциям. Как и список 
+    транзакций, отчёт отдаётся ответом 304, пока не изменились данные.
+
+    Attributes:
+    ----------
+    filterset_class: TransactFilter
+        Класс фильтра, используемый для фильтрации данных
+    """
+
+    model = Transaction
+    filterset_class = TransactFilter
+    template_name = 'cashflow/report.html'
+
+    def get_queryset(self):
+        return Transaction.objects.all()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        filterset = self.get_filterset(self.get_filterset_class())
+        context['filter'] = filterset
+        metric = self.request.GET.get('metric')
+        if metric not in dict(METRIC_CHOICES):
+            metric = AMOUNT
+        context['metric'] = metric
+        context['metric_choices'] = METRIC_CHOICES
+        if filterset.is_bound and not filterset.is_valid():
+            return context
+
+        report = compute_report(filterset)
+        context['report'] = report
+        context['rows'] = [(row, format_series(row.values(metric))) 
+                           for row in report.rows]
+        context['summary'] = [
+            ('Чистый поток', format_series(report.net)),
+            ('Изменение к прошлому месяцу', 
+             format_series(report.net_deltas)),
+            (f'Скользящее среднее ({report.window} мес.)', 
+             format_series(report.net_averages)),
+            ('Остаток нарастающим итогом', format_series(report.balance)),
+        ]
         return context
 
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class MetricsView(View):
+    """Метрики представлений (ViewMetricsMiddleware) в формате Prometheus.
+
+    Доступны только с адресов из INTERNAL_IPS.
+    """
+
+    def get(self, request):
+        if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+            raise Http404
+        return HttpResponse(metrics.render(), 
+                            content_type='text/plain; version=0.0.4; '
+                                         'charset=utf-8')
+
 
 # Transaction
 
+def transact_location(obj):
+    """Адрес страницы списка, начинающейся с транзакции obj.
+
+    Вместо первой страницы всего списка открывается страница 
+    с сохранённой записью, прокрученная к её строке.
+    """
+    return (f"{reverse('cashflow:main')}?{AFTER_PARAM}={cursor_at(obj)}"
+            f'#transact-{obj.pk}')
+
+
 class TransactCreateView(CreateView):
     """Представление для создания транзакции."""
     model = Transaction
     form_class = TransactCreateUpdateForm
     template_name = 'cashflow/transaction/create_transact.html'
-    success_url = reverse_lazy('cashflow:main')
+
+    def get_success_url(self):
+        return transact_location(self.object)
+
+
+class TransactGridView(FormView):
+    """Представление для ввода нескольких транзакций одной отправкой.
+
+    Строки таблицы (TransactGridFormSet) проверяются по снимку 
+    справочников без запросов к базе. Если ошибок нет, все заполненные 
+    строки создаются одним bulk_create в одной транзакции, и страница 
+    показывает количество созданных записей и новую пустую таблицу; 
+    иначе ничего не создаётся, а ошибки показываются у своих строк.
+    """
+    form_class = TransactGridFormSet
+    template_name = 'cashflow/transaction/grid_transact.html'
+
+    def get_initial(self):
+        return None
+
+    def form_valid(self, form):
+        created = form.save()
+        return self.render_to_response(self.get_context_data(
+                    form=self.form_class(), 
+                    result=len(created)))
 
 
 class TransactDetailView(DetailView):
     """Представление для отображения полей транзакции."""
     model = Transaction
+    queryset = Transaction.objects.select_related('status_act', 'type_act', 
+                                                  'category_act', 
+                                                  'subcategory_act')
     template_name = 'cashflow/transaction/detail_transact.html'
     context_object_name = 'obj'
 
 
 class TransactUpdateView(UpdateView):
-    """Представление для обновления транзакции."""
+    """Представление для обновления транзакции.
+
+    Отправленная форма сначала сравнивается с записью, прочитанной 
+    без блокировки: форма без изменений сразу перенаправляет 
+    на транзакцию, без блокировки записи и UPDATE. Изменённая форма 
+    проверяется заново по записи, загруженной с блокировкой в транзакции 
+    сохранения (write_atomic), и сигналы сохранения берут старые значения 
+    для сводки из неё (signals.remember_locked_values), а не перечитывают 
+    строку.
+    """
     model = Transaction
     form_class = TransactCreateUpdateForm
     template_name = 'cashflow/transaction/update_transact.html'
-    success_url = reverse_lazy('cashflow:main')
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        form = self.get_form()
+        if not form.is_valid():
+            return self.form_invalid(form)
+        if not form.has_changed():
+            return HttpResponseRedirect(self.get_success_url())
+        with write_atomic():
+            # Запись могла измениться после первого чтения
+            self.object = self.get_object(
+                                self.get_queryset().select_for_update())
+            remember_locked_values(self.object)
+            form = self.get_form()
+            if not form.is_valid():
+                return self.form_invalid(form)
+            return self.form_valid(form)
+
+    def get_success_url(self):
+        return transact_location(self.object)
 
 
 class TransactDeleteView(DeleteView):
@@ -110,6 +653,215 @@ class TransactDeleteView(DeleteView):
     success_url = reverse_lazy('cashflow:main')
 
 
+class TransactImportView(FormView):
+    """Представление для загрузки транзакций из CSV-файла.
+
+    Файл разбирается потоково и записывается пакетами (TransactImporter). 
+    После загрузки страница показывает количество созданных транзакций 
+    и список ошибочных строк, а если файл не удалось дочитать, - 
+    строку, на которой загрузка остановилась.
+    """
+    form_class = TransactImportForm
+    template_name = 'cashflow/transaction/import_transact.html'
+
+    # Сколько ошибочных строк показывать на странице
+    errors_shown = 100
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        if form.cleaned_data['background']:
+            job = enqueue('import', 
+                          {'batch_size': form.cleaned_data['batch_size']},
+                          upload=upload)
+            return job_redirect(job)
+        importer = TransactImporter(batch_size=form.cleaned_data['batch_size'])
+        try:
+            result = importer.run(decode_lines(upload.file))
+        except ImportFileError as e:
+            form.add_error('file', str(e))
+            return self.form_invalid(form)
+        return self.render_to_response(self.get_context_data(
+                    form=form, 
+                    result=result, 
+                    errors=result.errors[:self.errors_shown]))
+
+
+class TransactBulkView(FilterMixin, FormView):
+    """Представление для массовых действий над транзакциями.
+
+    Принимает параметры TransactFilter главной страницы и TransactBulkForm: 
+    установка статуса, перенос в категорию или удаление отмеченных записей 
+    либо всех записей по фильтру. Действие выполняется пакетными 
+    UPDATE/DELETE (см. cashflow.bulk), сводка, поисковый индекс и версия 
+    данных обновляются вместе с транзакциями. Перед удалением показывается 
+    количество удаляемых записей и запрашивается подтверждение. 
+    С флажком background действие выполняется фоновой задачей.
+
+    Attributes:
+    ----------
+    filterset_class: TransactFilter
+        Класс фильтра, задающий записи по фильтру
+    """
+
+    model = Transaction
+    filterset_class = TransactFilter
+    form_class = TransactBulkForm
+    template_name = 'cashflow/transaction/bulk_transact.html'
+
+    def get_queryset(self):
+        return Transaction.objects.all()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.urlencode()
+        return context
+
+    def form_valid(self, form):
+        queryset = self.get_target_queryset(form)
+        if queryset is None:
+            form.add_error(None, 'Некорректные параметры фильтра')
+            return self.form_invalid(form)
+
+        delete = form.cleaned_data['action'] == TransactBulkForm.DELETE
+        if delete and not form.cleaned_data['confirm']:
+            return self.render_to_response(self.get_context_data(
+                        form=form, confirm_count=queryset.count()))
+        if form.cleaned_data['background']:
+            return job_redirect(enqueue('bulk', self.get_job_params(form)))
+        if delete:
+            count = bulk_delete(queryset)
+        else:
+            count = bulk_update(queryset, form.update_values())
+        return self.render_to_response(self.get_context_data(
+                    form=form, result=count))
+
+    def get_job_params(self, form):
+        """Параметры фоновой задачи 'bulk' для действия формы."""
+        delete = form.cleaned_data['action'] == TransactBulkForm.DELETE
+        selected = form.cleaned_data['scope'] == TransactBulkForm.SELECTED
+        return {'delete': delete,
+                'values': None if delete else form.update_values(),
+                'ids': form.cleaned_data['ids'] if selected else None,
+                'query': self.request.GET.urlencode()}
+
+    def get_target_queryset(self, form):
+        """Записи для действия или None, если фильтр некорректен."""
+        if form.cleaned_data['scope'] == TransactBulkForm.SELECTED:
+            return Transaction.objects.filter(pk__in=form.cleaned_data['ids'])
+        filterset = self.get_filterset(self.get_filterset_class())
+        if filterset.is_bound and not filterset.is_valid():
+            return None
+        return filterset.qs
+
+
+# Фоновые задачи
+
+def job_redirect(job):
+    """Ответ представления, передавшего работу фоновой задаче job."""
+    return HttpResponseRedirect(reverse('cashflow:detail_job', 
+                                        args=[job.pk]))
+
+
+class JobListView(ListView):
+    """Список фоновых задач, последние сверху.
+
+    POST ставит в очередь пересчёт сводки DailyRollup.
+    """
+    model = Job
+    context_object_name = 'jobs'
+    template_name = 'cashflow/job/job_list.html'
+    paginate_by = 50
+
+    def get_queryset(self):
+        return Job.objects.defer('params', 'result', 'error').order_by('-pk')
+
+    def post(self, request):
+        return job_redirect(enqueue('rebuild_rollups'))
+
+
+class JobDetailView(DetailView):
+    """Страница фоновой задачи: ход выполнения, результат и отмена.
+
+    Пока задача активна, страница обновляется сама.
+    """
+    model = Job
+    context_object_name = 'job'
+    template_name = 'cashflow/job/detail_job.html'
+
+
+class JobStatusView(View):
+    """Состояние фоновой задачи в формате JSON для опроса из браузера."""
+
+    def get(self, request, pk):
+        job = get_object_or_404(Job, pk=pk)
+        return JsonResponse({
+            'id': job.pk,
+            'kind': job.kind,
+            'status': job.status,
+            'progress': job.progress,
+            'total': job.total,
+            'percent': job.percent,
+            'result': job.result,
+            'error': job.error,
+            'download': (reverse('cashflow:download_job', args=[job.pk])
+                         if job.output_name else None),
+        })
+
+
+class JobCancelView(View):
+    """Отмена фоновой задачи (см. jobs.cancel)."""
+
+    def post(self, request, pk):
+        job = get_object_or_404(Job.objects.only('pk'), pk=pk)
+        cancel(job.pk)
+        return job_redirect(job)
+
+
+class JobDownloadView(View):
+    """Файл результата выполненной фоновой задачи."""
+
+    def get(self, request, pk):
+        job = get_object_or_404(Job, pk=pk, status=Job.DONE)
+        if not job.output_name:
+            raise Http404('У задачи нет файла результата')
+        storage = job_storage()
+        if not storage.exists(job.output_name):
+            raise Http404('Файл результата удалён')
+        extension = job.output_name.rsplit('.', 1)[-1]
+        return FileResponse(storage.open(job.output_name, 'rb'), 
+                            as_attachment=True, 
+                            filename=f'transactions.{extension}')
+
+
+# Справочники
+
+class ReferenceDeleteView(DeleteView):
+    """Базовое представление для удаления элемента справочника.
+
+    Страница подтверждения показывает, сколько категорий и подкатегорий 
+    будет удалено каскадно и сколько транзакций потеряют ссылку 
+    (одним запросом COUNT). Ссылки транзакций сбрасываются пакетными 
+    UPDATE без загрузки записей в память (см. bulk.delete_reference), 
+    при отмеченном флажке background - фоновой задачей.
+    """
+    context_object_name = 'obj'
+    template_name = 'cashflow/generic/delete_model_action.html'
+    success_url = reverse_lazy('cashflow:reference_manage')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['impact'] = deletion_impact(self.object)
+        return context
+
+    def form_valid(self, form):
+        if self.request.POST.get('background'):
+            return job_redirect(enqueue('delete_reference', {
+                            'model': self.object._meta.model_name,
+                            'pk': self.object.pk}))
+        delete_reference(self.object)
+        return HttpResponseRedirect(self.get_success_url())
+
+
 # StatusAction
 
 class StatusActionCreateView(CreateView):
@@ -130,13 +882,10 @@ class StatusActionUpdateView(UpdateView):
     success_url = reverse_lazy('cashflow:reference_manage')
 
 
-class StatusActionDeleteView(DeleteView):
+class StatusActionDeleteView(ReferenceDeleteView):
     """Представление для удаления статуса транзакций."""
     model = StatusAction
-    context_object_name = 'obj'
-    template_name = 'cashflow/generic/delete_model_action.html'
     extra_context = {'obj_name': 'статус'}
-    success_url = reverse_lazy('cashflow:reference_manage')
 
 
 # TypeAction
@@ -159,13 +908,10 @@ class TypeActionUpdateView(UpdateView):
     success_url = reverse_lazy('cashflow:reference_manage')
 
 
-class TypeActionDeleteView(DeleteView):
+class TypeActionDeleteView(ReferenceDeleteView):
     """Представление для удаления типа транзакций."""
     model = TypeAction
-    context_object_name = 'obj'
-    template_name = 'cashflow/generic/delete_model_action.html'
     extra_context = {'obj_name': 'тип'}
-    success_url = reverse_lazy('cashflow:reference_manage')
 
 
 # CategoryAction
@@ -188,13 +934,10 @@ class CategoryActionUpdateView(UpdateView):
     success_url = reverse_lazy('cashflow:reference_manage')
 
 
-class CategoryActionDeleteView(DeleteView):
+class CategoryActionDeleteView(ReferenceDeleteView):
     """Представление для удаления категории транзакций."""
     model = CategoryAction
-    context_object_name = 'obj'
-    template_name = 'cashflow/generic/delete_model_action.html'
     extra_context = {'obj_name': 'категория'}
-    success_url = reverse_lazy('cashflow:reference_manage')
 
 
 # SubcategoryAction
@@ -217,10 +960,7 @@ class SubcategoryActionUpdateView(UpdateView):
     success_url = reverse_lazy('cashflow:reference_manage')
 
 
-class SubcategoryActionDeleteView(DeleteView):
+class SubcategoryActionDeleteView(ReferenceDeleteView):
     """Представление для удаления подкатегории транзакций."""
     model = SubcategoryAction
-    context_object_name = 'obj'
-    template_name = 'cashflow/generic/delete_model_action.html'
-    extra_context = {'obj_name': 'подкатегория'}
-    success_url = reverse_lazy('cashflow:reference_manage')
\ No newline at end of file
+    extra_context = {'obj_name': 'подкатегория'}
\ No newline at end of file